@@ -0,0 +1,50 @@
+import time
+import logging as log
+from network_analysis.cli import parse_batch_arguments
+
+
+def main() -> None:
+    """
+    Run the centrality analyses of a job list.
+
+    Parses command-line arguments, runs all jobs and saves their results and
+    a timing summary.
+
+    """
+    # Configure logging
+    log.basicConfig(
+        level=log.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    st = time.time()  # Record the start time
+
+    args = parse_batch_arguments()  # Parse command-line arguments
+
+    from network_analysis.batch import load_jobs, run_jobs, write_timing_summary
+
+    jobs = load_jobs(args.job_file)
+    log.info(f"Loaded {len(jobs)} jobs from {args.job_file}.")
+
+    timings = run_jobs(
+        jobs,
+        output_folder=args.output_folder,
+        parallel_jobs=args.parallel_jobs,
+        plot=args.plot,
+        use_graph_cache=not args.no_graph_cache,
+        output_format=args.output_format,
+        spatial_sort=args.spatial_sort,
+    )
+    write_timing_summary(timings, args.output_folder)
+
+    num_failed = sum(timing["status"] != "done" for timing in timings)
+    et = time.time()  # Record the end time
+
+    log.info(
+        f"Batch finished after {et-st} seconds,"
+        f" {len(jobs) - num_failed} jobs done, {num_failed} failed."
+    )
+
+
+if __name__ == "__main__":
+    main()
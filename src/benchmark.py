@@ -0,0 +1,69 @@
+import time
+import logging as log
+from network_analysis.cli import parse_benchmark_arguments
+
+
+def main() -> None:
+    """
+    Run the benchmark suite.
+
+    Parses command-line arguments, times every case on the synthetic and
+    cached graphs, appends the results to the history and compares them with
+    the previous run on the same machine.
+
+    """
+    # Configure logging
+    log.basicConfig(
+        level=log.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    st = time.time()  # Record the start time
+
+    args = parse_benchmark_arguments()  # Parse command-line arguments
+
+    from network_analysis.benchmark import (
+        append_history,
+        compare_runs,
+        load_history,
+        previous_run,
+        run_benchmarks,
+        synthetic_graphs,
+    )
+
+    graphs = synthetic_graphs(
+        args.grid_sizes, args.geometric_sizes, osm_extract=not args.no_osm
+    )
+    results = run_benchmarks(
+        graphs,
+        cases=args.cases,
+        repeat=args.repeat,
+        num_routes=args.num_routes,
+        seed=args.seed,
+    )
+    run = append_history(
+        results,
+        args.history,
+        settings={
+            "repeat": args.repeat,
+            "num_routes": args.num_routes,
+            "seed": args.seed,
+        },
+    )
+
+    previous = previous_run(load_history(args.history), run)
+    if previous is not None:
+        log.info(f"Comparison with the run of {previous['timestamp']}:")
+        for entry in compare_runs(previous, run):
+            log.info(
+                f"{entry['case']} on {entry['graph']}: {entry['previous']:.4f} s"
+                f" -> {entry['current']:.4f} s ({entry['ratio']:.2f}x)"
+            )
+
+    et = time.time()  # Record the end time
+
+    log.info(f"Benchmark finished after {et-st} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,65 @@ DATA_DIR = os.path.join(ROOT_DIR, "data")
 # get raster data directory
 RASTER_PATH = os.path.join(DATA_DIR, "ghspop_4326.tif")
 
+# get directory of the processed graph cache
+GRAPH_CACHE_DIR = os.path.join(ROOT_DIR, "graph_cache")
+
+# size cap of the processed graph cache in bytes
+GRAPH_CACHE_MAX_BYTES = 2 * 1024**3
+
+# get directory of the reprojected raster windows
+RASTER_CACHE_DIR = os.path.join(ROOT_DIR, "raster_cache")
+
 # get test data directory
 TEST_DATA_DIR = os.path.join(ROOT_DIR, "tests", "test_data")
 
+# get OSMnx HTTP cache with the pinned OSM extract of the tests and benchmarks
+OSM_EXTRACT_CACHE_DIR = os.path.join(ROOT_DIR, "tests", "cache")
+
+# get history of the benchmark results
+BENCHMARK_HISTORY_PATH = os.path.join(ROOT_DIR, "benchmark_history.json")
+
 CRS_EPSG_4326 = 4326
+
+# Choices of the command line options, kept here so the argument parsing
+# does not import the analysis modules
+
+# pivot selections of the approximate betweenness centrality
+PIVOT_STRATEGIES = ["random", "stratified", "spread"]
+
+# graph representations the analysers can run on
+GRAPH_BACKENDS = ["networkx", "csr"]
+
+# shortest path algorithms of the geographical method
+ROUTING_ALGORITHMS = ["dijkstra", "ch"]
+
+# file extension of every output format
+OUTPUT_FORMATS = {"gpkg": ".gpkg", "parquet": ".parquet", "fgb": ".fgb"}
+
+# population weightings: population of the cell of every node, or the
+# population of every cell distributed over its nearest nodes
+POPULATION_MODELS = ["node", "cell"]
+
+# plot modes: no plot, bulk line rendering or GeoPandas plot of every edge
+PLOT_MODES = ["none", "fast", "full"]
+
+# profilers of the --profile option
+PROFILERS = ["cprofile", "pyinstrument"]
+
+# benchmark cases in the order they run, startup times the command line tools
+BENCHMARK_CASES = [
+    "startup",
+    "add_travel_time",
+    "networkx",
+    "networkx_pivots",
+    "geographical",
+    "geographical_csr",
+    "geographical_ch",
+    "ch_build",
+    "routing_csr",
+    "routing_ch",
+    "population_sampling",
+    "write_gpkg",
+    "write_parquet",
+    "write_fgb",
+]
@@ -1,34 +1,54 @@
+import os
+import shutil
 import sys
 import time
 import logging as log
-from network_analysis.osmnx_analyser import osmnx_analyser
-from network_analysis.utils import plot_road_network, create_output_folder
-from network_analysis.utils import save_centrality_results, parse_arguments
-from network_analysis.networkx_analyser import networkx_analyser
+from argparse import Namespace
+from network_analysis.cli import parse_arguments
+from network_analysis.profiling import (
+    add_stage_records,
+    profile_run,
+    write_stage_report,
+)
 
 
-def main() -> None:
+def run_analysis(args: Namespace, output_path: str) -> None:
     """
-    The main function that orchestrates the network analysis process.
-
-    Parses command-line arguments, performs network analysis, and saves results.
+    Calculate the centrality, plot and save the results.
 
+    Args:
+        args (Namespace): The parsed command-line arguments.
+        output_path (str): Folder of the results.
     """
-    # Configure logging
-    log.basicConfig(
-        level=log.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
-
-    st = time.time()  # Record the start time
-
-    args = parse_arguments()  # Parse command-line arguments
+    # the analysis modules load geopandas, osmnx and matplotlib
+    from network_analysis.osmnx_analyser import osmnx_analyser
+    from network_analysis.utils import start_plot_road_network
+    from network_analysis.utils import save_centrality_results
+    from network_analysis.networkx_analyser import networkx_analyser
+    from network_analysis.tiling import tiled_analyser
 
-    if args.centrality_method == "networkx":
+    if args.centrality_method == "networkx" and args.tile_size is not None:
+        centrality_gdf = tiled_analyser(
+            location=args.location,
+            route_type=args.route_type,
+            network_type=args.network_type,
+            tile_size=args.tile_size,
+            tile_buffer=args.tile_buffer,
+            workers=args.workers,
+            use_graph_cache=not args.no_graph_cache,
+        )
+    elif args.centrality_method == "networkx":
         centrality_gdf = networkx_analyser(
             location=args.location,
             route_type=args.route_type,
             network_type=args.network_type,
+            num_pivots=args.num_pivots,
+            pivot_strategy=args.pivot_strategy,
+            seed=args.seed,
+            workers=args.workers,
+            graph_backend=args.graph_backend,
+            use_graph_cache=not args.no_graph_cache,
+            refresh_graph_cache=args.refresh_graph_cache,
         )
     elif args.centrality_method == "geographical":
         centrality_gdf = osmnx_analyser(
@@ -37,32 +57,93 @@ def main() -> None:
             network_type=args.network_type,
             weighting=args.weighting,
             route_type=args.route_type,
+            graph_backend=args.graph_backend,
+            workers=args.workers,
+            seed=args.seed,
+            use_graph_cache=not args.no_graph_cache,
+            refresh_graph_cache=args.refresh_graph_cache,
+            exclude_same_nodes=args.exclude_same_nodes,
+            tolerance=args.tolerance,
+            batch_size=args.batch_size,
+            snapshot_folder=output_path if args.snapshots else None,
+            routing=args.routing,
+            output_format=args.output_format,
+            od_matrix_path=args.od_matrix,
+            zones_path=args.zones,
+            zone_id_column=args.zone_id_column,
+            population_model=args.population_model,
         )
     else:
         log.error("Invalid centrality method specified.")
         sys.exit(1)
 
-    # Create the output folder based on user-defined parameters
-    output_path = create_output_folder(
-        output_path=args.output_folder,
-        location=args.location,
-        centrality_method=args.centrality_method,
-        route_type=args.route_type,
-    )
-
-    # Plot the road network centrality and save the plot
-    plot_road_network(
+    # Plot the road network centrality in a worker while saving the results
+    plot = start_plot_road_network(
         centrality_gdf,
         column="centrality",
         cmap="magma_r",
         output_folder=output_path,
+        mode=args.plot,
     )
 
     # Save centrality results
-    save_centrality_results(centrality_gdf=centrality_gdf, output_folder=output_path)
+    save_centrality_results(
+        centrality_gdf=centrality_gdf,
+        output_folder=output_path,
+        output_format=args.output_format,
+        spatial_sort=args.spatial_sort,
+        row_group_size=args.row_group_size,
+    )
+    if plot is not None:
+        _, plot_stages = plot.result()
+        add_stage_records(plot_stages)
+
+
+def main() -> None:
+    """
+    The main function that orchestrates the network analysis process.
+
+    Parses command-line arguments, performs network analysis, and saves results.
+
+    """
+    # Configure logging
+    log.basicConfig(
+        level=log.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    st = time.time()  # Record the start time
+
+    args = parse_arguments()  # Parse command-line arguments
+
+    from network_analysis.utils import output_folder_path, replace_output_folder
+
+    # Write the results into a partial folder first, the results of a previous
+    # run with the same parameters are only replaced after a successful run
+    output_path = output_folder_path(
+        output_path=args.output_folder,
+        location=args.location,
+        centrality_method=args.centrality_method,
+        route_type=args.route_type,
+    )
+    run_path = output_path + ".partial"
+    if os.path.isdir(run_path):
+        shutil.rmtree(run_path)
+    os.makedirs(run_path)
+
+    # Run the analysis, optionally under a profiler
+    try:
+        with profile_run(args.profile, run_path):
+            run_analysis(args, run_path)
+    except BaseException:
+        log.error(f"Analysis failed, partial results are kept in {run_path}")
+        raise
 
     et = time.time()  # Record the end time
 
+    write_stage_report(run_path, total_wall_time=et - st)
+    replace_output_folder(run_path, output_path)
+
     log.info(f"Analysis finished successfully after {et-st} seconds.")
 
 
@@ -0,0 +1,335 @@
+import os
+import csv
+import time
+import logging as log
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from network_analysis.networkx_analyser import networkx_analyser
+from network_analysis.osmnx_analyser import osmnx_analyser
+from network_analysis.utils import (
+    create_output_folder,
+    get_osm_graph,
+    start_plot_road_network,
+    save_centrality_results,
+)
+from definitions import RASTER_PATH
+
+# Columns of a job list and their defaults, None marks a required column
+JOB_FIELDS = {
+    "location": None,
+    "centrality_method": "networkx",
+    "route_type": "length",
+    "network_type": "drive",
+    "num_routes": "",
+    "weighting": "random",
+    "num_pivots": "",
+    "seed": "",
+}
+
+TIMING_FIELDS = [
+    "job",
+    "location",
+    "centrality_method",
+    "route_type",
+    "network_type",
+    "num_routes",
+    "weighting",
+    "status",
+    "graph_time",
+    "analysis_time",
+    "save_time",
+    "total_time",
+    "output_folder",
+    "error",
+]
+
+
+def _read_job_rows(job_file: str) -> List[Dict[str, Any]]:
+    """
+    Read the rows of a YAML or CSV job list.
+
+    A YAML job list is either a list of jobs or a mapping with a "jobs" list.
+
+    Args:
+        job_file (str): Path to the job list.
+
+    Returns:
+        list: One dictionary of column values per job.
+    """
+    extension = os.path.splitext(job_file)[1].lower()
+    if extension == ".csv":
+        with open(job_file, newline="") as file:
+            return list(csv.DictReader(file))
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            log.error("PyYAML is required for YAML job lists, use a CSV job list.")
+            raise e
+        with open(job_file) as file:
+            content = yaml.safe_load(file) or []
+        if isinstance(content, dict):
+            content = content.get("jobs", [])
+        return list(content)
+    log.error(f"Unsupported job list format: '{job_file}'.")
+    raise ValueError(f"Unsupported job list format: '{job_file}'.")
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def load_jobs(job_file: str) -> List[Dict[str, Any]]:
+    """
+    Load and validate a job list for the batch analysis.
+
+    Every job has the columns location, centrality_method (or method),
+    route_type, network_type, num_routes and weighting, and optionally
+    num_pivots and seed. Missing values get the defaults of the command line.
+
+    Args:
+        job_file (str): Path to the YAML or CSV job list.
+
+    Returns:
+        list: Validated jobs.
+    """
+    jobs = []
+    for index, row in enumerate(_read_job_rows(job_file)):
+        row = {key.strip(): value for key, value in row.items() if key is not None}
+        if "method" in row and "centrality_method" not in row:
+            row["centrality_method"] = row.pop("method")
+        unknown = set(row) - set(JOB_FIELDS)
+        if unknown:
+            log.error(f"Job {index}: unknown columns {sorted(unknown)}.")
+            raise ValueError(f"Job {index}: unknown columns {sorted(unknown)}.")
+
+        job = {}
+        for field, default in JOB_FIELDS.items():
+            value = row.get(field)
+            if isinstance(value, str):
+                value = value.strip()
+            if value is None or value == "":
+                if default is None:
+                    log.error(f"Job {index}: missing {field}.")
+                    raise ValueError(f"Job {index}: missing {field}.")
+                value = default
+            job[field] = value
+        for field in ("num_routes", "num_pivots", "seed"):
+            job[field] = _optional_int(job[field])
+
+        if job["centrality_method"] not in ("networkx", "geographical"):
+            log.error(f"Job {index}: invalid centrality method.")
+            raise ValueError(f"Job {index}: invalid centrality method.")
+        if job["centrality_method"] == "geographical" and (
+            job["num_routes"] is None or job["num_routes"] <= 0
+        ):
+            log.error(f"Job {index}: number of routes must be a positive integer.")
+            raise ValueError(
+                f"Job {index}: number of routes must be a positive integer."
+            )
+        job["job"] = index
+        jobs.append(job)
+    return jobs
+
+
+def group_jobs(jobs: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Group jobs that share a graph, i.e. location and network type.
+
+    Args:
+        jobs (list): Validated jobs.
+
+    Returns:
+        list: Lists of jobs in their original order, one per graph.
+    """
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for job in jobs:
+        groups.setdefault((job["location"], job["network_type"]), []).append(job)
+    return list(groups.values())
+
+
+def _run_job_group(
+    jobs: List[Dict[str, Any]],
+    output_folder: str,
+    plot: str,
+    use_graph_cache: bool,
+    output_format: str = "gpkg",
+    spatial_sort: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Run the jobs of one graph, loading the graph and raster only once.
+
+    A failing job is recorded in its timing and does not stop the others.
+
+    Args:
+        jobs (list): Jobs with the same location and network type.
+        output_folder (str): Base folder of the results.
+        plot (str): Plot mode of every job ("none", "fast" or "full").
+        use_graph_cache (bool): Use the processed graph cache.
+        output_format (str, optional): File format of the results.
+         Defaults to "gpkg".
+        spatial_sort (bool, optional): Sort the saved edges along a Hilbert
+         curve. Defaults to False.
+
+    Returns:
+        list: Timing record of every job.
+    """
+    graph = None
+    raster_dataset = None
+    timings = []
+    for job in jobs:
+        timing = {field: job.get(field) for field in TIMING_FIELDS}
+        timing.update(status="failed", graph_time=0.0, analysis_time=0.0)
+        timing.update(save_time=0.0, error="")
+        start_time = time.perf_counter()
+        try:
+            if graph is None:
+                graph = get_osm_graph(
+                    location=job["location"],
+                    network_type=job["network_type"],
+                    use_cache=use_graph_cache,
+                )
+                timing["graph_time"] = time.perf_counter() - start_time
+
+            analysis_start = time.perf_counter()
+            if job["centrality_method"] == "networkx":
+                centrality_gdf = networkx_analyser(
+                    location=job["location"],
+                    route_type=job["route_type"],
+                    network_type=job["network_type"],
+                    num_pivots=job["num_pivots"],
+                    seed=job["seed"],
+                    graph=graph,
+                )
+            else:
+                if job["weighting"] == "population" and raster_dataset is None:
+                    from network_analysis.population_data import (
+                        get_bounding_box,
+                        get_node_coordinates,
+                        open_and_reproject_raster,
+                    )
+
+                    raster_dataset = open_and_reproject_raster(
+                        RASTER_PATH,
+                        bbox=get_bounding_box(get_node_coordinates(graph.nodes)),
+                    )
+                centrality_gdf = osmnx_analyser(
+                    location=job["location"],
+                    num_routes=job["num_routes"],
+                    route_type=job["route_type"],
+                    network_type=job["network_type"],
+                    weighting=job["weighting"],
+                    seed=job["seed"],
+                    graph=graph,
+                    raster_dataset=raster_dataset,
+                )
+            timing["analysis_time"] = time.perf_counter() - analysis_start
+
+            save_start = time.perf_counter()
+            output_path = create_output_folder(
+                output_path=os.path.join(output_folder, f"job_{job['job']}"),
+                location=job["location"],
+                centrality_method=job["centrality_method"],
+                route_type=job["route_type"],
+            )
+            plot_future = start_plot_road_network(
+                centrality_gdf,
+                column="centrality",
+                cmap="magma_r",
+                output_folder=output_path,
+                mode=plot,
+            )
+            save_centrality_results(
+                centrality_gdf=centrality_gdf,
+                output_folder=output_path,
+                output_format=output_format,
+                spatial_sort=spatial_sort,
+            )
+            if plot_future is not None:
+                plot_future.result()
+            timing["save_time"] = time.perf_counter() - save_start
+            timing["output_folder"] = output_path
+            timing["status"] = "done"
+        except Exception as e:
+            log.error(f"Job {job['job']} failed: {e}")
+            timing["error"] = str(e)
+        timing["total_time"] = time.perf_counter() - start_time
+        timings.append(timing)
+    return timings
+
+
+def run_jobs(
+    jobs: List[Dict[str, Any]],
+    output_folder: str,
+    parallel_jobs: int = 1,
+    plot: str = "full",
+    use_graph_cache: bool = True,
+    output_format: str = "gpkg",
+    spatial_sort: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Run a batch of centrality analyses.
+
+    Jobs sharing a location and network type run one after another in the same
+    process and reuse the loaded graph and population raster. Independent
+    groups run in parallel worker processes.
+
+    Args:
+        jobs (list): Validated jobs.
+        output_folder (str): Base folder of the results.
+        parallel_jobs (int, optional): Number of worker processes.
+         Defaults to 1.
+        plot (str, optional): Plot mode of every job ("none", "fast" or
+         "full"). Defaults to "full".
+        use_graph_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+        output_format (str, optional): File format of the results.
+         Defaults to "gpkg".
+        spatial_sort (bool, optional): Sort the saved edges along a Hilbert
+         curve. Defaults to False.
+
+    Returns:
+        list: Timing record of every job, in job order.
+    """
+    groups = group_jobs(jobs)
+    arguments = (output_folder, plot, use_graph_cache, output_format, spatial_sort)
+    if parallel_jobs <= 1 or len(groups) <= 1:
+        results = [_run_job_group(group, *arguments) for group in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=min(parallel_jobs, len(groups))) as pool:
+            futures = [
+                pool.submit(_run_job_group, group, *arguments) for group in groups
+            ]
+            results = [future.result() for future in futures]
+    timings = [timing for group_timings in results for timing in group_timings]
+    return sorted(timings, key=lambda timing: timing["job"])
+
+
+def write_timing_summary(timings: List[Dict[str, Any]], output_folder: str) -> str:
+    """
+    Write the timing record of every job to a CSV file.
+
+    Args:
+        timings (list): Timing record of every job.
+        output_folder (str): Folder of the summary file.
+
+    Returns:
+        str: Path to the summary file.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    summary_path = os.path.join(output_folder, "batch_timing.csv")
+    with open(summary_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=TIMING_FIELDS)
+        writer.writeheader()
+        for timing in timings:
+            writer.writerow(
+                {
+                    field: round(value, 3) if isinstance(value, float) else value
+                    for field, value in timing.items()
+                }
+            )
+    log.info(f"Batch timing summary saved to: {summary_path}")
+    return summary_path
@@ -0,0 +1,580 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import subprocess
+import logging as log
+from datetime import datetime, timezone
+from statistics import median
+from typing import Any, Callable, Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+
+from definitions import BENCHMARK_CASES, OSM_EXTRACT_CACHE_DIR, ROOT_DIR
+
+# location and network type of the OSM extract in the pinned HTTP cache
+OSM_EXTRACT = ("Dossenheim, Germany", "drive")
+
+# command line tools whose start with --help is timed
+STARTUP_SCRIPTS = ["main.py", "batch.py", "benchmark.py"]
+
+# maximum median seconds of a start with --help
+STARTUP_TIME_BUDGET = 1.0
+
+# degrees between neighbouring nodes of the synthetic graphs, about 100 m
+NODE_SPACING = 0.001
+
+EARTH_RADIUS = 6_371_009
+
+
+def _great_circle(
+    lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray
+) -> np.ndarray:
+    """
+    Get the great-circle distance between points in metres.
+
+    Args:
+        lat1 (numpy.ndarray): Latitude of the first points.
+        lon1 (numpy.ndarray): Longitude of the first points.
+        lat2 (numpy.ndarray): Latitude of the second points.
+        lon2 (numpy.ndarray): Longitude of the second points.
+
+    Returns:
+        numpy.ndarray: Distance of every pair of points.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(h, 1)))
+
+
+def _street_graph(
+    x: np.ndarray,
+    y: np.ndarray,
+    streets: List[tuple],
+    rng: np.random.Generator,
+    one_way_share: float,
+) -> nx.MultiDiGraph:
+    """
+    Build an OSMnx-like street graph from node coordinates and streets.
+
+    Args:
+        x (numpy.ndarray): Longitude of every node.
+        y (numpy.ndarray): Latitude of every node.
+        streets (list): (u, v, highway) of every street.
+        rng (numpy.random.Generator): Random generator for the one-way streets
+         and speed tags.
+        one_way_share (float): Share of residential one-way streets.
+
+    Returns:
+        networkx.MultiDiGraph: Street graph in EPSG 4326.
+    """
+    graph = nx.MultiDiGraph(crs="epsg:4326")
+    for node in range(len(x)):
+        graph.add_node(node, x=float(x[node]), y=float(y[node]))
+    u = np.array([street[0] for street in streets], dtype=np.int64)
+    v = np.array([street[1] for street in streets], dtype=np.int64)
+    lengths = _great_circle(y[u], x[u], y[v], x[v])
+    one_way = rng.random(len(streets)) < one_way_share
+    tagged = rng.random(len(streets)) < 0.3
+    osmid = 0
+    for i, (start, end, highway) in enumerate(streets):
+        attributes = {"length": float(lengths[i]), "highway": highway}
+        if tagged[i]:
+            attributes["maxspeed"] = "50" if highway != "residential" else "30"
+        directions = [(start, end)]
+        if highway != "residential" or not one_way[i]:
+            directions.append((end, start))
+        for a, b in directions:
+            graph.add_edge(a, b, osmid=osmid, **attributes)
+            osmid += 1
+    return graph
+
+
+def grid_street_graph(size: int, seed: int = 0) -> nx.MultiDiGraph:
+    """
+    Create a grid of streets with size x size nodes.
+
+    Every fifth row and column is a primary road, the other streets are
+    residential and some of them are one-way streets.
+
+    Args:
+        size (int): Number of nodes per row and column.
+        seed (int, optional): Seed of the one-way streets. Defaults to 0.
+
+    Returns:
+        networkx.MultiDiGraph: Street graph in EPSG 4326.
+    """
+    rng = np.random.default_rng(seed)
+    rows, columns = np.divmod(np.arange(size * size), size)
+    x = 8.68 + NODE_SPACING * columns
+    y = 49.40 + NODE_SPACING * rows
+    streets = []
+    for i in range(size):
+        for j in range(size):
+            node = i * size + j
+            if j + 1 < size:
+                highway = "primary" if i % 5 == 0 else "residential"
+                streets.append((node, node + 1, highway))
+            if i + 1 < size:
+                highway = "primary" if j % 5 == 0 else "residential"
+                streets.append((node, node + size, highway))
+    return _street_graph(x, y, streets, rng, one_way_share=0.1)
+
+
+def random_geometric_street_graph(num_nodes: int, seed: int = 0) -> nx.MultiDiGraph:
+    """
+    Create an irregular street graph from a random geometric graph.
+
+    Nodes are spread uniformly with the density of the grid graph and
+    connected within 1.5 node spacings. Only the largest connected component
+    is kept.
+
+    Args:
+        num_nodes (int): Number of nodes before removing small components.
+        seed (int, optional): Seed of the node positions. Defaults to 0.
+
+    Returns:
+        networkx.MultiDiGraph: Street graph in EPSG 4326.
+    """
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(num_nodes)
+    geometric = nx.random_geometric_graph(num_nodes, 1.5 / side, seed=seed)
+    component = sorted(max(nx.connected_components(geometric), key=len))
+    index = {node: i for i, node in enumerate(component)}
+    position = np.array([geometric.nodes[node]["pos"] for node in component])
+    x = 8.68 + NODE_SPACING * side * position[:, 0]
+    y = 49.40 + NODE_SPACING * side * position[:, 1]
+    highways = np.where(
+        rng.random(geometric.number_of_edges()) < 0.2, "tertiary", "residential"
+    )
+    streets = [
+        (index[u], index[v], str(highway))
+        for (u, v), highway in zip(geometric.edges(), highways)
+        if u in index
+    ]
+    return _street_graph(x, y, streets, rng, one_way_share=0.1)
+
+
+def load_osm_extract() -> Optional[nx.MultiDiGraph]:
+    """
+    Load the pinned OSM extract from the HTTP cache of the tests.
+
+    The responses of Nominatim and Overpass are stored in the repository, so
+    the graph is built without network access.
+
+    Returns:
+        networkx.MultiDiGraph or None: The graph, None if it is not cached.
+    """
+    settings = (ox.settings.cache_folder, ox.settings.use_cache)
+    ox.settings.cache_folder = OSM_EXTRACT_CACHE_DIR
+    ox.settings.use_cache = True
+    try:
+        return ox.graph_from_place(OSM_EXTRACT[0], network_type=OSM_EXTRACT[1])
+    except Exception as e:
+        log.warning(f"Cached OSM extract not available: {e}")
+        return None
+    finally:
+        ox.settings.cache_folder, ox.settings.use_cache = settings
+
+
+def synthetic_population_raster(graph: nx.MultiDiGraph, seed: int = 0):
+    """
+    Create an in-memory population raster in EPSG 4326 around a graph.
+
+    Cells of a third of the node spacing get log-normal population values.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street graph.
+        seed (int, optional): Seed of the population values. Defaults to 0.
+
+    Returns:
+        gdal.Dataset: The raster.
+    """
+    from osgeo import gdal, osr
+
+    x = np.array([data["x"] for _, data in graph.nodes(data=True)])
+    y = np.array([data["y"] for _, data in graph.nodes(data=True)])
+    resolution = NODE_SPACING / 3
+    west, north = x.min() - resolution, y.max() + resolution
+    width = int(np.ceil((x.max() - west) / resolution)) + 2
+    height = int(np.ceil((north - y.min()) / resolution)) + 2
+
+    raster = gdal.GetDriverByName("MEM").Create("", width, height, 1, gdal.GDT_Float32)
+    raster.SetGeoTransform((west, resolution, 0, north, 0, -resolution))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    raster.SetProjection(srs.ExportToWkt())
+    population = np.random.default_rng(seed).lognormal(1, 1, (height, width))
+    raster.GetRasterBand(1).WriteArray(population.astype(np.float32))
+    return raster
+
+
+def synthetic_graphs(
+    grid_sizes: List[int], geometric_sizes: List[int], osm_extract: bool = True
+) -> Dict[str, nx.MultiDiGraph]:
+    """
+    Create the benchmark graphs.
+
+    Args:
+        grid_sizes (list): Number of nodes per row of every grid graph.
+        geometric_sizes (list): Number of nodes of every random geometric graph.
+        osm_extract (bool, optional): Add the pinned OSM extract.
+         Defaults to True.
+
+    Returns:
+        dict: Graphs keyed by name.
+    """
+    graphs = {f"grid_{size}": grid_street_graph(size) for size in grid_sizes}
+    for size in geometric_sizes:
+        graphs[f"geometric_{size}"] = random_geometric_street_graph(size)
+    if osm_extract:
+        graph = load_osm_extract()
+        if graph is not None:
+            graphs["osm_" + OSM_EXTRACT[0].split(",")[0].lower()] = graph
+    return graphs
+
+
+def _time(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Time a function.
+
+    Args:
+        function (function): Function without arguments.
+        repeat (int): Number of calls.
+
+    Returns:
+        dict: Minimum and median wall time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": median(times)}
+
+
+def time_startup(script: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    Time the start of a command line tool with --help.
+
+    Every run starts a new interpreter, so the time includes all imports
+    before the arguments are parsed.
+
+    Args:
+        script (str): Script in the source folder, e.g. "main.py".
+        repeat (int, optional): Number of starts. Defaults to 3.
+
+    Returns:
+        dict: Minimum and median wall time in seconds.
+    """
+    command = [sys.executable, os.path.join(ROOT_DIR, script), "--help"]
+    return _time(
+        lambda: subprocess.run(
+            command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, check=True
+        ),
+        repeat,
+    )
+
+
+def _case_function(
+    case: str,
+    graph: nx.MultiDiGraph,
+    num_routes: int,
+    seed: int,
+    output_folder: str,
+    state: Dict[str, Any],
+) -> Callable[[], Any]:
+    """
+    Get the function that runs one benchmark case on a graph.
+
+    Analysers and writers are imported here, so a missing optional
+    dependency only skips the cases that need it.
+
+    Args:
+        case (str): Name of the case.
+        graph (networkx.MultiDiGraph): Street graph.
+        num_routes (int): Number of routes of the geographical cases.
+        seed (int): Seed of the random selections.
+        output_folder (str): Folder of the written files.
+        state (dict): Objects shared by the cases of the graph.
+
+    Returns:
+        function: Function without arguments.
+    """
+    if case == "add_travel_time":
+        from network_analysis.utils import add_travel_time
+
+        def run():
+            graph.graph.pop("travel_time_profile", None)
+            add_travel_time(graph, "drive")
+
+        return run
+
+    if case in ("networkx", "networkx_pivots"):
+        from network_analysis.networkx_analyser import networkx_analyser
+
+        num_pivots = None if case == "networkx" else max(1, len(graph) // 10)
+        return lambda: networkx_analyser(
+            "benchmark",
+            "length",
+            "drive",
+            num_pivots=num_pivots,
+            seed=seed,
+            graph=graph,
+        )
+
+    if case.startswith("geographical"):
+        from network_analysis.osmnx_analyser import osmnx_analyser
+
+        options = {
+            "geographical": {},
+            "geographical_csr": {"graph_backend": "csr"},
+            "geographical_ch": {"routing": "ch", "use_graph_cache": False},
+        }[case]
+        return lambda: osmnx_analyser(
+            "benchmark",
+            num_routes,
+            "length",
+            "drive",
+            "random",
+            seed=seed,
+            graph=graph,
+            **options,
+        )
+
+    if case in ("ch_build", "routing_csr", "routing_ch"):
+        # the routing cases time only the routes of the same pairs, the
+        # hierarchy is built once, so its build and queries can be compared
+        from network_analysis.contraction import build_contraction_hierarchy
+        from network_analysis.csr_graph import CSRGraph
+        from network_analysis.od_sampler import ODSampler
+        from network_analysis.routing import count_route_edges
+
+        if "csr_graph" not in state:
+            state["csr_graph"] = CSRGraph.from_graph(graph)
+        csr_graph = state["csr_graph"]
+        if case == "ch_build":
+            return lambda: build_contraction_hierarchy(csr_graph, "length")
+
+        if "pairs" not in state:
+            sampler = ODSampler(graph.nodes, seed=seed)
+            state["pairs"] = sampler.sample_pairs(num_routes)
+        start_nodes, end_nodes = state["pairs"]
+        routing_graph = csr_graph
+        if case == "routing_ch":
+            if "hierarchy" not in state:
+                state["hierarchy"] = build_contraction_hierarchy(csr_graph, "length")
+            routing_graph = state["hierarchy"]
+        return lambda: count_route_edges(
+            routing_graph, start_nodes, end_nodes, "length"
+        )
+
+    if case == "population_sampling":
+        from network_analysis.population_data import get_population_sampler
+
+        if "raster" not in state:
+            state["raster"] = synthetic_population_raster(graph, seed=seed)
+        return lambda: get_population_sampler(
+            graph.nodes, seed=seed, raster_dataset=state["raster"]
+        ).sample_pairs(num_routes)
+
+    if case.startswith("write_"):
+        from network_analysis.utils import save_centrality_results
+
+        if "centrality_gdf" not in state:
+            edges = ox.graph_to_gdfs(graph, nodes=False)[["osmid", "geometry"]]
+            edges["osmid"] = edges["osmid"].astype(str)
+            edges["centrality"] = np.random.default_rng(seed).random(len(edges))
+            state["centrality_gdf"] = edges
+        output_format = case[len("write_") :]
+        return lambda: save_centrality_results(
+            state["centrality_gdf"], output_folder, output_format=output_format
+        )
+
+    log.error(f"Unknown benchmark case: '{case}'.")
+    raise ValueError(f"Unknown benchmark case: '{case}'.")
+
+
+def run_benchmarks(
+    graphs: Dict[str, nx.MultiDiGraph],
+    cases: Optional[List[str]] = None,
+    repeat: int = 3,
+    num_routes: int = 1000,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Time every benchmark case on every graph.
+
+    The startup case runs once per command line tool, its results name the
+    script instead of a graph. Cases whose dependencies are missing are
+    recorded as skipped.
+
+    Args:
+        graphs (dict): Graphs keyed by name.
+        cases (list, optional): Cases to run. Defaults to None (all cases).
+        repeat (int, optional): Number of runs per case. Defaults to 3.
+        num_routes (int, optional): Number of routes of the geographical
+         cases. Defaults to 1000.
+        seed (int, optional): Seed of the random selections. Defaults to 0.
+
+    Returns:
+        list: Result of every case and graph.
+    """
+    cases = cases or BENCHMARK_CASES
+    results = []
+    if "startup" in cases:
+        for script in STARTUP_SCRIPTS:
+            result = {
+                "case": "startup",
+                "graph": script,
+                **time_startup(script, repeat),
+            }
+            log.info(f"startup of {script}: {result['median']:.4f} s")
+            if result["median"] > STARTUP_TIME_BUDGET:
+                log.warning(
+                    f"Startup of {script} exceeds the budget of"
+                    f" {STARTUP_TIME_BUDGET} s."
+                )
+            results.append(result)
+
+    with tempfile.TemporaryDirectory() as output_folder:
+        for graph_name, graph in graphs.items():
+            state = {}
+            for case in cases:
+                if case == "startup":
+                    continue
+                result = {
+                    "case": case,
+                    "graph": graph_name,
+                    "nodes": len(graph),
+                    "edges": graph.number_of_edges(),
+                }
+                try:
+                    function = _case_function(
+                        case, graph, num_routes, seed, output_folder, state
+                    )
+                except ImportError as e:
+                    log.warning(f"Skip {case}: {e}")
+                    result["skipped"] = str(e)
+                    results.append(result)
+                    continue
+                result.update(_time(function, repeat))
+                log.info(
+                    f"{case} on {graph_name} ({len(graph)} nodes):"
+                    f" {result['median']:.4f} s"
+                )
+                results.append(result)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def append_history(
+    results: List[Dict[str, Any]], history_path: str, settings: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Append a benchmark run to the JSON history.
+
+    Args:
+        results (list): Result of every case and graph.
+        history_path (str): Path to the history file.
+        settings (dict): Settings of the run, e.g. the number of routes.
+
+    Returns:
+        dict: The appended run.
+    """
+    history = load_history(history_path)
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": platform.platform(),
+        "python": platform.python_version(),
+        "settings": settings,
+        "results": results,
+    }
+    history.append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+    with open(history_path, "w") as file:
+        json.dump(history, file, indent=2)
+    log.info(f"Benchmark results saved to: {history_path}")
+    return run
+
+
+def load_history(history_path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path) as file:
+        return json.load(file)
+
+
+def compare_runs(
+    previous: Dict[str, Any], current: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Compare the median times of two benchmark runs.
+
+    Args:
+        previous (dict): Earlier run of the history.
+        current (dict): Later run of the history.
+
+    Returns:
+        list: Case, graph, both medians and their ratio for every result
+         present in both runs.
+    """
+    previous_times = {
+        (result["case"], result["graph"]): result["median"]
+        for result in previous["results"]
+        if "median" in result
+    }
+    comparison = []
+    for result in current["results"]:
+        key = (result["case"], result["graph"])
+        if "median" not in result or key not in previous_times:
+            continue
+        comparison.append(
+            {
+                "case": result["case"],
+                "graph": result["graph"],
+                "previous": previous_times[key],
+                "current": result["median"],
+                "ratio": result["median"] / max(previous_times[key], 1e-12),
+            }
+        )
+    return comparison
+
+
+def previous_run(
+    history: List[Dict[str, Any]], run: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Get the latest earlier run of the history on the same machine.
+
+    Args:
+        history (list): Runs of the history, the last one is the current run.
+        run (dict): The current run.
+
+    Returns:
+        dict or None: The earlier run, None if there is none.
+    """
+    for earlier in reversed(history[:-1]):
+        if earlier["machine"] == run["machine"]:
+            return earlier
+    return None
@@ -0,0 +1,650 @@
+import math
+import random
+import logging as log
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappop
+from itertools import count
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple, Union
+
+import networkx as nx
+import numpy as np
+
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.shared_graph import SharedGraph, pool_graph, worker_graph
+from definitions import PIVOT_STRATEGIES
+
+# graph of a worker process, set once by the pool initializer
+_worker_graph = None
+
+
+def _edge_weight_function(graph: nx.Graph, weight: str):
+    """
+    Get a function returning the weight of the edge(s) between two nodes.
+
+    Mirrors NetworkX: for multigraphs the minimum weight over all parallel
+    edges is used and missing weights default to 1.
+
+    Args:
+        graph (networkx.Graph): Street network graph.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        function: Weight function taking (u, v, edge data).
+    """
+    if graph.is_multigraph():
+        return lambda u, v, d: min(attr.get(weight, 1) for attr in d.values())
+    return lambda u, v, d: d.get(weight, 1)
+
+
+def _nodes(graph: Union[nx.Graph, CSRGraph]) -> List[Hashable]:
+    """
+    Get the nodes of a graph as used as sources (node positions for a CSRGraph).
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+
+    Returns:
+        list: Nodes of the graph.
+    """
+    if isinstance(graph, CSRGraph):
+        return list(range(len(graph)))
+    return list(graph.nodes)
+
+
+def _edge_pairs(graph: Union[nx.Graph, CSRGraph]) -> List[Hashable]:
+    """
+    Get the keys under which the dependencies of the edges are accumulated.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+
+    Returns:
+        list: (u, v) tuples, or node pair IDs for a CSRGraph.
+    """
+    if isinstance(graph, CSRGraph):
+        return list(range(graph.num_pairs))
+    return list(graph.edges())
+
+
+def single_source_edge_dependencies(
+    graph: Union[nx.Graph, CSRGraph],
+    source: Hashable,
+    weight: str,
+    targets: Optional[Set[Hashable]] = None,
+) -> Dict[Hashable, float]:
+    """
+    Calculate the edge dependencies of a single source (Brandes accumulation).
+
+    The shortest path search and the accumulation follow
+    ``nx.edge_betweenness_centrality`` step by step, so summing the
+    dependencies of all sources reproduces its unscaled values.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        source (Hashable): Source node of the shortest path tree.
+        weight (str): Edge attribute used as weight.
+        targets (set, optional): Nodes counted as path targets. Defaults to
+         None (all nodes).
+
+    Returns:
+        dict: Dependency of the source on each (v, w) edge of its
+         shortest path DAG, oriented in the direction of the paths. For a
+         CSRGraph the node pair IDs are used instead of (v, w).
+    """
+    if isinstance(graph, CSRGraph):
+        return graph.single_source_dependencies(source, weight, targets=targets)
+    return single_source_shortest_path_dag(graph, source, weight, targets=targets)[0]
+
+
+def single_source_shortest_path_dag(
+    graph: nx.Graph,
+    source: Hashable,
+    weight: str,
+    targets: Optional[Set[Hashable]] = None,
+) -> Tuple[Dict[Tuple, float], Dict[Hashable, float]]:
+    """
+    Calculate the edge dependencies and the distances of a single source.
+
+    The keys of the dependencies are exactly the edges of the shortest path
+    DAG of the source, the distances cover all nodes reachable from it.
+    With targets only the paths ending at a target are counted, the other
+    nodes are passed through.
+
+    Args:
+        graph (networkx.Graph): Street network graph.
+        source (Hashable): Source node of the shortest path tree.
+        weight (str): Edge attribute used as weight.
+        targets (set, optional): Nodes counted as path targets. Defaults to
+         None (all nodes).
+
+    Returns:
+        tuple: Dependency of the source on each (v, w) edge of its shortest
+         path DAG and the distance of each reachable node.
+    """
+    weight_function = _edge_weight_function(graph, weight)
+
+    # single source shortest paths (Dijkstra)
+    S = []
+    P = {source: []}
+    sigma = {source: 1.0}
+    D = {}
+    seen = {source: 0}
+    c = count()
+    Q = []
+    heappush(Q, (0, next(c), source, source))
+    while Q:
+        dist, _, pred, v = heappop(Q)
+        if v in D:
+            continue
+        if v != source:
+            sigma[v] += sigma[pred]
+        S.append(v)
+        D[v] = dist
+        for w, edge_data in graph[v].items():
+            vw_dist = dist + weight_function(v, w, edge_data)
+            if w not in D and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                heappush(Q, (vw_dist, next(c), v, w))
+                sigma[w] = 0.0
+                P[w] = [v]
+            elif vw_dist == seen[w]:
+                sigma[w] += sigma[v]
+                P[w].append(v)
+
+    # accumulation of dependencies
+    dependencies = {}
+    delta = dict.fromkeys(S, 0)
+    while S:
+        w = S.pop()
+        is_target = targets is None or w in targets
+        coeff = (is_target + delta[w]) / sigma[w]
+        for v in P[w]:
+            c = sigma[v] * coeff
+            dependencies[(v, w)] = c
+            delta[v] += c
+    return dependencies, D
+
+
+def _init_worker(graph: Union[nx.Graph, CSRGraph, SharedGraph]) -> None:
+    """
+    Store the graph in a worker process so it is transferred only once.
+    Shared graph arrays are attached instead of copied.
+
+    Args:
+        graph (networkx.Graph, CSRGraph or SharedGraph): Street network graph.
+    """
+    global _worker_graph
+    if isinstance(graph, SharedGraph):
+        graph = graph.attach()
+    _worker_graph = graph
+
+
+def _sum_dependencies(
+    graph: Union[nx.Graph, CSRGraph],
+    sources: List[Hashable],
+    weight: str,
+    targets: Optional[Set[Hashable]] = None,
+) -> Tuple[Dict[Tuple, float], Dict[Tuple, float]]:
+    """
+    Sum the edge dependencies and their squares over a chunk of sources.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        sources (list): Source nodes.
+        weight (str): Edge attribute used as weight.
+        targets (set, optional): Nodes counted as path targets. Defaults to
+         None (all nodes).
+
+    Returns:
+        tuple: Dictionaries keyed by (u, v) with the sums of the dependencies
+         and the sums of their squares.
+    """
+    sums = {}
+    squares = {}
+    for source in sources:
+        for edge, value in single_source_edge_dependencies(
+            graph, source, weight, targets=targets
+        ).items():
+            sums[edge] = sums.get(edge, 0.0) + value
+            squares[edge] = squares.get(edge, 0.0) + value * value
+    return sums, squares
+
+
+def _sum_dependencies_in_worker(
+    sources: List[Hashable],
+    weight: str,
+    targets: Optional[Set[Hashable]] = None,
+) -> Tuple[Dict[Tuple, float], Dict[Tuple, float]]:
+    """
+    Sum the edge dependencies of a chunk of sources on the graph of the worker.
+
+    Args:
+        sources (list): Source nodes.
+        weight (str): Edge attribute used as weight.
+        targets (set, optional): Nodes counted as path targets. Defaults to
+         None (all nodes).
+
+    Returns:
+        tuple: See `_sum_dependencies`.
+    """
+    return _sum_dependencies(_worker_graph, sources, weight, targets=targets)
+
+
+def _map_source_chunks(
+    graph: Union[nx.Graph, CSRGraph],
+    source_chunks: List[List[Hashable]],
+    weight: str,
+    workers: int,
+    targets: Optional[Set[Hashable]] = None,
+) -> Iterator[Tuple[Dict[Tuple, float], Dict[Tuple, float]]]:
+    """
+    Sum the edge dependencies of every chunk of sources, optionally in parallel.
+
+    With more than one worker the chunks are distributed over a process
+    pool whose workers receive the graph once at start-up, the arrays of a
+    CSRGraph through shared memory. The partial sums are yielded in the
+    order of the chunks.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        source_chunks (list): Lists of source nodes.
+        weight (str): Edge attribute used as weight.
+        workers (int): Number of worker processes.
+        targets (set, optional): Nodes counted as path targets. Defaults to
+         None (all nodes).
+
+    Yields:
+        tuple: Partial sums of every chunk, see `_sum_dependencies`.
+    """
+    if workers <= 1:
+        for sources in source_chunks:
+            yield _sum_dependencies(graph, sources, weight, targets=targets)
+        return
+    with worker_graph(graph, workers) as graph_for_workers:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(graph_for_workers,),
+        ) as executor:
+            yield from executor.map(
+                _sum_dependencies_in_worker,
+                source_chunks,
+                [weight] * len(source_chunks),
+                [targets] * len(source_chunks),
+            )
+
+
+def _split_sources(sources: List[Hashable], workers: int) -> List[List[Hashable]]:
+    """
+    Split the sources into chunks for the workers.
+
+    Several chunks per worker balance the uneven cost of the sources.
+    Without parallelism all sources form one chunk.
+
+    Args:
+        sources (list): Source nodes.
+        workers (int): Number of worker processes.
+
+    Returns:
+        list: Non-empty lists of source nodes.
+    """
+    num_chunks = 1 if workers <= 1 else min(len(sources), workers * 4)
+    chunk_size = max(1, math.ceil(len(sources) / num_chunks))
+    return [sources[i : i + chunk_size] for i in range(0, len(sources), chunk_size)]
+
+
+def edge_betweenness_centrality(
+    graph: Union[nx.Graph, CSRGraph], weight: str, workers: int = 1
+) -> Dict[Tuple, float]:
+    """
+    Calculate the normalized edge betweenness centrality with a process pool.
+
+    The source nodes are split across the workers, every worker accumulates
+    the dependencies of its sources and the partial sums are merged per
+    edge. A NetworkX multigraph is converted to CSR arrays, which the
+    workers share. The result equals ``nx.edge_betweenness_centrality`` up
+    to the floating point rounding of the merge.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        weight (str): Edge attribute used as weight.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        dict: Centrality keyed by (u, v, key).
+    """
+    if workers <= 0:
+        log.error("Number of workers must be a positive integer.")
+        raise ValueError("Number of workers must be a positive integer.")
+
+    log.info(f"Calculate edge betweenness with {workers} worker processes.")
+    graph = pool_graph(graph, workers)
+    betweenness = dict.fromkeys(_edge_pairs(graph), 0.0)
+    for sums, _ in _map_source_chunks(
+        graph, _split_sources(_nodes(graph), workers), weight, workers
+    ):
+        for edge, value in sums.items():
+            if edge not in betweenness:
+                edge = edge[::-1]
+            betweenness[edge] += value
+
+    n = len(graph)
+    if n > 1:
+        scale = 1 / (n * (n - 1))
+        betweenness = {edge: value * scale for edge, value in betweenness.items()}
+    return _add_edge_keys(graph, betweenness, weight)
+
+
+def source_edge_betweenness(
+    graph: Union[nx.Graph, CSRGraph],
+    sources: List[Hashable],
+    weight: str,
+    workers: int = 1,
+    targets: Optional[Set[Hashable]] = None,
+) -> Dict[Tuple, float]:
+    """
+    Sum the edge dependencies of a subset of sources without rescaling.
+
+    Sums over disjoint subsets of the sources add up to the unscaled edge
+    betweenness of all sources, e.g. for the tiles of a large network.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        sources (list): Source nodes (node positions for a CSRGraph).
+        weight (str): Edge attribute used as weight.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        targets (set, optional): Nodes counted as path targets, e.g. the
+         nodes that remain after simplification. Defaults to None (all nodes).
+
+    Returns:
+        dict: Unscaled betweenness keyed by (u, v, key).
+    """
+    csr_graph = pool_graph(graph, workers)
+    if csr_graph is not graph:
+        # the sources and targets are node positions of the converted graph
+        graph = csr_graph
+        sources = [graph.node_index[node] for node in sources]
+        if targets is not None:
+            targets = {graph.node_index[node] for node in targets}
+    betweenness = dict.fromkeys(_edge_pairs(graph), 0.0)
+    if sources:
+        for sums, _ in _map_source_chunks(
+            graph, _split_sources(sources, workers), weight, workers, targets
+        ):
+            for edge, value in sums.items():
+                betweenness[edge] += value
+    return _add_edge_keys(graph, betweenness, weight)
+
+
+def _add_edge_keys(
+    graph: Union[nx.Graph, CSRGraph], betweenness: Dict[Tuple, float], weight: str
+) -> Dict[Tuple, float]:
+    """
+    Distribute (u, v) betweenness values over the parallel edges of a multigraph.
+
+    As in NetworkX, the value is split evenly among the parallel edges
+    with the minimal weight.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        betweenness (dict): Values keyed by (u, v) or node pair ID.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        dict: Values keyed by (u, v, key).
+    """
+    if isinstance(graph, CSRGraph):
+        return graph.pair_values_to_edges(betweenness, weight)
+    if not graph.is_multigraph():
+        return betweenness
+    weight_function = _edge_weight_function(graph, weight)
+    edge_values = dict.fromkeys(graph.edges, 0.0)
+    for u, v in betweenness:
+        edge_data = graph[u][v]
+        min_weight = weight_function(u, v, edge_data)
+        keys = [
+            key
+            for key in edge_data
+            if weight_function(u, v, {key: edge_data[key]}) == min_weight
+        ]
+        value = betweenness[(u, v)] / len(keys)
+        for key in keys:
+            edge_values[(u, v, key)] = value
+    return edge_values
+
+
+def _node_coordinates(
+    graph: Union[nx.Graph, CSRGraph], nodes: List[Hashable]
+) -> np.ndarray:
+    """
+    Get the node coordinates as an array scaled to approximately equal units.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph with "x" and
+         "y" node data.
+        nodes (list): Nodes for which coordinates are returned.
+
+    Returns:
+        numpy.ndarray: Array of shape (len(nodes), 2).
+    """
+    if isinstance(graph, CSRGraph):
+        coordinates = np.column_stack((graph.x[nodes], graph.y[nodes]))
+    else:
+        coordinates = np.array(
+            [(graph.nodes[node]["x"], graph.nodes[node]["y"]) for node in nodes],
+            dtype=float,
+        )
+    # longitude degrees shrink with the latitude
+    coordinates[:, 0] *= math.cos(math.radians(np.mean(coordinates[:, 1])))
+    return coordinates
+
+
+def _stratify_nodes(coordinates: np.ndarray, num_strata: int) -> np.ndarray:
+    """
+    Split the nodes into spatial strata with roughly equal node counts.
+
+    The nodes are divided into vertical bands by x quantiles and every
+    band is divided into cells by y quantiles.
+
+    Args:
+        coordinates (numpy.ndarray): Node coordinates of shape (n, 2).
+        num_strata (int): Maximum number of strata.
+
+    Returns:
+        numpy.ndarray: Stratum label for each node.
+    """
+    num_columns = max(1, int(math.sqrt(num_strata)))
+    num_rows = max(1, num_strata // num_columns)
+    labels = np.zeros(len(coordinates), dtype=int)
+    for column, band in enumerate(
+        np.array_split(np.argsort(coordinates[:, 0], kind="stable"), num_columns)
+    ):
+        band_order = band[np.argsort(coordinates[band, 1], kind="stable")]
+        for row, cell in enumerate(np.array_split(band_order, num_rows)):
+            labels[cell] = column * num_rows + row
+    return labels
+
+
+def select_pivots(
+    graph: Union[nx.Graph, CSRGraph],
+    num_pivots: int,
+    pivot_strategy: str = "random",
+    seed: Optional[int] = None,
+) -> Tuple[List[Hashable], List[int]]:
+    """
+    Select the source nodes (pivots) for approximate betweenness centrality.
+
+    Strategies:
+        random: simple random sample of the nodes.
+        stratified: random sample within spatial strata of equal node count,
+         allocated proportionally to the stratum size.
+        spread: spatially spread pivots by farthest point sampling. The error
+         estimate treats them like a simple random sample.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        num_pivots (int): Number of pivots to select.
+        pivot_strategy (str, optional): Pivot selection strategy.
+         Defaults to "random".
+        seed (int, optional): Seed of the random number generator.
+
+    Returns:
+        tuple: The selected pivots and the stratum label of each node of the
+         graph (in node order).
+    """
+    if pivot_strategy not in PIVOT_STRATEGIES:
+        log.error(f"Invalid pivot strategy: {pivot_strategy}")
+        raise ValueError(
+            f"Invalid pivot strategy: {pivot_strategy}."
+            f" Please choose one of the following: {PIVOT_STRATEGIES}"
+        )
+
+    nodes = _nodes(graph)
+    rng = random.Random(seed)
+    labels = [0] * len(nodes)
+    if num_pivots >= len(nodes):
+        return nodes, labels
+
+    if isinstance(graph, CSRGraph):
+        has_coordinates = not (np.isnan(graph.x).any() or np.isnan(graph.y).any())
+    else:
+        has_coordinates = all(
+            "x" in data and "y" in data for _, data in graph.nodes(data=True)
+        )
+    if pivot_strategy != "random" and not has_coordinates:
+        log.warning("Nodes have no coordinates. Using random pivot selection instead.")
+        pivot_strategy = "random"
+
+    if pivot_strategy == "random":
+        return rng.sample(nodes, num_pivots), labels
+
+    coordinates = _node_coordinates(graph, nodes)
+
+    if pivot_strategy == "stratified":
+        # at least two pivots per stratum to estimate its variance
+        stratum_labels = _stratify_nodes(coordinates, max(1, num_pivots // 2))
+        strata, sizes = np.unique(stratum_labels, return_counts=True)
+        # proportional allocation with the largest remainder method
+        quotas = num_pivots * sizes / sizes.sum()
+        allocation = np.floor(quotas).astype(int)
+        remainder_order = np.argsort(-(quotas - allocation), kind="stable")
+        allocation[remainder_order[: num_pivots - allocation.sum()]] += 1
+        members = {}
+        for node, label in zip(nodes, stratum_labels.tolist()):
+            members.setdefault(label, []).append(node)
+        pivots = []
+        for stratum, num_stratum_pivots in zip(strata.tolist(), allocation):
+            pivots.extend(rng.sample(members[stratum], int(num_stratum_pivots)))
+        return pivots, stratum_labels.tolist()
+
+    # farthest point sampling starting at a random node
+    selected = [rng.randrange(len(nodes))]
+    min_distance = np.full(len(nodes), np.inf)
+    for _ in range(num_pivots - 1):
+        distance = np.hypot(*(coordinates - coordinates[selected[-1]]).T)
+        min_distance = np.minimum(min_distance, distance)
+        min_distance[selected[-1]] = -1
+        selected.append(int(np.argmax(min_distance)))
+    return [nodes[i] for i in selected], labels
+
+
+def approximate_edge_betweenness(
+    graph: Union[nx.Graph, CSRGraph],
+    weight: str,
+    num_pivots: int,
+    pivot_strategy: str = "random",
+    seed: Optional[int] = None,
+    workers: int = 1,
+) -> Tuple[Dict[Tuple, float], Dict[Tuple, float]]:
+    """
+    Approximate the normalized edge betweenness centrality from a sample of sources.
+
+    The dependencies of the sampled pivots are extrapolated to all nodes
+    (Horvitz-Thompson estimator per stratum). The standard error of every
+    edge is estimated from the variance of the pivot dependencies within
+    the strata. With as many pivots as nodes the exact values are returned.
+
+    Args:
+        graph (networkx.Graph or CSRGraph): Street network graph.
+        weight (str): Edge attribute used as weight.
+        num_pivots (int): Number of pivots (sources) to sample.
+        pivot_strategy (str, optional): Pivot selection strategy
+         ("random", "stratified" or "spread"). Defaults to "random".
+        seed (int, optional): Seed of the random number generator.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        tuple: Two dictionaries keyed by (u, v, key) with the estimated
+         centrality and its standard error.
+    """
+    if num_pivots <= 0:
+        log.error("Number of pivots must be a positive integer.")
+        raise ValueError("Number of pivots must be a positive integer.")
+
+    graph = pool_graph(graph, workers)
+    pivots, labels = select_pivots(graph, num_pivots, pivot_strategy, seed)
+    n = len(graph)
+    stratum_of = dict(zip(_nodes(graph), labels))
+    stratum_sizes = {}
+    for label in labels:
+        stratum_sizes[label] = stratum_sizes.get(label, 0) + 1
+    stratum_pivots = {}
+    for pivot in pivots:
+        stratum_pivots.setdefault(stratum_of[pivot], []).append(pivot)
+
+    log.info(
+        f"Approximate betweenness with {len(pivots)} pivots"
+        f" ({pivot_strategy} selection) for {n} nodes."
+    )
+
+    # chunks never mix strata so the partial sums can be assigned to them
+    strata = []
+    source_chunks = []
+    for stratum, members in stratum_pivots.items():
+        for chunk in _split_sources(members, workers):
+            strata.append(stratum)
+            source_chunks.append(chunk)
+    sums = {stratum: {} for stratum in stratum_pivots}
+    squares = {stratum: {} for stratum in stratum_pivots}
+    for stratum, (chunk_sums, chunk_squares) in zip(
+        strata, _map_source_chunks(graph, source_chunks, weight, workers)
+    ):
+        for edge, value in chunk_sums.items():
+            sums[stratum][edge] = sums[stratum].get(edge, 0.0) + value
+            squares[stratum][edge] = (
+                squares[stratum].get(edge, 0.0) + chunk_squares[edge]
+            )
+
+    betweenness = dict.fromkeys(_edge_pairs(graph), 0.0)
+    variance = dict.fromkeys(_edge_pairs(graph), 0.0)
+    for stratum, members in stratum_pivots.items():
+        size = stratum_sizes[stratum]
+        k = len(members)
+        for edge, total in sums[stratum].items():
+            square = squares[stratum][edge]
+            if edge not in betweenness:
+                edge = edge[::-1]
+            betweenness[edge] += size / k * total
+            if 1 < k < size:
+                sample_variance = max(square - total * total / k, 0.0) / (k - 1)
+                variance[edge] += size**2 * (1 - k / size) * sample_variance / k
+
+    scale = 1 / (n * (n - 1)) if n > 1 else 0.0
+    betweenness = {edge: value * scale for edge, value in betweenness.items()}
+    standard_error = {
+        edge: math.sqrt(value) * scale for edge, value in variance.items()
+    }
+
+    used = [edge for edge, value in betweenness.items() if value > 0]
+    if used:
+        relative_errors = [standard_error[edge] / betweenness[edge] for edge in used]
+        log.info(
+            f"Estimated standard error: mean relative"
+            f" {np.mean(relative_errors):.2%}, max absolute"
+            f" {max(standard_error.values()):.3g}."
+        )
+
+    return (
+        _add_edge_keys(graph, betweenness, weight),
+        _add_edge_keys(graph, standard_error, weight),
+    )
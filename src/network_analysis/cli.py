@@ -0,0 +1,447 @@
+import sys
+import argparse
+import logging as log
+from argparse import Namespace
+
+from definitions import (
+    BENCHMARK_CASES,
+    BENCHMARK_HISTORY_PATH,
+    GRAPH_BACKENDS,
+    OUTPUT_FORMATS,
+    PIVOT_STRATEGIES,
+    PLOT_MODES,
+    POPULATION_MODELS,
+    PROFILERS,
+    ROUTING_ALGORITHMS,
+)
+
+# Argument parsing of the command line tools. This module must only import
+# the standard library and definitions, so --help and invalid arguments
+# return before geopandas, osmnx, matplotlib or GDAL are loaded.
+
+
+def parse_arguments() -> Namespace:
+    """
+    Parse command-line arguments for the network analysis.
+
+    Returns:
+        Namespace: The configured argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculate centrality for a study area."
+    )
+    parser.add_argument(
+        "-l",
+        "--location",
+        type=str,
+        nargs="?",
+        default="Heidelberg, Germany",
+        help="Study area, e.g., 'Heidelberg, Germany'"
+        " (default: 'Heidelberg, Germany')",
+    )
+    parser.add_argument(
+        "-m",
+        "--centrality_method",
+        type=str,
+        choices=["networkx", "geographical"],
+        default="networkx",
+        help="Method to calculate centrality "
+        "(networkx or geographical, default: networkx)",
+    )
+    parser.add_argument(
+        "-n",
+        "--num_routes",
+        type=int,
+        help="Number of routes (only for the networkx method)",
+    )
+    parser.add_argument(
+        "-r",
+        "--route_type",
+        type=str,
+        choices=["length", "travel_time"],
+        default="length",
+        help="Route type for which the betweeness centrality will be calculated"
+        " (default: length)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_folder",
+        type=str,
+        default="output_results",
+        nargs="?",
+        help="Output folder for results (default: output_results)",
+    )
+    parser.add_argument(
+        "-t",
+        "--network_type",
+        type=str,
+        choices=["all_private", "all", "bike", "drive", "drive_service", "walk"],
+        default="drive",
+        help="Type of street network (default: drive)",
+    )
+    parser.add_argument(
+        "-w",
+        "--weighting",
+        type=str,
+        default="random",
+        choices=["random", "population", "od"],
+        help="Weighting method for geographical centrality: random or population"
+        " weighted pairs, or the trips of an OD matrix (default: random)",
+    )
+    parser.add_argument(
+        "--population_model",
+        type=str,
+        choices=POPULATION_MODELS,
+        default="node",
+        help="Population weights of the nodes: population of the raster cell of"
+        " every node, or the population of every cell distributed over its"
+        " nearest nodes (only for the population weighting, default: node)",
+    )
+    parser.add_argument(
+        "--od_matrix",
+        type=str,
+        help="CSV or Parquet OD matrix with the columns origin, destination and"
+        " trips (only for the od weighting)",
+    )
+    parser.add_argument(
+        "--zones",
+        type=str,
+        help="Vector file with the zones of the OD matrix, their centroids are"
+        " snapped to the nearest nodes (only for the od weighting)",
+    )
+    parser.add_argument(
+        "--zone_id_column",
+        type=str,
+        default="zone_id",
+        help="Column of the zone IDs in the zone file (default: zone_id)",
+    )
+    parser.add_argument(
+        "-k",
+        "--num_pivots",
+        type=int,
+        help="Number of pivots for approximate betweenness centrality"
+        " (only for the networkx method, default: exact calculation)",
+    )
+    parser.add_argument(
+        "--pivot_strategy",
+        type=str,
+        choices=PIVOT_STRATEGIES,
+        default="random",
+        help="Pivot selection for approximate betweenness centrality"
+        " (default: random)",
+    )
+    parser.add_argument(
+        "--tile_size",
+        type=float,
+        help="Split the study area into tiles of this size in km and calculate"
+        " the centrality tile by tile (only for the networkx method,"
+        " default: whole graph at once)",
+    )
+    parser.add_argument(
+        "--tile_buffer",
+        type=float,
+        default=2.0,
+        help="Width of the overlap buffer around every tile in km (default: 2)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Route in batches until the estimated error of the edge usage"
+        " distribution, relative to the most used edge, is at most this value,"
+        " the number of routes is then the maximum (only for the geographical"
+        " method, default: route all at once)",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1000,
+        help="Number of routes per batch with --tolerance (default: 1000)",
+    )
+    parser.add_argument(
+        "--snapshots",
+        action="store_true",
+        help="Save the intermediate results of every batch with --tolerance",
+    )
+    parser.add_argument(
+        "--plot",
+        type=str,
+        choices=PLOT_MODES,
+        default="full",
+        help="Plot of the results: none, fast (bulk rendering of the edges with"
+        " the highest centrality) or full (every edge, slow for large"
+        " networks, default: full)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        choices=PROFILERS,
+        help="Profile the analysis and save the profile next to the results"
+        " (default: no profiling)",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=list(OUTPUT_FORMATS),
+        default="gpkg",
+        dest="output_format",
+        help="File format of the results: GeoPackage, GeoParquet or FlatGeobuf"
+        " (default: gpkg)",
+    )
+    parser.add_argument(
+        "--spatial_sort",
+        action="store_true",
+        help="Sort the saved edges along a Hilbert curve for fast area reads",
+    )
+    parser.add_argument(
+        "--row_group_size",
+        type=int,
+        default=65536,
+        help="Number of edges per GeoParquet row group (default: 65536)",
+    )
+    parser.add_argument(
+        "--exclude_same_nodes",
+        action="store_true",
+        help="Do not route from a node to itself (only for the geographical method)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for the random selections (default: no seed)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for the centrality calculation"
+        " and the routing (default: 1)",
+    )
+    parser.add_argument(
+        "--graph_backend",
+        type=str,
+        choices=GRAPH_BACKENDS,
+        default="networkx",
+        help="Graph representation for routing and centrality: NetworkX graph"
+        " or compact CSR arrays (default: networkx)",
+    )
+    parser.add_argument(
+        "--routing",
+        type=str,
+        choices=ROUTING_ALGORITHMS,
+        default="dijkstra",
+        help="Shortest path algorithm of the geographical method: Dijkstra"
+        " search per origin or contraction hierarchy queries, built once"
+        " and cached with the graph (default: dijkstra)",
+    )
+    parser.add_argument(
+        "--no_graph_cache",
+        action="store_true",
+        help="Do not read or write the processed graph cache",
+    )
+    parser.add_argument(
+        "--refresh_graph_cache",
+        action="store_true",
+        help="Download and process the graph again and replace its cache entry",
+    )
+    args = parser.parse_args()
+
+    if args.workers <= 0:
+        log.error("Number of workers must be a positive integer.")
+        sys.exit(1)
+    if args.centrality_method == "geographical" and args.weighting == "od":
+        if args.od_matrix is None or args.zones is None:
+            log.error("OD weighting requires --od_matrix and --zones.")
+            sys.exit(1)
+        if args.num_routes:
+            log.warning("OD weighting routes every pair of the matrix.")
+    elif args.centrality_method == "geographical":
+        if args.num_routes is None:
+            log.error("Number of routes must be specified for geographical analysis.")
+            sys.exit(1)
+        if args.num_routes <= 0:
+            log.error("Number of routes must be a positive integer.")
+            sys.exit(1)
+    if args.centrality_method == "networkx":
+        if args.num_routes:
+            log.warning("Networkx method does not support a number of routes.")
+        if args.weighting:
+            log.warning("Networkx method does not support a weighting method.")
+        if args.num_pivots is not None and args.num_pivots <= 0:
+            log.error("Number of pivots must be a positive integer.")
+            sys.exit(1)
+    if args.tile_size is not None:
+        if args.tile_size <= 0 or args.tile_buffer < 0:
+            log.error("Tile size must be positive and the buffer non-negative.")
+            sys.exit(1)
+        if args.centrality_method != "networkx":
+            log.warning("Only the networkx method supports tiles.")
+        elif args.num_pivots:
+            log.warning("Tiled analysis does not support a number of pivots.")
+    if args.tolerance is not None and args.tolerance <= 0:
+        log.error("Tolerance must be positive.")
+        sys.exit(1)
+    if args.snapshots and args.tolerance is None:
+        log.warning("Snapshots are only saved with --tolerance.")
+    if args.batch_size <= 0:
+        log.error("Batch size must be a positive integer.")
+        sys.exit(1)
+    if args.row_group_size <= 0:
+        log.error("Row group size must be a positive integer.")
+        sys.exit(1)
+    if args.routing != "dijkstra" and args.centrality_method != "geographical":
+        log.warning("Only the geographical method supports other routing.")
+    if args.centrality_method == "geographical" and args.num_pivots:
+        log.warning("Geographical method does not support a number of pivots.")
+
+    return args
+
+
+def parse_batch_arguments() -> Namespace:
+    """
+    Parse command-line arguments for the batch analysis.
+
+    Returns:
+        Namespace: The configured argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculate centrality for a list of jobs."
+    )
+    parser.add_argument(
+        "job_file",
+        type=str,
+        help="YAML or CSV job list with the columns location, centrality_method,"
+        " route_type, network_type, num_routes and weighting",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_folder",
+        type=str,
+        default="output_results",
+        nargs="?",
+        help="Output folder for results (default: output_results)",
+    )
+    parser.add_argument(
+        "-p",
+        "--parallel_jobs",
+        type=int,
+        default=1,
+        help="Number of jobs processed in parallel, jobs of the same location"
+        " and network type share one process (default: 1)",
+    )
+    parser.add_argument(
+        "--plot",
+        type=str,
+        choices=PLOT_MODES,
+        default="full",
+        help="Plot of the results: none, fast (bulk rendering of the edges with"
+        " the highest centrality) or full (every edge, slow for large"
+        " networks, default: full)",
+    )
+    parser.add_argument(
+        "--no_plot",
+        action="store_const",
+        const="none",
+        dest="plot",
+        help="Do not plot the centrality of the jobs, same as --plot none",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=list(OUTPUT_FORMATS),
+        default="gpkg",
+        dest="output_format",
+        help="File format of the results: GeoPackage, GeoParquet or FlatGeobuf"
+        " (default: gpkg)",
+    )
+    parser.add_argument(
+        "--spatial_sort",
+        action="store_true",
+        help="Sort the saved edges along a Hilbert curve for fast area reads",
+    )
+    parser.add_argument(
+        "--no_graph_cache",
+        action="store_true",
+        help="Do not read or write the processed graph cache",
+    )
+    args = parser.parse_args()
+
+    if args.parallel_jobs <= 0:
+        log.error("Number of parallel jobs must be a positive integer.")
+        sys.exit(1)
+
+    return args
+
+
+def parse_benchmark_arguments() -> Namespace:
+    """
+    Parse command-line arguments for the benchmark suite.
+
+    Returns:
+        Namespace: The configured argument namespace.
+    """
+    parser = argparse.ArgumentParser(
+        description="Time the analysis stages on synthetic and cached networks"
+        " without network access."
+    )
+    parser.add_argument(
+        "--grid_sizes",
+        type=int,
+        nargs="*",
+        default=[20, 50],
+        help="Number of nodes per row of the synthetic grid graphs (default: 20 50)",
+    )
+    parser.add_argument(
+        "--geometric_sizes",
+        type=int,
+        nargs="*",
+        default=[1000],
+        help="Number of nodes of the random geometric graphs (default: 1000)",
+    )
+    parser.add_argument(
+        "--no_osm",
+        action="store_true",
+        help="Do not benchmark the OSM extract of the test HTTP cache",
+    )
+    parser.add_argument(
+        "--cases",
+        type=str,
+        nargs="+",
+        choices=BENCHMARK_CASES,
+        default=None,
+        help="Benchmark cases to run (default: all)",
+    )
+    parser.add_argument(
+        "-n",
+        "--num_routes",
+        type=int,
+        default=1000,
+        help="Number of routes of the geographical cases (default: 1000)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs per case, the minimum and median are saved"
+        " (default: 3)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the random selections (default: 0)",
+    )
+    parser.add_argument(
+        "--history",
+        type=str,
+        default=BENCHMARK_HISTORY_PATH,
+        help="JSON file the results are appended to"
+        " (default: benchmark_history.json)",
+    )
+    args = parser.parse_args()
+
+    if args.repeat <= 0 or args.num_routes <= 0:
+        log.error("Number of runs and routes must be positive integers.")
+        sys.exit(1)
+
+    return args
@@ -0,0 +1,423 @@
+import math
+import hashlib
+import logging as log
+from dataclasses import dataclass, field
+from heapq import heappush, heappop
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.graph_cache import load_cached_object, save_cached_object
+from definitions import GRAPH_CACHE_DIR
+
+
+def _weight_digest(graph: CSRGraph, weight: str) -> str:
+    """
+    Get a digest of the node pairs and their weights.
+
+    Args:
+        graph (CSRGraph): Street network graph.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        str: Hex digest identifying the weighted node pairs.
+    """
+    digest = hashlib.sha1()
+    digest.update(graph.pair_u.tobytes())
+    digest.update(graph.pair_v.tobytes())
+    digest.update(graph.pair_weight(weight).tobytes())
+    return digest.hexdigest()
+
+
+@dataclass
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of a CSRGraph for fast point-to-point queries.
+
+    Nodes are contracted one by one in the order of ``rank``. Arcs are the
+    node pairs of the graph plus shortcuts, which replace the two arcs
+    ``arc_first`` and ``arc_second`` around a contracted node. Queries only
+    follow arcs to higher ranked nodes, from the origin along the upward
+    arcs and from the destination backwards along the downward arcs.
+
+    Attributes:
+        graph (CSRGraph): The underlying graph.
+        weight (str): Edge attribute used as weight.
+        weight_digest (str): Digest of the weighted node pairs of the graph.
+        rank (numpy.ndarray): Contraction order of every node.
+        arc_tail (numpy.ndarray): Start node of every arc.
+        arc_head (numpy.ndarray): End node of every arc.
+        arc_weight (numpy.ndarray): Weight of every arc.
+        arc_pair (numpy.ndarray): Node pair of an original arc, -1 for shortcuts.
+        arc_first (numpy.ndarray): First arc replaced by a shortcut.
+        arc_second (numpy.ndarray): Second arc replaced by a shortcut.
+        up_indptr (numpy.ndarray): CSR offsets of the upward arcs of every node.
+        up_arc (numpy.ndarray): Upward arcs, starting at their node.
+        down_indptr (numpy.ndarray): CSR offsets of the downward arcs of every node.
+        down_arc (numpy.ndarray): Downward arcs, ending at their node.
+    """
+
+    graph: CSRGraph
+    weight: str
+    weight_digest: str
+    rank: np.ndarray
+    arc_tail: np.ndarray
+    arc_head: np.ndarray
+    arc_weight: np.ndarray
+    arc_pair: np.ndarray
+    arc_first: np.ndarray
+    arc_second: np.ndarray
+    up_indptr: np.ndarray
+    up_arc: np.ndarray
+    down_indptr: np.ndarray
+    down_arc: np.ndarray
+    _lists: Optional[tuple] = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.graph)
+
+    @property
+    def node_index(self) -> Dict[Hashable, int]:
+        return self.graph.node_index
+
+    @property
+    def num_shortcuts(self) -> int:
+        return int(np.count_nonzero(self.arc_pair < 0))
+
+    def __getstate__(self) -> dict:
+        # the lists are rebuilt on demand
+        state = self.__dict__.copy()
+        state["_lists"] = None
+        return state
+
+    def _query_lists(self) -> tuple:
+        if self._lists is None:
+            self._lists = (
+                self.up_indptr.tolist(),
+                self.up_arc.tolist(),
+                self.down_indptr.tolist(),
+                self.down_arc.tolist(),
+                self.arc_tail.tolist(),
+                self.arc_head.tolist(),
+                self.arc_weight.tolist(),
+                self.arc_pair.tolist(),
+                self.arc_first.tolist(),
+                self.arc_second.tolist(),
+            )
+        return self._lists
+
+    def shortest_path_pairs(self, origin: int, destination: int) -> Optional[List[int]]:
+        """
+        Get the node pairs of a shortest path (bidirectional upward search).
+
+        Among several shortest paths another one than Dijkstra's may be found.
+
+        Args:
+            origin (int): Origin node position.
+            destination (int): Destination node position.
+
+        Returns:
+            list or None: Node pairs along the path, None if there is no path.
+        """
+        if origin == destination:
+            return []
+        (
+            up_indptr,
+            up_arc,
+            down_indptr,
+            down_arc,
+            arc_tail,
+            arc_head,
+            arc_weight,
+            arc_pair,
+            arc_first,
+            arc_second,
+        ) = self._query_lists()
+
+        # forward search along upward arcs, backward search along downward arcs
+        distances = ({origin: 0.0}, {destination: 0.0})
+        pred_arc = ({origin: None}, {destination: None})
+        queues = ([(0.0, origin)], [(0.0, destination)])
+        done = (set(), set())
+        best = math.inf
+        meeting_node = None
+        while True:
+            forward_min = queues[0][0][0] if queues[0] else math.inf
+            backward_min = queues[1][0][0] if queues[1] else math.inf
+            if min(forward_min, backward_min) >= best:
+                break
+            side = 0 if forward_min <= backward_min else 1
+            dist, v = heappop(queues[side])
+            if v in done[side]:
+                continue
+            done[side].add(v)
+            other_dist = distances[1 - side].get(v)
+            if other_dist is not None and dist + other_dist < best:
+                best = dist + other_dist
+                meeting_node = v
+            if side == 0:
+                arcs = up_arc[up_indptr[v] : up_indptr[v + 1]]
+                ends = arc_head
+            else:
+                arcs = down_arc[down_indptr[v] : down_indptr[v + 1]]
+                ends = arc_tail
+            side_distances = distances[side]
+            side_pred = pred_arc[side]
+            for arc in arcs:
+                w = ends[arc]
+                vw_dist = dist + arc_weight[arc]
+                if vw_dist < side_distances.get(w, math.inf):
+                    side_distances[w] = vw_dist
+                    side_pred[w] = arc
+                    heappush(queues[side], (vw_dist, w))
+        if meeting_node is None:
+            return None
+
+        arcs = []
+        node = meeting_node
+        while pred_arc[0][node] is not None:
+            arcs.append(pred_arc[0][node])
+            node = arc_tail[pred_arc[0][node]]
+        arcs.reverse()
+        node = meeting_node
+        while pred_arc[1][node] is not None:
+            arcs.append(pred_arc[1][node])
+            node = arc_head[pred_arc[1][node]]
+
+        # unpack the shortcuts into node pairs
+        pairs = []
+        stack = arcs[::-1]
+        while stack:
+            arc = stack.pop()
+            if arc_pair[arc] >= 0:
+                pairs.append(arc_pair[arc])
+            else:
+                stack.append(arc_second[arc])
+                stack.append(arc_first[arc])
+        return pairs
+
+    def shortest_path_edges(self, origin: int, destination: int) -> Optional[List[int]]:
+        """
+        Get the edges of a shortest path between two nodes.
+
+        Args:
+            origin (int): Origin node position.
+            destination (int): Destination node position.
+
+        Returns:
+            list or None: Edge IDs along the path, None if there is no path.
+        """
+        pairs = self.shortest_path_pairs(origin, destination)
+        if pairs is None:
+            return None
+        pair_edge = self.graph.adjacency(self.weight)[4]
+        return [pair_edge[pair] for pair in pairs]
+
+
+def build_contraction_hierarchy(
+    graph: CSRGraph, weight: str, witness_settle_limit: int = 50
+) -> ContractionHierarchy:
+    """
+    Contract the nodes of a graph into a contraction hierarchy.
+
+    Nodes are contracted by their edge difference (shortcuts added minus
+    arcs removed) plus the number of contracted neighbours and their level
+    in the hierarchy. Priorities only grow, so they are updated lazily when
+    a node comes first in the queue.
+    A shortcut is skipped when a bounded witness search finds a path that is
+    at most as long; stopping the search early only adds shortcuts and never
+    changes distances.
+
+    Args:
+        graph (CSRGraph): Street network graph.
+        weight (str): Edge attribute used as weight.
+        witness_settle_limit (int, optional): Maximum number of nodes settled
+         by a witness search. Defaults to 50.
+
+    Returns:
+        ContractionHierarchy: The contraction hierarchy.
+    """
+    _, pair_u, pair_v, pair_weight, _ = graph.adjacency(weight)
+    n = len(graph)
+    arc_tail, arc_head, arc_weight, arc_pair = [], [], [], []
+    arc_first, arc_second = [], []
+    out_arcs = [{} for _ in range(n)]
+    in_arcs = [{} for _ in range(n)]
+
+    def add_arc(u, v, value, pair, first, second):
+        arc = len(arc_tail)
+        arc_tail.append(u)
+        arc_head.append(v)
+        arc_weight.append(value)
+        arc_pair.append(pair)
+        arc_first.append(first)
+        arc_second.append(second)
+        out_arcs[u][v] = arc
+        in_arcs[v][u] = arc
+
+    for pair, (u, v) in enumerate(zip(pair_u, pair_v)):
+        # loops are never part of a shortest path
+        if u != v:
+            add_arc(u, v, pair_weight[pair], pair, -1, -1)
+
+    def witness_distances(source, excluded, targets, max_distance):
+        distances = {source: 0.0}
+        remaining = set(targets)
+        queue = [(0.0, source)]
+        settled = 0
+        while queue and remaining and settled < witness_settle_limit:
+            dist, x = heappop(queue)
+            if dist > distances[x]:
+                continue
+            if dist > max_distance:
+                break
+            remaining.discard(x)
+            settled += 1
+            for y, arc in out_arcs[x].items():
+                if y == excluded:
+                    continue
+                xy_dist = dist + arc_weight[arc]
+                if xy_dist < distances.get(y, math.inf):
+                    distances[y] = xy_dist
+                    heappush(queue, (xy_dist, y))
+        return distances
+
+    def needed_shortcuts(v):
+        shortcuts = []
+        outgoing = out_arcs[v]
+        for u, in_arc in in_arcs[v].items():
+            targets = {
+                x: arc_weight[in_arc] + arc_weight[out_arc]
+                for x, out_arc in outgoing.items()
+                if x != u
+            }
+            if not targets:
+                continue
+            distances = witness_distances(u, v, targets, max(targets.values()))
+            for x, value in targets.items():
+                if distances.get(x, math.inf) > value:
+                    shortcuts.append((u, x, value, in_arc, outgoing[x]))
+        return shortcuts
+
+    contracted_neighbours = [0] * n
+    level = [0] * n
+
+    def priority(v, shortcuts):
+        return (
+            len(shortcuts)
+            - len(in_arcs[v])
+            - len(out_arcs[v])
+            + contracted_neighbours[v]
+            + level[v]
+        )
+
+    queue = [(priority(v, needed_shortcuts(v)), v) for v in range(n)]
+    queue.sort()
+    rank = np.full(n, -1, dtype=np.int64)
+    up_arcs = [None] * n
+    down_arcs = [None] * n
+    for next_rank in range(n):
+        # lazy update: contract the node only if it is still the best
+        while True:
+            _, v = heappop(queue)
+            shortcuts = needed_shortcuts(v)
+            current = priority(v, shortcuts)
+            if not queue or current <= queue[0][0]:
+                break
+            heappush(queue, (current, v))
+
+        rank[v] = next_rank
+        up_arcs[v] = list(out_arcs[v].values())
+        down_arcs[v] = list(in_arcs[v].values())
+        neighbours = set(in_arcs[v]) | set(out_arcs[v])
+        for u in in_arcs[v]:
+            del out_arcs[u][v]
+        for x in out_arcs[v]:
+            del in_arcs[x][v]
+        out_arcs[v] = {}
+        in_arcs[v] = {}
+        for u, x, value, first, second in shortcuts:
+            existing = out_arcs[u].get(x)
+            if existing is None or arc_weight[existing] > value:
+                add_arc(u, x, value, -1, first, second)
+        # the priorities of the neighbours only grow, their queue entries
+        # are updated when they are popped
+        for u in neighbours:
+            contracted_neighbours[u] += 1
+            level[u] = max(level[u], level[v] + 1)
+
+    def to_csr(node_arcs):
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(arcs) for arcs in node_arcs], out=indptr[1:])
+        arcs = np.array([arc for arcs in node_arcs for arc in arcs], dtype=np.int64)
+        return indptr, arcs
+
+    up_indptr, up_arc = to_csr(up_arcs)
+    down_indptr, down_arc = to_csr(down_arcs)
+    hierarchy = ContractionHierarchy(
+        graph=graph,
+        weight=weight,
+        weight_digest=_weight_digest(graph, weight),
+        rank=rank,
+        arc_tail=np.array(arc_tail, dtype=np.int64),
+        arc_head=np.array(arc_head, dtype=np.int64),
+        arc_weight=np.array(arc_weight, dtype=float),
+        arc_pair=np.array(arc_pair, dtype=np.int64),
+        arc_first=np.array(arc_first, dtype=np.int64),
+        arc_second=np.array(arc_second, dtype=np.int64),
+        up_indptr=up_indptr,
+        up_arc=up_arc,
+        down_indptr=down_indptr,
+        down_arc=down_arc,
+    )
+    log.info(
+        f"Contraction hierarchy with {hierarchy.num_shortcuts} shortcuts"
+        f" for {n} nodes."
+    )
+    return hierarchy
+
+
+def get_contraction_hierarchy(
+    graph: CSRGraph,
+    weight: str,
+    cache_key: Optional[str] = None,
+    use_cache: bool = True,
+    cache_dir: str = GRAPH_CACHE_DIR,
+) -> ContractionHierarchy:
+    """
+    Get the contraction hierarchy of a graph, cached alongside the graph.
+
+    A cached hierarchy is only used if the weighted node pairs of the graph
+    did not change, e.g. by other travel speeds.
+
+    Args:
+        graph (CSRGraph): Street network graph.
+        weight (str): Edge attribute used as weight.
+        cache_key (str, optional): Cache key of the graph. Defaults to None
+         (no caching).
+        use_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+
+    Returns:
+        ContractionHierarchy: The contraction hierarchy.
+    """
+    suffix = f".ch_{weight}.pkl"
+    use_cache = use_cache and cache_key is not None
+    if use_cache:
+        cached = load_cached_object(cache_key, suffix, cache_dir)
+        if cached is not None and cached["weight_digest"] == _weight_digest(
+            graph, weight
+        ):
+            log.info("Loaded contraction hierarchy from the graph cache.")
+            return ContractionHierarchy(graph=graph, **cached)
+
+    log.info(f"Build contraction hierarchy for the weight '{weight}'.")
+    hierarchy = build_contraction_hierarchy(graph, weight)
+    if use_cache:
+        # the graph itself is cached separately
+        state = hierarchy.__getstate__()
+        del state["graph"], state["_lists"]
+        save_cached_object(state, cache_key, suffix, cache_dir)
+    return hierarchy
@@ -0,0 +1,394 @@
+import logging as log
+from dataclasses import dataclass, field
+from heapq import heappush, heappop
+from itertools import count
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import networkx as nx
+import numpy as np
+
+
+# edge attributes stored as weight arrays
+CSR_WEIGHTS = ["length", "travel_time"]
+
+
+@dataclass
+class CSRGraph:
+    """
+    Compact array representation of a street network graph.
+
+    Nodes are numbered by their position in ``node_ids``. The edges are
+    sorted by source and target node, so the edge ID is also the position
+    in the CSR adjacency: the outgoing edges of node ``i`` are
+    ``indptr[i]:indptr[i + 1]``. Parallel edges are neighbours in this order
+    and are grouped into node pairs, which the routing uses with the
+    minimal weight of their edges like NetworkX does for multigraphs.
+
+    Attributes:
+        node_ids (numpy.ndarray): OSM ID of every node.
+        x (numpy.ndarray): Longitude of every node.
+        y (numpy.ndarray): Latitude of every node.
+        edge_u (numpy.ndarray): Source node of every edge.
+        edge_v (numpy.ndarray): Target node of every edge.
+        edge_keys (numpy.ndarray): Multigraph key of every edge.
+        indptr (numpy.ndarray): CSR offsets of the outgoing edges of every node.
+        weights (dict): Edge weight arrays keyed by attribute name.
+        edge_pair (numpy.ndarray): Node pair of every edge.
+        pair_indptr (numpy.ndarray): CSR offsets of the node pairs of every node.
+        pair_u (numpy.ndarray): Source node of every node pair.
+        pair_v (numpy.ndarray): Target node of every node pair.
+    """
+
+    node_ids: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    edge_u: np.ndarray
+    edge_v: np.ndarray
+    edge_keys: np.ndarray
+    indptr: np.ndarray
+    weights: Dict[str, np.ndarray]
+    edge_pair: np.ndarray
+    pair_indptr: np.ndarray
+    pair_u: np.ndarray
+    pair_v: np.ndarray
+    _adjacency: Dict[str, tuple] = field(default_factory=dict, repr=False)
+    _node_index: Optional[Dict[Hashable, int]] = field(default=None, repr=False)
+    # shared memory blocks of attached arrays, closed after the arrays
+    _buffers: list = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_graph(cls, graph: nx.MultiDiGraph) -> "CSRGraph":
+        """
+        Build the array representation of an OSMnx graph.
+
+        Missing weights are set to 1 as in NetworkX.
+
+        Args:
+            graph (networkx.MultiDiGraph): Street network graph.
+
+        Returns:
+            CSRGraph: Array representation of the graph.
+        """
+        node_ids = np.array(list(graph.nodes))
+        node_index = {node: i for i, node in enumerate(graph.nodes)}
+        x = np.array([data.get("x", np.nan) for _, data in graph.nodes(data=True)])
+        y = np.array([data.get("y", np.nan) for _, data in graph.nodes(data=True)])
+
+        num_edges = graph.number_of_edges()
+        edge_u = np.empty(num_edges, dtype=np.int64)
+        edge_v = np.empty(num_edges, dtype=np.int64)
+        edge_keys = []
+        edge_weights = {name: np.full(num_edges, np.nan) for name in CSR_WEIGHTS}
+        for i, (u, v, key, data) in enumerate(graph.edges(keys=True, data=True)):
+            edge_u[i] = node_index[u]
+            edge_v[i] = node_index[v]
+            edge_keys.append(key)
+            for name, values in edge_weights.items():
+                values[i] = data.get(name, np.nan)
+        edge_keys = np.array(edge_keys)
+
+        # sort the edges by source and target, keeping the key order
+        order = np.lexsort((edge_v, edge_u))
+        edge_u = edge_u[order]
+        edge_v = edge_v[order]
+        edge_keys = edge_keys[order]
+        weights = {
+            name: np.where(np.isnan(values[order]), 1.0, values[order])
+            for name, values in edge_weights.items()
+            if not np.isnan(values).all()
+        }
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_u, minlength=len(node_ids)), out=indptr[1:])
+
+        # group parallel edges into node pairs
+        new_pair = np.ones(num_edges, dtype=bool)
+        new_pair[1:] = (edge_u[1:] != edge_u[:-1]) | (edge_v[1:] != edge_v[:-1])
+        edge_pair = np.cumsum(new_pair) - 1
+        pair_u = edge_u[new_pair]
+        pair_v = edge_v[new_pair]
+        pair_indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_u, minlength=len(node_ids)), out=pair_indptr[1:])
+
+        csr_graph = cls(
+            node_ids=node_ids,
+            x=x,
+            y=y,
+            edge_u=edge_u,
+            edge_v=edge_v,
+            edge_keys=edge_keys,
+            indptr=indptr,
+            weights=weights,
+            edge_pair=edge_pair,
+            pair_indptr=pair_indptr,
+            pair_u=pair_u,
+            pair_v=pair_v,
+        )
+        csr_graph._node_index = node_index
+        return csr_graph
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_u)
+
+    @property
+    def num_pairs(self) -> int:
+        return len(self.pair_u)
+
+    @property
+    def node_index(self) -> Dict[Hashable, int]:
+        """
+        Get the position of every OSM node ID.
+
+        Returns:
+            dict: Node positions keyed by OSM ID.
+        """
+        if self._node_index is None:
+            self._node_index = {
+                node: i for i, node in enumerate(self.node_ids.tolist())
+            }
+        return self._node_index
+
+    def edge_weight(self, weight: str) -> np.ndarray:
+        """
+        Get the weight of every edge.
+
+        Args:
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            numpy.ndarray: Weight of every edge.
+        """
+        try:
+            return self.weights[weight]
+        except KeyError:
+            log.error(
+                f"The graph has no edge weight {weight}."
+                f" Available weights: {list(self.weights)}"
+            )
+            raise KeyError(weight)
+
+    def pair_weight(self, weight: str) -> np.ndarray:
+        """
+        Get the minimal weight of the parallel edges of every node pair.
+
+        Args:
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            numpy.ndarray: Weight of every node pair.
+        """
+        edge_weight = self.edge_weight(weight)
+        pair_start = np.flatnonzero(np.diff(self.edge_pair, prepend=-1))
+        return np.minimum.reduceat(edge_weight, pair_start)
+
+    def adjacency(self, weight: str) -> Tuple[list, list, list, list, list]:
+        """
+        Get the node pair adjacency as lists for fast iteration in Python.
+
+        Args:
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            tuple: Lists with the pair offsets of every node and the source
+             node, the target node, the weight and the edge with the minimal
+             weight of every pair.
+        """
+        if weight not in self._adjacency:
+            pair_weight = self.pair_weight(weight)
+            edge_weight = self.edge_weight(weight)
+            # first edge with the minimal weight represents the pair in routes
+            is_min = edge_weight == pair_weight[self.edge_pair]
+            candidates = np.flatnonzero(is_min)
+            pair_edge = np.full(self.num_pairs, self.num_edges, dtype=np.int64)
+            np.minimum.at(pair_edge, self.edge_pair[candidates], candidates)
+            self._adjacency[weight] = (
+                self.pair_indptr.tolist(),
+                self.pair_u.tolist(),
+                self.pair_v.tolist(),
+                pair_weight.tolist(),
+                pair_edge.tolist(),
+            )
+        return self._adjacency[weight]
+
+    def edge_tuples(self, edge_ids: Optional[np.ndarray] = None) -> List[tuple]:
+        """
+        Map edge IDs back to (u, v, key) tuples of the OSMnx graph.
+
+        Args:
+            edge_ids (numpy.ndarray, optional): Edge IDs. Defaults to all edges.
+
+        Returns:
+            list: (u, v, key) tuple of every edge.
+        """
+        if edge_ids is None:
+            edge_ids = np.arange(self.num_edges)
+        return list(
+            zip(
+                self.node_ids[self.edge_u[edge_ids]].tolist(),
+                self.node_ids[self.edge_v[edge_ids]].tolist(),
+                self.edge_keys[edge_ids].tolist(),
+            )
+        )
+
+    def pair_values_to_edges(
+        self, pair_values: Dict[int, float], weight: str
+    ) -> Dict[tuple, float]:
+        """
+        Distribute node pair values over the parallel edges with the minimal weight.
+
+        Args:
+            pair_values (dict): Values keyed by node pair.
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            dict: Values keyed by (u, v, key).
+        """
+        values = np.zeros(self.num_pairs)
+        values[list(pair_values)] = list(pair_values.values())
+        is_min = self.edge_weight(weight) == self.pair_weight(weight)[self.edge_pair]
+        ties = np.bincount(self.edge_pair[is_min], minlength=self.num_pairs)
+        edge_values = np.where(
+            is_min, values[self.edge_pair] / ties[self.edge_pair], 0.0
+        )
+        return dict(zip(self.edge_tuples(), edge_values.tolist()))
+
+    def single_source_dependencies(
+        self, source: int, weight: str, targets: Optional[Set[int]] = None
+    ) -> Dict[int, float]:
+        """
+        Calculate the node pair dependencies of a single source (Brandes accumulation).
+
+        Args:
+            source (int): Source node position.
+            weight (str): Edge attribute used as weight.
+            targets (set, optional): Node positions counted as path targets.
+             Defaults to None (all nodes).
+
+        Returns:
+            dict: Dependency of the source on each node pair of its shortest
+             path DAG.
+        """
+        pair_indptr, pair_u, pair_v, pair_weight, _ = self.adjacency(weight)
+
+        S = []
+        P = {source: []}
+        sigma = {source: 1.0}
+        D = {}
+        seen = {source: 0}
+        c = count()
+        Q = []
+        heappush(Q, (0, next(c), source, source))
+        while Q:
+            dist, _, pred, v = heappop(Q)
+            if v in D:
+                continue
+            if v != source:
+                sigma[v] += sigma[pred]
+            S.append(v)
+            D[v] = dist
+            for pair in range(pair_indptr[v], pair_indptr[v + 1]):
+                w = pair_v[pair]
+                vw_dist = dist + pair_weight[pair]
+                if w not in D and (w not in seen or vw_dist < seen[w]):
+                    seen[w] = vw_dist
+                    heappush(Q, (vw_dist, next(c), v, w))
+                    sigma[w] = 0.0
+                    P[w] = [pair]
+                elif vw_dist == seen[w]:
+                    sigma[w] += sigma[v]
+                    P[w].append(pair)
+
+        dependencies = {}
+        delta = dict.fromkeys(S, 0)
+        while S:
+            w = S.pop()
+            is_target = targets is None or w in targets
+            coeff = (is_target + delta[w]) / sigma[w]
+            for pair in P[w]:
+                v = pair_u[pair]
+                c = sigma[v] * coeff
+                dependencies[pair] = c
+                delta[v] += c
+        return dependencies
+
+    def shortest_path_tree(
+        self, origin: int, destinations: Iterable[int], weight: str
+    ) -> Dict[int, Optional[int]]:
+        """
+        Grow a shortest path tree (Dijkstra) until all destinations are settled.
+
+        Args:
+            origin (int): Origin node position.
+            destinations (iterable): Destination node positions.
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            dict: Node pair leading to every reached node (None for the origin).
+             Settled destinations are reached on a shortest path.
+        """
+        pair_indptr, _, pair_v, pair_weight, _ = self.adjacency(weight)
+        remaining = set(destinations)
+        pred_pair = {origin: None}
+        seen = {origin: 0}
+        done = set()
+        Q = [(0, origin)]
+        while Q and remaining:
+            dist, v = heappop(Q)
+            if v in done:
+                continue
+            done.add(v)
+            remaining.discard(v)
+            for pair in range(pair_indptr[v], pair_indptr[v + 1]):
+                w = pair_v[pair]
+                vw_dist = dist + pair_weight[pair]
+                if w not in done and (w not in seen or vw_dist < seen[w]):
+                    seen[w] = vw_dist
+                    pred_pair[w] = pair
+                    heappush(Q, (vw_dist, w))
+        return {node: pred_pair[node] for node in done}
+
+    def path_edges(
+        self, pred_pair: Dict[int, Optional[int]], destination: int, weight: str
+    ) -> Optional[List[int]]:
+        """
+        Extract the edges of the path to a destination from a shortest path tree.
+
+        Args:
+            pred_pair (dict): Shortest path tree, see `shortest_path_tree`.
+            destination (int): Destination node position.
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            list or None: Edge IDs along the path, None if the destination was
+             not reached.
+        """
+        if destination not in pred_pair:
+            return None
+        _, pair_u, _, _, pair_edge = self.adjacency(weight)
+        path = []
+        node = destination
+        while pred_pair[node] is not None:
+            pair = pred_pair[node]
+            path.append(pair_edge[pair])
+            node = pair_u[pair]
+        return path[::-1]
+
+    def shortest_path_edges(
+        self, origin: int, destination: int, weight: str
+    ) -> Optional[List[int]]:
+        """
+        Get the edges of the shortest path between two nodes (Dijkstra).
+
+        Args:
+            origin (int): Origin node position.
+            destination (int): Destination node position.
+            weight (str): Edge attribute used as weight.
+
+        Returns:
+            list or None: Edge IDs along the path, None if there is no path.
+        """
+        pred_pair = self.shortest_path_tree(origin, [destination], weight)
+        return self.path_edges(pred_pair, destination, weight)
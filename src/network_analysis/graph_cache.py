@@ -0,0 +1,186 @@
+import os
+import json
+import pickle
+import hashlib
+import logging as log
+from typing import Any, Optional
+
+import networkx as nx
+import osmnx as ox
+
+from definitions import GRAPH_CACHE_DIR, GRAPH_CACHE_MAX_BYTES
+
+GRAPH_CACHE_SUFFIX = ".graph.pkl"
+
+
+def graph_cache_key(location: str, network_type: str, simplify: bool) -> str:
+    """
+    Get the cache key of a processed graph.
+
+    The key covers everything that changes the graph returned by
+    ``ox.graph_from_place``, including the OSMnx version.
+
+    Args:
+        location (str): The location (place name) of the graph.
+        network_type (str): The type of network.
+        simplify (bool): Whether the graph topology is simplified.
+
+    Returns:
+        str: Hex digest identifying the graph.
+    """
+    parameters = {
+        "location": location,
+        "network_type": network_type,
+        "simplify": simplify,
+        "osmnx_version": ox.__version__,
+    }
+    return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+def _cache_path(cache_key: str, cache_dir: str, suffix: str) -> str:
+    return os.path.join(cache_dir, cache_key + suffix)
+
+
+def load_cached_object(
+    cache_key: str, suffix: str, cache_dir: str = GRAPH_CACHE_DIR
+) -> Optional[Any]:
+    """
+    Load an object stored alongside a cached graph, e.g. routing indices.
+
+    Args:
+        cache_key (str): Cache key of the graph.
+        suffix (str): File name suffix of the object.
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+
+    Returns:
+        object or None: The cached object, None if it is not cached or cannot
+         be read.
+    """
+    path = _cache_path(cache_key, cache_dir, suffix)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as file:
+            cached_object = pickle.load(file)
+    except Exception as e:
+        log.warning(f"Ignoring unreadable graph cache file {path}: {e}")
+        return None
+    # mark as recently used for the size cap
+    os.utime(path)
+    return cached_object
+
+
+def save_cached_object(
+    cached_object: Any,
+    cache_key: str,
+    suffix: str,
+    cache_dir: str = GRAPH_CACHE_DIR,
+    max_bytes: int = GRAPH_CACHE_MAX_BYTES,
+) -> None:
+    """
+    Save an object alongside a cached graph.
+
+    The file is written to a temporary path first, so concurrent runs never
+    read a partial file. Afterwards the cache is trimmed to its size cap.
+
+    Args:
+        cached_object (object): Object to cache.
+        cache_key (str): Cache key of the graph.
+        suffix (str): File name suffix of the object.
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+        max_bytes (int, optional): Size cap of the cache directory.
+         Defaults to GRAPH_CACHE_MAX_BYTES.
+    """
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _cache_path(cache_key, cache_dir, suffix)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(cached_object, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        log.info(f"Cached to: {path}")
+        enforce_cache_size(cache_dir, max_bytes)
+    except OSError as e:
+        log.warning(f"Could not write graph cache: {e}")
+
+
+def load_cached_graph(
+    cache_key: str, cache_dir: str = GRAPH_CACHE_DIR
+) -> Optional[nx.MultiDiGraph]:
+    """
+    Load a processed graph from the on-disk cache.
+
+    Args:
+        cache_key (str): Cache key of the graph.
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+
+    Returns:
+        networkx.MultiDiGraph or None: The cached graph, None if it is not
+         cached or cannot be read.
+    """
+    return load_cached_object(cache_key, GRAPH_CACHE_SUFFIX, cache_dir)
+
+
+def save_cached_graph(
+    graph: nx.MultiDiGraph,
+    cache_key: str,
+    cache_dir: str = GRAPH_CACHE_DIR,
+    max_bytes: int = GRAPH_CACHE_MAX_BYTES,
+) -> None:
+    """
+    Save a processed graph to the on-disk cache.
+
+    Args:
+        graph (networkx.MultiDiGraph): Graph to cache.
+        cache_key (str): Cache key of the graph.
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+        max_bytes (int, optional): Size cap of the cache directory.
+         Defaults to GRAPH_CACHE_MAX_BYTES.
+    """
+    save_cached_object(graph, cache_key, GRAPH_CACHE_SUFFIX, cache_dir, max_bytes)
+
+
+def enforce_cache_size(
+    cache_dir: str = GRAPH_CACHE_DIR, max_bytes: int = GRAPH_CACHE_MAX_BYTES
+) -> None:
+    """
+    Delete the least recently used cache files until the cache fits its size cap.
+
+    Args:
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+        max_bytes (int, optional): Size cap of the cache directory.
+         Defaults to GRAPH_CACHE_MAX_BYTES.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    files = [
+        entry
+        for entry in os.scandir(cache_dir)
+        if entry.is_file() and not entry.name.endswith(".tmp")
+    ]
+    total = sum(entry.stat().st_size for entry in files)
+    for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        total -= entry.stat().st_size
+        os.remove(entry.path)
+        log.info(f"Removed {entry.name} from the graph cache (size cap).")
+
+
+def clear_graph_cache(
+    cache_key: Optional[str] = None, cache_dir: str = GRAPH_CACHE_DIR
+) -> None:
+    """
+    Invalidate cached graphs and the objects stored alongside them.
+
+    Args:
+        cache_key (str, optional): Only remove the files of this graph.
+         Defaults to None (remove all cached graphs).
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and (cache_key is None or entry.name.startswith(cache_key)):
+            os.remove(entry.path)
+    log.info("Graph cache cleared.")
@@ -0,0 +1,248 @@
+import math
+import pickle
+import logging as log
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import networkx as nx
+
+from network_analysis.betweenness import (
+    _add_edge_keys,
+    single_source_shortest_path_dag,
+)
+
+
+@dataclass
+class CentralityBaseline:
+    """
+    Exact edge betweenness centrality together with the per-source state
+    needed to update it after network changes.
+
+    The shortest path DAG of every source is kept as the keys of its
+    dependencies, so the baseline needs memory in the order of the number of
+    nodes times the DAG size.
+
+    Attributes:
+        weight (str): Edge attribute used as weight.
+        distances (dict): Distance of every reachable node, per source.
+        dependencies (dict): Dependency on every (v, w) edge of the shortest
+         path DAG, per source.
+        totals (dict): Unscaled betweenness keyed by (u, v).
+    """
+
+    weight: str
+    distances: Dict[Hashable, Dict[Hashable, float]] = field(default_factory=dict)
+    dependencies: Dict[Hashable, Dict[Tuple, float]] = field(default_factory=dict)
+    totals: Dict[Tuple, float] = field(default_factory=dict)
+
+    def _add_source(self, graph: nx.MultiDiGraph, source: Hashable) -> None:
+        dependencies, distances = single_source_shortest_path_dag(
+            graph, source, self.weight
+        )
+        for edge, value in dependencies.items():
+            self.totals[edge] = self.totals.get(edge, 0.0) + value
+        self.dependencies[source] = dependencies
+        self.distances[source] = distances
+
+    def _remove_source(self, source: Hashable) -> None:
+        for edge, value in self.dependencies.pop(source).items():
+            self.totals[edge] -= value
+        del self.distances[source]
+
+    def centrality(self, graph: nx.MultiDiGraph) -> Dict[Tuple, float]:
+        """
+        Get the normalized edge betweenness centrality of the current graph.
+
+        Args:
+            graph (networkx.MultiDiGraph): Street network graph of the baseline.
+
+        Returns:
+            dict: Centrality keyed by (u, v, key), as from
+             ``nx.edge_betweenness_centrality``.
+        """
+        betweenness = dict.fromkeys(graph.edges(), 0.0)
+        for edge, value in self.totals.items():
+            if edge in betweenness:
+                betweenness[edge] = value
+        n = len(graph)
+        if n > 1:
+            scale = 1 / (n * (n - 1))
+            betweenness = {edge: value * scale for edge, value in betweenness.items()}
+        return _add_edge_keys(graph, betweenness, self.weight)
+
+
+def build_centrality_baseline(
+    graph: nx.MultiDiGraph, weight: str
+) -> CentralityBaseline:
+    """
+    Calculate the exact edge betweenness centrality and keep the per-source state.
+
+    Args:
+        graph (networkx.MultiDiGraph): Directed street network graph.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        CentralityBaseline: Baseline for incremental updates.
+    """
+    if not graph.is_directed():
+        log.error("Incremental centrality updates require a directed graph.")
+        raise ValueError("Incremental centrality updates require a directed graph.")
+    log.info(f"Build centrality baseline for {len(graph)} sources.")
+    baseline = CentralityBaseline(weight=weight)
+    for source in graph.nodes:
+        baseline._add_source(graph, source)
+    return baseline
+
+
+def _pair_weight(graph: nx.MultiDiGraph, u: Hashable, v: Hashable, weight: str):
+    """
+    Get the weight of the shortest edge from u to v, None if there is none.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street network graph.
+        u (Hashable): Start node.
+        v (Hashable): End node.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        float or None: Minimum weight over the parallel edges.
+    """
+    if not graph.has_edge(u, v):
+        return None
+    return min(attr.get(weight, 1) for attr in graph[u][v].values())
+
+
+def _is_affected(
+    baseline: CentralityBaseline,
+    source: Hashable,
+    changed_pairs: Dict[Tuple, Tuple[Optional[float], Optional[float]]],
+) -> bool:
+    """
+    Check if changed edge weights alter the shortest path DAG of a source.
+
+    A longer or removed edge only matters if it is part of the DAG. A
+    shorter or new edge only matters if it reaches its end node at most as
+    early as the current shortest paths, which also adds tied paths.
+
+    Args:
+        baseline (CentralityBaseline): Baseline before the changes.
+        source (Hashable): Source node.
+        changed_pairs (dict): Old and new weight per (u, v), None for no edge.
+
+    Returns:
+        bool: Whether the source has to be recalculated.
+    """
+    distances = baseline.distances[source]
+    dependencies = baseline.dependencies[source]
+    for (u, v), (old_weight, new_weight) in changed_pairs.items():
+        if new_weight is None or (old_weight is not None and new_weight > old_weight):
+            if (u, v) in dependencies:
+                return True
+        elif u in distances and distances[u] + new_weight <= distances.get(v, math.inf):
+            return True
+    return False
+
+
+def update_centrality(
+    graph: nx.MultiDiGraph,
+    baseline: CentralityBaseline,
+    removals: Optional[List[Tuple[Hashable, Hashable, int]]] = None,
+    insertions: Optional[List[Tuple[Hashable, Hashable, Dict[str, Any]]]] = None,
+    weight_changes: Optional[Dict[Tuple[Hashable, Hashable, int], float]] = None,
+) -> List[Hashable]:
+    """
+    Apply edge changes to a graph and update its centrality baseline.
+
+    Only the sources whose shortest path DAG is affected by the changes are
+    recalculated. Afterwards ``baseline.centrality(graph)`` equals a full
+    recalculation on the changed graph up to floating point rounding.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street network graph of the baseline,
+         changed in place.
+        baseline (CentralityBaseline): Baseline of the graph, updated in place.
+        removals (list, optional): (u, v, key) of removed edges.
+         Defaults to None.
+        insertions (list, optional): (u, v, attributes) of new edges, the
+         attributes contain the weight. New nodes become sources.
+         Defaults to None.
+        weight_changes (dict, optional): New weight keyed by (u, v, key).
+         Defaults to None.
+
+    Returns:
+        list: The recalculated sources.
+    """
+    removals = removals or []
+    insertions = insertions or []
+    weight_changes = weight_changes or {}
+    weight = baseline.weight
+
+    pairs = {(u, v) for u, v, _ in removals}
+    pairs.update((u, v) for u, v, _ in insertions)
+    pairs.update((u, v) for u, v, _ in weight_changes)
+    old_weights = {(u, v): _pair_weight(graph, u, v, weight) for u, v in pairs}
+
+    # check all edges before changing the graph
+    for u, v, key in removals + list(weight_changes):
+        if not graph.has_edge(u, v, key):
+            log.error(f"Edge ({u}, {v}, {key}) does not exist.")
+            raise KeyError(f"Edge ({u}, {v}, {key}) does not exist.")
+
+    for (u, v, key), value in weight_changes.items():
+        graph.edges[u, v, key][weight] = value
+    for u, v, key in removals:
+        graph.remove_edge(u, v, key)
+    for u, v, attributes in insertions:
+        graph.add_edge(u, v, **attributes)
+
+    changed_pairs = {}
+    for pair, old_weight in old_weights.items():
+        new_weight = _pair_weight(graph, *pair, weight)
+        if new_weight != old_weight:
+            changed_pairs[pair] = (old_weight, new_weight)
+
+    affected = [
+        source
+        for source in baseline.distances
+        if _is_affected(baseline, source, changed_pairs)
+    ]
+    new_sources = [node for node in graph.nodes if node not in baseline.distances]
+    log.info(
+        f"Recalculate {len(affected)} of {len(baseline.distances)} sources"
+        f" and {len(new_sources)} new sources."
+    )
+    for source in affected:
+        baseline._remove_source(source)
+    for source in affected + new_sources:
+        baseline._add_source(graph, source)
+    for pair, (_, new_weight) in changed_pairs.items():
+        if new_weight is None:
+            baseline.totals.pop(pair, None)
+    return affected + new_sources
+
+
+def save_centrality_baseline(baseline: CentralityBaseline, path: str) -> None:
+    """
+    Save a centrality baseline to a file.
+
+    Args:
+        baseline (CentralityBaseline): Baseline to save.
+        path (str): Path of the file.
+    """
+    with open(path, "wb") as file:
+        pickle.dump(baseline, file, protocol=pickle.HIGHEST_PROTOCOL)
+    log.info(f"Centrality baseline saved to: {path}")
+
+
+def load_centrality_baseline(path: str) -> CentralityBaseline:
+    """
+    Load a centrality baseline from a file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        CentralityBaseline: The saved baseline.
+    """
+    with open(path, "rb") as file:
+        return pickle.load(file)
@@ -1,5 +1,8 @@
 import logging as log
+from typing import Optional
+
 import geopandas as gpd
+import networkx as nx
 from network_analysis.utils import (
     get_osm_graph,
     create_centrality_geodataframe,
@@ -8,7 +11,17 @@ from network_analysis.utils import (
 
 
 def networkx_analyser(
-    location: str, route_type: str, network_type: str
+    location: str,
+    route_type: str,
+    network_type: str,
+    num_pivots: Optional[int] = None,
+    pivot_strategy: str = "random",
+    seed: Optional[int] = None,
+    workers: int = 1,
+    graph_backend: str = "networkx",
+    use_graph_cache: bool = True,
+    refresh_graph_cache: bool = False,
+    graph: Optional[nx.MultiDiGraph] = None,
 ) -> gpd.GeoDataFrame:
     """
     Analyze network centrality using NetworkX library.
@@ -17,15 +30,52 @@ def networkx_analyser(
         location (str): The location or area for which to analyze centrality.
         route_type (str): The type of route for centrality calculation.
         network_type (str): The network type for routing and graph generation.
+        num_pivots (int, optional): Number of sampled sources for an approximate
+         calculation. Defaults to None (exact calculation).
+        pivot_strategy (str, optional): Pivot selection for the approximate
+         calculation. Defaults to "random".
+        seed (int, optional): Seed for the pivot selection. Defaults to None.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        graph_backend (str, optional): Graph representation for the calculation
+         ("networkx" or "csr"). Defaults to "networkx".
+        use_graph_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+        refresh_graph_cache (bool, optional): Rebuild the cached graph.
+         Defaults to False.
+        graph (networkx.MultiDiGraph, optional): Already loaded graph of the
+         location, e.g. shared between batch jobs. Defaults to None (load it).
 
     Returns:
         geopandas.GeoDataFrame: GeoDataFrame containing centrality data.
     """
-    log.info("Start NetworkX betweenness centrality analysis for the whole network.")
+    if num_pivots is None:
+        log.info(
+            "Start NetworkX betweenness centrality analysis for the whole network."
+        )
+    else:
+        log.info(
+            f"Start approximate betweenness centrality analysis with {num_pivots}"
+            " pivots."
+        )
 
-    graph = get_osm_graph(location=location, network_type=network_type)
+    if graph is None:
+        graph = get_osm_graph(
+            location=location,
+            network_type=network_type,
+            use_cache=use_graph_cache,
+            refresh_cache=refresh_graph_cache,
+        )
 
-    centrality_df = calculate_route(graph, route_type, network_type)
+    centrality_df = calculate_route(
+        graph,
+        route_type,
+        network_type,
+        num_pivots=num_pivots,
+        pivot_strategy=pivot_strategy,
+        seed=seed,
+        workers=workers,
+        graph_backend=graph_backend,
+    )
 
     # Reset index and create a GeoDataFrame with centrality information
     centrality_df.reset_index(inplace=True)
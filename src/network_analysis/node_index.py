@@ -0,0 +1,259 @@
+import hashlib
+import logging as log
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Union
+
+import networkx as nx
+import numpy as np
+from pyproj import CRS, Transformer
+from pyproj.aoi import AreaOfInterest
+from pyproj.database import query_utm_crs_info
+from scipy.spatial import cKDTree
+
+from network_analysis.graph_cache import load_cached_object, save_cached_object
+from definitions import CRS_EPSG_4326, GRAPH_CACHE_DIR
+
+
+def _node_arrays(graph: nx.MultiDiGraph) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the IDs and coordinates of the graph nodes as arrays.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street network graph.
+
+    Returns:
+        tuple: Node IDs, x and y coordinates in the CRS of the graph.
+    """
+    node_ids = np.array(list(graph.nodes))
+    x = np.fromiter(
+        (data["x"] for _, data in graph.nodes(data=True)), float, len(graph)
+    )
+    y = np.fromiter(
+        (data["y"] for _, data in graph.nodes(data=True)), float, len(graph)
+    )
+    return node_ids, x, y
+
+
+def _node_digest(node_ids: np.ndarray, x: np.ndarray, y: np.ndarray) -> str:
+    digest = hashlib.sha1()
+    for array in (node_ids, x, y):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _projected_crs(crs: CRS, x: np.ndarray, y: np.ndarray) -> CRS:
+    """
+    Get a metric CRS for the nodes, the UTM zone of their centre for
+    geographic coordinates.
+
+    Args:
+        crs (pyproj.CRS): CRS of the node coordinates.
+        x (numpy.ndarray): x coordinate of every node.
+        y (numpy.ndarray): y coordinate of every node.
+
+    Returns:
+        pyproj.CRS: Projected CRS.
+    """
+    if crs.is_projected:
+        return crs
+    longitude = float((x.min() + x.max()) / 2)
+    latitude = float((y.min() + y.max()) / 2)
+    utm_crs_info = query_utm_crs_info(
+        datum_name="WGS 84",
+        area_of_interest=AreaOfInterest(longitude, latitude, longitude, latitude),
+    )
+    return CRS.from_epsg(utm_crs_info[0].code)
+
+
+@dataclass
+class NodeIndex:
+    """
+    KD-tree over the projected coordinates of the graph nodes.
+
+    Query points are given in the CRS of the graph and projected in bulk,
+    distances are in metres. The index depends only on the nodes, so it is
+    built once per graph and cached alongside it.
+
+    Attributes:
+        node_ids (numpy.ndarray): Node ID of every tree position.
+        crs (str): CRS of the graph and of the query points.
+        projected_crs (str): Metric CRS of the tree.
+        tree (scipy.spatial.cKDTree): KD-tree of the projected nodes.
+        node_digest (str): Digest of the node IDs and coordinates.
+    """
+
+    node_ids: np.ndarray
+    crs: str
+    projected_crs: str
+    tree: cKDTree
+    node_digest: str
+    _transformer: Optional[Transformer] = field(default=None, repr=False)
+
+    @classmethod
+    def from_graph(cls, graph: nx.MultiDiGraph) -> "NodeIndex":
+        """
+        Build the index of the nodes of a graph.
+
+        Args:
+            graph (networkx.MultiDiGraph): Street network graph.
+
+        Returns:
+            NodeIndex: The index.
+        """
+        node_ids, x, y = _node_arrays(graph)
+        return cls.from_coordinates(
+            node_ids, x, y, crs=graph.graph.get("crs", CRS_EPSG_4326)
+        )
+
+    @classmethod
+    def from_coordinates(
+        cls,
+        node_ids: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        crs: Union[str, int] = CRS_EPSG_4326,
+    ) -> "NodeIndex":
+        """
+        Build the index of nodes given as arrays.
+
+        Args:
+            node_ids (numpy.ndarray): ID of every node.
+            x (numpy.ndarray): x coordinate of every node.
+            y (numpy.ndarray): y coordinate of every node.
+            crs (str or int, optional): CRS of the coordinates.
+             Defaults to EPSG 4326.
+
+        Returns:
+            NodeIndex: The index.
+        """
+        if len(node_ids) == 0:
+            log.error("Cannot index a graph without nodes.")
+            raise ValueError("Cannot index a graph without nodes.")
+        node_ids = np.asarray(node_ids)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        crs = CRS.from_user_input(crs)
+        projected_crs = _projected_crs(crs, x, y)
+        index = cls(
+            node_ids=node_ids,
+            crs=crs.to_wkt(),
+            projected_crs=projected_crs.to_wkt(),
+            tree=None,
+            node_digest=_node_digest(node_ids, x, y),
+        )
+        index.tree = cKDTree(index.project(x, y))
+        return index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_transformer"] = None
+        return state
+
+    def project(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Project points from the CRS of the graph into the CRS of the tree.
+
+        Args:
+            x (numpy.ndarray): x coordinate of every point.
+            y (numpy.ndarray): y coordinate of every point.
+
+        Returns:
+            numpy.ndarray: Projected coordinates, one row per point.
+        """
+        if self._transformer is None:
+            self._transformer = Transformer.from_crs(
+                self.crs, self.projected_crs, always_xy=True
+            )
+        projected_x, projected_y = self._transformer.transform(
+            np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        )
+        return np.column_stack((projected_x, projected_y))
+
+    def nearest(
+        self, x: np.ndarray, y: np.ndarray, k: int = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the nearest nodes of every point.
+
+        Args:
+            x (numpy.ndarray): x coordinate of every point in the graph CRS.
+            y (numpy.ndarray): y coordinate of every point in the graph CRS.
+            k (int, optional): Number of nodes per point. Defaults to 1.
+
+        Returns:
+            tuple: Node IDs and distances in metres, of shape (points,) for
+             k = 1 and (points, k) otherwise, nearest first.
+        """
+        if not 1 <= k <= len(self.node_ids):
+            log.error(f"Cannot query {k} of {len(self.node_ids)} nodes.")
+            raise ValueError(f"Cannot query {k} of {len(self.node_ids)} nodes.")
+        distances, positions = self.tree.query(self.project(x, y), k=k, workers=-1)
+        return self.node_ids[positions], distances
+
+    def within(
+        self, x: np.ndarray, y: np.ndarray, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get all nodes within a radius of every point.
+
+        The points are indexed as well and both trees are matched at once,
+        so no Python list is built per point.
+
+        Args:
+            x (numpy.ndarray): x coordinate of every point in the graph CRS.
+            y (numpy.ndarray): y coordinate of every point in the graph CRS.
+            radius (float): Search radius in metres.
+
+        Returns:
+            tuple: Point position, node ID and distance in metres of every
+             point and node pair within the radius, ordered by point.
+        """
+        if radius < 0:
+            log.error("Radius must be non-negative.")
+            raise ValueError("Radius must be non-negative.")
+        point_tree = cKDTree(self.project(x, y))
+        pairs = point_tree.sparse_distance_matrix(
+            self.tree, radius, output_type="ndarray"
+        )
+        order = np.lexsort((pairs["v"], pairs["i"]))
+        pairs = pairs[order]
+        return pairs["i"], self.node_ids[pairs["j"]], pairs["v"]
+
+
+def get_node_index(
+    graph: nx.MultiDiGraph,
+    cache_key: Optional[str] = None,
+    use_cache: bool = True,
+    cache_dir: str = GRAPH_CACHE_DIR,
+) -> NodeIndex:
+    """
+    Get the node index of a graph, cached alongside the graph.
+
+    A cached index is only used if the node IDs and coordinates of the graph
+    did not change.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street network graph.
+        cache_key (str, optional): Cache key of the graph. Defaults to None
+         (no caching).
+        use_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+        cache_dir (str, optional): Cache directory. Defaults to GRAPH_CACHE_DIR.
+
+    Returns:
+        NodeIndex: The node index.
+    """
+    suffix = ".node_index.pkl"
+    use_cache = use_cache and cache_key is not None
+    if use_cache:
+        cached = load_cached_object(cache_key, suffix, cache_dir)
+        if cached is not None and cached.node_digest == _node_digest(
+            *_node_arrays(graph)
+        ):
+            log.info("Loaded node index from the graph cache.")
+            return cached
+
+    node_index = NodeIndex.from_graph(graph)
+    if use_cache:
+        save_cached_object(node_index, cache_key, suffix, cache_dir)
+    return node_index
@@ -0,0 +1,194 @@
+import os
+import logging as log
+from typing import Iterator, List, Optional, Tuple
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from network_analysis.node_index import NodeIndex
+from definitions import CRS_EPSG_4326
+
+# default columns of an OD matrix
+OD_COLUMNS = {"origin": "origin", "destination": "destination", "volume": "trips"}
+
+
+def read_od_matrix(
+    path: str,
+    origin_column: str = OD_COLUMNS["origin"],
+    destination_column: str = OD_COLUMNS["destination"],
+    volume_column: str = OD_COLUMNS["volume"],
+    chunk_size: int = 1_000_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a zone-to-zone OD matrix in chunks.
+
+    The matrix is a CSV or Parquet file in long format with one row per
+    origin zone, destination zone and trip volume. Both formats are read
+    memory-mapped, chunk by chunk, so the matrix never has to fit into memory.
+
+    Args:
+        path (str): Path to the CSV or Parquet file.
+        origin_column (str, optional): Column of the origin zone IDs.
+         Defaults to "origin".
+        destination_column (str, optional): Column of the destination zone IDs.
+         Defaults to "destination".
+        volume_column (str, optional): Column of the trip volumes.
+         Defaults to "trips".
+        chunk_size (int, optional): Number of rows per chunk.
+         Defaults to 1,000,000.
+
+    Yields:
+        pandas.DataFrame: Chunk with the columns origin, destination and volume.
+    """
+    columns = [origin_column, destination_column, volume_column]
+    names = {
+        origin_column: "origin",
+        destination_column: "destination",
+        volume_column: "volume",
+    }
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        for chunk in pd.read_csv(
+            path, usecols=columns, chunksize=chunk_size, memory_map=True
+        ):
+            yield chunk.rename(columns=names)[list(names.values())]
+    elif extension in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            log.error("pyarrow is required for Parquet OD matrices, use a CSV file.")
+            raise e
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas().rename(columns=names)[list(names.values())]
+    else:
+        log.error(f"Unsupported OD matrix format: '{path}'.")
+        raise ValueError(f"Unsupported OD matrix format: '{path}'.")
+
+
+def load_zone_centroids(
+    zones_path: str, zone_id_column: str = "zone_id"
+) -> pd.DataFrame:
+    """
+    Load the centroids of the zones of an OD matrix.
+
+    Centroids of polygons are calculated in a local UTM projection.
+
+    Args:
+        zones_path (str): Path to a vector file (e.g. GeoPackage) with the
+         zones as polygons or points.
+        zone_id_column (str, optional): Column of the zone IDs.
+         Defaults to "zone_id".
+
+    Returns:
+        pandas.DataFrame: Columns x and y in EPSG 4326, indexed by zone ID.
+    """
+    zones = gpd.read_file(zones_path)
+    if zone_id_column not in zones.columns:
+        log.error(f"Zone file has no column '{zone_id_column}'.")
+        raise ValueError(f"Zone file has no column '{zone_id_column}'.")
+    if zones.crs is None:
+        log.warning("Zone file has no CRS, assuming EPSG 4326.")
+        zones = zones.set_crs(CRS_EPSG_4326)
+    zones = zones.to_crs(CRS_EPSG_4326)
+    centroids = zones.geometry.to_crs(zones.estimate_utm_crs()).centroid.to_crs(
+        CRS_EPSG_4326
+    )
+    return pd.DataFrame(
+        {"x": centroids.x.to_numpy(), "y": centroids.y.to_numpy()},
+        index=pd.Index(zones[zone_id_column], name="zone_id"),
+    )
+
+
+def load_od_node_pairs(
+    od_matrix_path: str,
+    zones_path: str,
+    graph: nx.MultiDiGraph,
+    zone_id_column: str = "zone_id",
+    chunk_size: int = 1_000_000,
+    node_index: Optional[NodeIndex] = None,
+    **columns: str,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Map a zone-to-zone OD matrix onto node pairs of a graph.
+
+    The zone centroids are snapped to their nearest nodes in one bulk query
+    of the node index.
+    The matrix is read in chunks and the trip volumes of every node pair are
+    summed, so every distinct node pair is routed once. Trips of zones
+    missing from the zone file and non-positive volumes are dropped.
+
+    Args:
+        od_matrix_path (str): Path to the CSV or Parquet OD matrix.
+        zones_path (str): Path to the vector file of the zones.
+        graph (networkx.MultiDiGraph): Street network graph in EPSG 4326.
+        zone_id_column (str, optional): Column of the zone IDs in the zone
+         file. Defaults to "zone_id".
+        chunk_size (int, optional): Number of matrix rows per chunk.
+         Defaults to 1,000,000.
+        node_index (NodeIndex, optional): Index of the graph nodes.
+         Defaults to None (build the index).
+        **columns: Column names of the matrix, see `read_od_matrix`.
+
+    Returns:
+        tuple: Origin node, destination node and summed trip volume of every
+         distinct node pair.
+    """
+    centroids = load_zone_centroids(zones_path, zone_id_column)
+    if node_index is None:
+        node_index = NodeIndex.from_graph(graph)
+    zone_nodes = pd.Series(
+        node_index.nearest(centroids["x"].to_numpy(), centroids["y"].to_numpy())[0],
+        index=centroids.index,
+    )
+    if not zone_nodes.index.is_unique:
+        log.error("Zone IDs of the zone file are not unique.")
+        raise ValueError("Zone IDs of the zone file are not unique.")
+    log.info(f"Snapped {len(zone_nodes)} zones to graph nodes.")
+
+    aggregated: List[pd.DataFrame] = []
+    num_rows = 0
+    dropped_volume = 0.0
+    for chunk in read_od_matrix(od_matrix_path, chunk_size=chunk_size, **columns):
+        num_rows += len(chunk)
+        origins, destinations = chunk["origin"], chunk["destination"]
+        if origins.dtype != zone_nodes.index.dtype:
+            # zone IDs of matrix and zone file were read with different types
+            zone_nodes.index = zone_nodes.index.astype(str)
+            origins, destinations = origins.astype(str), destinations.astype(str)
+        chunk = pd.DataFrame(
+            {
+                "origin": origins.map(zone_nodes),
+                "destination": destinations.map(zone_nodes),
+                "volume": chunk["volume"].astype(float),
+            }
+        )
+        valid = chunk["origin"].notna() & chunk["destination"].notna()
+        valid &= chunk["volume"] > 0
+        dropped_volume += chunk.loc[~valid, "volume"].clip(lower=0).sum()
+        aggregated.append(
+            chunk[valid].groupby(["origin", "destination"], sort=False).sum()
+        )
+        # merge the partial sums before they outgrow a chunk
+        if len(aggregated) > 1 and sum(map(len, aggregated)) > chunk_size:
+            aggregated = [pd.concat(aggregated).groupby(level=[0, 1]).sum()]
+
+    if not aggregated:
+        log.error(f"OD matrix '{od_matrix_path}' is empty.")
+        raise ValueError(f"OD matrix '{od_matrix_path}' is empty.")
+    pairs = pd.concat(aggregated).groupby(level=[0, 1]).sum()
+    if dropped_volume > 0:
+        log.warning(
+            f"Dropped {dropped_volume:.6g} trips of unknown zones or with"
+            " invalid volumes."
+        )
+    log.info(f"Mapped {num_rows} OD matrix rows onto {len(pairs)} node pairs.")
+
+    node_dtype = zone_nodes.dtype
+    return (
+        pairs.index.get_level_values(0).to_numpy().astype(node_dtype),
+        pairs.index.get_level_values(1).to_numpy().astype(node_dtype),
+        pairs["volume"].to_numpy(),
+    )
@@ -0,0 +1,134 @@
+import logging as log
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def build_alias_table(weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the tables of Vose's alias method for a discrete distribution.
+
+    Args:
+        weights (numpy.ndarray): Non-negative weights with a positive sum.
+
+    Returns:
+        tuple: Acceptance probability and alias index of every bucket.
+    """
+    num = len(weights)
+    scaled = weights * (num / weights.sum())
+    probability = np.ones(num, dtype=float)
+    alias = np.arange(num, dtype=np.int64)
+
+    small = list(np.flatnonzero(scaled < 1.0))
+    large = list(np.flatnonzero(scaled >= 1.0))
+    while small and large:
+        less = small.pop()
+        more = large.pop()
+        probability[less] = scaled[less]
+        alias[less] = more
+        # the large bucket fills up the rest of the small bucket
+        scaled[more] = (scaled[more] + scaled[less]) - 1.0
+        if scaled[more] < 1.0:
+            small.append(more)
+        else:
+            large.append(more)
+    # the remaining buckets are full up to rounding errors
+    return probability, alias
+
+
+class ODSampler:
+    """
+    Sampler of origin-destination node pairs weighted by node weights.
+
+    The alias tables are built once, afterwards every node is drawn in constant
+    time with vectorized NumPy operations, so the sampler can be reused for
+    millions of pairs.
+
+    Args:
+        nodes (sequence): Nodes to sample from.
+        weights (sequence, optional): Non-negative weight of every node.
+         Defaults to None (uniform sampling).
+        seed (int, optional): Seed of the random generator. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[Hashable],
+        weights: Optional[Sequence[float]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.nodes = np.asarray(list(nodes))
+        if len(self.nodes) == 0:
+            log.error("Cannot sample from an empty set of nodes.")
+            raise ValueError("Cannot sample from an empty set of nodes.")
+        self.rng = np.random.default_rng(seed)
+
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            if len(weights) != len(self.nodes):
+                log.error("The number of weights does not match the number of nodes.")
+                raise ValueError(
+                    "The number of weights does not match the number of nodes."
+                )
+            if (weights < 0).any() or not np.isfinite(weights).all():
+                log.error("Node weights must be finite and non-negative.")
+                raise ValueError("Node weights must be finite and non-negative.")
+            if weights.sum() == 0:
+                log.warning("The sum of node weights is 0. Using uniform selection.")
+                weights = None
+
+        if weights is None:
+            self.probability = None
+            self.alias = None
+            self.num_candidates = len(self.nodes)
+        else:
+            self.probability, self.alias = build_alias_table(weights)
+            self.num_candidates = int(np.count_nonzero(weights))
+
+    def sample_indices(self, num: int) -> np.ndarray:
+        """
+        Draw node indices.
+
+        Args:
+            num (int): Number of indices to draw.
+
+        Returns:
+            numpy.ndarray: Indices into the nodes of the sampler.
+        """
+        buckets = self.rng.integers(len(self.nodes), size=num)
+        if self.probability is None:
+            return buckets
+        accept = self.rng.random(num) < self.probability[buckets]
+        return np.where(accept, buckets, self.alias[buckets])
+
+    def sample_pairs(
+        self, num: int, exclude_same_nodes: bool = False
+    ) -> Tuple[List[Hashable], List[Hashable]]:
+        """
+        Draw origin-destination node pairs.
+
+        Origins and destinations are drawn independently from the same
+        distribution.
+
+        Args:
+            num (int): Number of pairs to draw.
+            exclude_same_nodes (bool, optional): Redraw the destination of
+             pairs whose origin and destination are the same node.
+             Defaults to False.
+
+        Returns:
+            tuple: Two lists containing the origin and destination nodes.
+        """
+        origins = self.sample_indices(num)
+        destinations = self.sample_indices(num)
+        if exclude_same_nodes:
+            if self.num_candidates < 2:
+                log.error("At least two nodes with positive weight are required.")
+                raise ValueError(
+                    "At least two nodes with positive weight are required."
+                )
+            same = np.flatnonzero(origins == destinations)
+            while len(same):
+                destinations[same] = self.sample_indices(len(same))
+                same = same[origins[same] == destinations[same]]
+        return self.nodes[origins].tolist(), self.nodes[destinations].tolist()
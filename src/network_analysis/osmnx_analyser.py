@@ -1,33 +1,174 @@
-import random
+from typing import Optional, TYPE_CHECKING
 
 import networkx as nx
-import osmnx as ox
 import pandas as pd
 import logging as log
 
-from network_analysis.population_data import get_population_weighted_nodes
+from network_analysis.contraction import get_contraction_hierarchy
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.node_index import get_node_index
+from network_analysis.od_matrix import load_od_node_pairs
+from network_analysis.od_sampler import ODSampler
+from network_analysis.profiling import stage
+from network_analysis.routing import (
+    count_route_edges,
+    count_route_edges_until_converged,
+)
 from network_analysis.utils import (
     get_osm_graph,
     create_centrality_geodataframe,
     add_travel_time,
+    save_centrality_results,
 )
 
+if TYPE_CHECKING:
+    from osgeo import gdal
+
 
 def osmnx_analyser(
-    location: str, num_routes: int, route_type: str, network_type: str, weighting: str
+    location: str,
+    num_routes: int,
+    route_type: str,
+    network_type: str,
+    weighting: str,
+    graph_backend: str = "networkx",
+    workers: int = 1,
+    seed: Optional[int] = None,
+    use_graph_cache: bool = True,
+    refresh_graph_cache: bool = False,
+    exclude_same_nodes: bool = False,
+    graph: Optional[nx.MultiDiGraph] = None,
+    raster_dataset: Optional["gdal.Dataset"] = None,
+    tolerance: Optional[float] = None,
+    batch_size: int = 1000,
+    snapshot_folder: Optional[str] = None,
+    routing: str = "dijkstra",
+    output_format: str = "gpkg",
+    od_matrix_path: Optional[str] = None,
+    zones_path: Optional[str] = None,
+    zone_id_column: str = "zone_id",
+    population_model: str = "node",
 ) -> pd.DataFrame:
-    log.info(
-        f"Start geographical betweenness centrality analysis for {num_routes} routes."
-    )
+    """
+    Analyze geographical betweenness centrality by routing sampled node pairs.
+
+    The edge usage is counted while routing and joined with the edge
+    geometries at the end. The profiled stages are "load_od_matrix" (only
+    for the OD weighting), "prepare_routing_graph" and "routing".
 
-    graph = get_osm_graph(location=location, network_type=network_type)
+    Args:
+        location (str): The location or area for which to analyze centrality.
+        num_routes (int): Number of sampled routes, the maximum number when
+         routing until a tolerance is reached. Ignored for the OD weighting.
+        route_type (str): Edge weight of the routes ("length" or
+         "travel_time").
+        network_type (str): The network type for routing and graph generation.
+        weighting (str): Selection of the route pairs: "random" nodes, nodes
+         weighted by "population" or the trips of an "od" matrix.
+        graph_backend (str, optional): Graph representation for the Dijkstra
+         routing ("networkx" or "csr"). Defaults to "networkx".
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        seed (int, optional): Seed for the sampling of the route pairs.
+         Defaults to None.
+        use_graph_cache (bool, optional): Use the processed graph cache, also
+         for the node index and the contraction hierarchy. Defaults to True.
+        refresh_graph_cache (bool, optional): Rebuild the cached graph.
+         Defaults to False.
+        exclude_same_nodes (bool, optional): Do not sample pairs with equal
+         start and end node. Defaults to False.
+        graph (networkx.MultiDiGraph, optional): Already loaded graph of the
+         location, e.g. shared between batch jobs. Defaults to None (load it).
+        raster_dataset (gdal.Dataset, optional): Already opened population
+         raster in EPSG 4326 for the population weighting. Defaults to None
+         (open the raster at RASTER_PATH).
+        tolerance (float, optional): Route in batches until the estimated
+         error of the edge usage distribution, relative to the most used edge,
+         is at most this value. Defaults to None (route all pairs at once).
+        batch_size (int, optional): Number of routes per batch when routing
+         until the tolerance is reached. Defaults to 1000.
+        snapshot_folder (str, optional): Folder for the intermediate results
+         of every batch, only used with a tolerance. Defaults to None.
+        routing (str, optional): Shortest path algorithm, "dijkstra" or "ch"
+         (contraction hierarchy). Defaults to "dijkstra".
+        output_format (str, optional): Format of the snapshots ("gpkg",
+         "parquet" or "fgb"). Defaults to "gpkg".
+        od_matrix_path (str, optional): OD matrix of the OD weighting.
+         Defaults to None.
+        zones_path (str, optional): Zones of the OD matrix, mapped to their
+         nearest nodes. Defaults to None.
+        zone_id_column (str, optional): Column of the zone IDs in the zone
+         file. Defaults to "zone_id".
+        population_model (str, optional): Population weights of the nodes,
+         "node" (population of the raster cell of every node) or "cell"
+         (population of every cell distributed over its nearest nodes).
+         Defaults to "node".
+
+    Returns:
+        geopandas.GeoDataFrame: GeoDataFrame containing centrality data.
+    """
+    if weighting == "od":
+        log.info(
+            "Start geographical betweenness centrality analysis for the OD"
+            f" matrix {od_matrix_path}."
+        )
+    else:
+        log.info(
+            "Start geographical betweenness centrality analysis for"
+            f" {num_routes} routes."
+        )
 
-    # get start and end nodes for routes depending on weighting method
+    if snapshot_folder is not None and tolerance is None:
+        log.warning("Snapshots are only saved in batches with a tolerance.")
+
+    if graph is None:
+        graph = get_osm_graph(
+            location=location,
+            network_type=network_type,
+            use_cache=use_graph_cache,
+            refresh_cache=refresh_graph_cache,
+        )
+
+    # sampler of start and end nodes for routes depending on weighting method
     if weighting == "population":
-        start_nodes, end_nodes = get_population_weighted_nodes(graph.nodes, num_routes)
+        # GDAL is only loaded by population weighted runs
+        from network_analysis.population_data import get_population_sampler
+
+        node_index = None
+        if population_model == "cell":
+            node_index = get_node_index(
+                graph,
+                cache_key=graph.graph.get("cache_key"),
+                use_cache=use_graph_cache,
+            )
+        sampler = get_population_sampler(
+            graph.nodes,
+            seed=seed,
+            raster_dataset=raster_dataset,
+            population_model=population_model,
+            node_index=node_index,
+        )
     elif weighting == "random":
-        start_nodes = [random.choice(list(graph.nodes)) for _ in range(num_routes)]
-        end_nodes = [random.choice(list(graph.nodes)) for _ in range(num_routes)]
+        sampler = ODSampler(graph.nodes, seed=seed)
+    elif weighting == "od":
+        # trips between zones instead of sampled pairs
+        if od_matrix_path is None or zones_path is None:
+            log.error("OD weighting requires an OD matrix and a zone file.")
+            raise ValueError("OD weighting requires an OD matrix and a zone file.")
+        if tolerance is not None:
+            log.warning("OD weighting routes every pair, the tolerance is ignored.")
+        with stage("load_od_matrix"):
+            node_index = get_node_index(
+                graph,
+                cache_key=graph.graph.get("cache_key"),
+                use_cache=use_graph_cache,
+            )
+            od_pairs = load_od_node_pairs(
+                od_matrix_path,
+                zones_path,
+                graph,
+                zone_id_column=zone_id_column,
+                node_index=node_index,
+            )
     else:
         log.error("Invalid weighting method specified.")
         raise ValueError("Invalid weighting method specified.")
@@ -35,35 +176,62 @@ def osmnx_analyser(
     if route_type == "travel_time":
         graph = add_travel_time(graph, network_type)
 
-    routes_df = []
-    # calculate routes for each start and end node pair
-    for origin_node, destination_node in zip(start_nodes, end_nodes):
-        try:
-            route = ox.shortest_path(
-                graph, origin_node, destination_node, weight=route_type, cpus=None
+    with stage("prepare_routing_graph"):
+        if routing == "ch":
+            routing_graph = get_contraction_hierarchy(
+                CSRGraph.from_graph(graph),
+                route_type,
+                cache_key=graph.graph.get("cache_key"),
+                use_cache=use_graph_cache,
+            )
+        elif graph_backend == "csr":
+            routing_graph = CSRGraph.from_graph(graph)
+        else:
+            routing_graph = graph
+
+    with stage("routing"):
+        # count the edge usage while routing, the geometry is joined only at the end
+        if weighting == "od":
+            start_nodes, end_nodes, volumes = od_pairs
+            edge_counter = count_route_edges(
+                routing_graph,
+                start_nodes,
+                end_nodes,
+                route_type,
+                workers=workers,
+                volumes=volumes,
+            )
+        elif tolerance is None:
+            start_nodes, end_nodes = sampler.sample_pairs(
+                num_routes, exclude_same_nodes=exclude_same_nodes
+            )
+            edge_counter = count_route_edges(
+                routing_graph, start_nodes, end_nodes, route_type, workers=workers
+            )
+        else:
+
+            def save_snapshot(edge_counter, batch, error):
+                snapshot_gdf = create_centrality_geodataframe(
+                    edge_counter.to_dataframe(), graph
+                )
+                save_centrality_results(
+                    snapshot_gdf,
+                    snapshot_folder,
+                    file_name=f"centrality_snapshot_{batch:04d}",
+                    output_format=output_format,
+                )
+
+            edge_counter, _ = count_route_edges_until_converged(
+                routing_graph,
+                sampler,
+                num_routes,
+                route_type,
+                tolerance,
+                batch_size=batch_size,
+                workers=workers,
+                exclude_same_nodes=exclude_same_nodes,
+                on_batch=save_snapshot if snapshot_folder else None,
             )
+    log.info(f"Created {edge_counter.num_routes} routes.")
 
-            route_gdf = ox.utils_graph.route_to_gdf(graph, route)
-            routes_df.append(route_gdf)
-        # needed because of outgoing directed edges
-        except nx.NetworkXNoPath:
-            continue
-        except Exception as e:
-            if (
-                "'NoneType' is not subscriptable" in str(e)
-                or "'NoneType' object object is not subscriptable" in str(e)
-                or "'NoneType' object is not subscriptable" in str(e)
-                or "graph contains no edges" in str(e)
-            ):
-                continue
-            else:
-                log.error(f"An error occurred: {e}")
-                raise e
-
-    log.info(f"Created {len(routes_df)} routes.")
-    route_gdf = pd.concat(routes_df, axis=0)
-
-    centrality_series = route_gdf.groupby(["u", "v", "key"]).size()
-    centrality_df = centrality_series.reset_index()
-
-    return create_centrality_geodataframe(centrality_df, graph)
+    return create_centrality_geodataframe(edge_counter.to_dataframe(), graph)
@@ -1,18 +1,103 @@
-import random
+import os
+import json
+import math
+import hashlib
 import logging as log
 
+import numpy as np
 from osgeo import gdal, osr
-from typing import List, Dict, Tuple, Union
+from typing import List, Dict, Optional, Tuple, Union
 
-from definitions import CRS_EPSG_4326, RASTER_PATH
+from network_analysis.node_index import NodeIndex
+from network_analysis.od_sampler import ODSampler
+from definitions import (
+    CRS_EPSG_4326,
+    POPULATION_MODELS,
+    RASTER_CACHE_DIR,
+    RASTER_PATH,
+)
 
 
-def open_and_reproject_raster(raster_path: str) -> Union[gdal.Dataset, None]:
+def _reprojected_window(
+    raster_dataset: gdal.Dataset, bbox: Tuple[float, float, float, float]
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Get the pixel window of a reprojected raster dataset covering a bounding box.
+
+    The window is snapped outwards to whole pixels and clipped to the raster.
+
+    Args:
+        raster_dataset (gdal.Dataset): Raster dataset in EPSG 4326.
+        bbox (tuple): Bounding box (west, south, east, north) in EPSG 4326.
+
+    Returns:
+        tuple or None: Pixel window (x offset, y offset, x size, y size), None
+         if the bounding box does not overlap the raster.
+    """
+    (
+        origin_x,
+        pixel_width,
+        _,
+        origin_y,
+        _,
+        pixel_height,
+    ) = raster_dataset.GetGeoTransform()
+    west, south, east, north = bbox
+    x_min = max(math.floor((west - origin_x) / pixel_width), 0)
+    x_max = min(
+        math.floor((east - origin_x) / pixel_width), raster_dataset.RasterXSize - 1
+    )
+    y_min = max(math.floor((north - origin_y) / pixel_height), 0)
+    y_max = min(
+        math.floor((south - origin_y) / pixel_height), raster_dataset.RasterYSize - 1
+    )
+    if x_min > x_max or y_min > y_max:
+        return None
+    return x_min, y_min, x_max - x_min + 1, y_max - y_min + 1
+
+
+def _raster_cache_key(raster_path: str, window: Tuple[int, int, int, int]) -> str:
+    """
+    Get the cache key of a reprojected raster window.
+
+    Args:
+        raster_path (str): Path to the source raster dataset.
+        window (tuple): Pixel window of the reprojected raster.
+
+    Returns:
+        str: Hex digest identifying the window.
+    """
+    parameters = {
+        "path": os.path.abspath(raster_path),
+        "mtime": os.path.getmtime(raster_path),
+        "window": window,
+    }
+    return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+def open_and_reproject_raster(
+    raster_path: str,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    margin: float = 0.01,
+    cache_dir: str = RASTER_CACHE_DIR,
+) -> Union[gdal.Dataset, None]:
     """
     Open and if CRS is not EPSG 4326 reproject a raster dataset to EPSG 4326 (WGS 84).
 
+    The source raster is never modified. Without a bounding box the raster is
+    reprojected on the fly through an in-memory VRT. With a bounding box only
+    the window covering it is reprojected and cached in cache_dir, keyed by
+    the source path, its modification time and the window, so repeated runs
+    over the same area do not warp at all.
+
     Args:
         raster_path (str): Path to the input raster dataset.
+        bbox (tuple, optional): Bounding box (west, south, east, north) of the
+         study area in EPSG 4326. Defaults to None.
+        margin (float, optional): Margin added around the bounding box in
+         degrees. Defaults to 0.01.
+        cache_dir (str, optional): Directory of the reprojected windows.
+         Defaults to RASTER_CACHE_DIR.
 
     Returns:
         gdal.Dataset or None: Reprojected raster dataset.
@@ -28,15 +113,48 @@ def open_and_reproject_raster(raster_path: str) -> Union[gdal.Dataset, None]:
         raster_srs = osr.SpatialReference(wkt=raster_dataset.GetProjection())
 
         # Check if the input raster is already in EPSG 4326, else reproject
-        if raster_srs.GetAttrValue("AUTHORITY", 1) != str(CRS_EPSG_4326):
-            log.warning(
-                "The input raster data does not have CRS 4326."
-                " Re-projecting to CRS 4326."
-            )
-            raster_dataset = gdal.Warp(
-                raster_path, raster_path, format="GTiff", dstSRS="EPSG:4326"
+        if raster_srs.GetAttrValue("AUTHORITY", 1) == str(CRS_EPSG_4326):
+            return raster_dataset
+
+        log.warning(
+            "The input raster data does not have CRS 4326."
+            " Re-projecting to CRS 4326."
+        )
+        # lazy reprojection, pixels are only warped when they are read
+        reprojected_dataset = gdal.Warp(
+            "", raster_dataset, format="VRT", dstSRS="EPSG:4326"
+        )
+        if bbox is None:
+            return reprojected_dataset
+
+        west, south, east, north = bbox
+        window = _reprojected_window(
+            reprojected_dataset,
+            (west - margin, south - margin, east + margin, north + margin),
+        )
+        if window is None:
+            log.warning("The study area does not overlap the raster dataset.")
+            return reprojected_dataset
+
+        cache_path = os.path.join(
+            cache_dir, _raster_cache_key(raster_path, window) + ".tif"
+        )
+        if not os.path.exists(cache_path):
+            # write to a temporary file first, so concurrent runs never read
+            # a partial file
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            window_dataset = gdal.Translate(
+                temp_path, reprojected_dataset, format="GTiff", srcWin=list(window)
             )
-        return raster_dataset
+            if window_dataset is None:
+                log.error("Failed to reproject the raster window.")
+                raise Exception("Failed to reproject the raster window.")
+            # close the dataset to flush it to disk
+            window_dataset = None
+            os.replace(temp_path, cache_path)
+            log.info(f"Reprojected raster window cached to: {cache_path}")
+        return gdal.Open(cache_path)
 
     except Exception as e:
         log.error(f"Error opening and re-projecting raster: {e}")
@@ -59,103 +177,369 @@ def get_node_coordinates(
     return {osm_id: (data["y"], data["x"]) for osm_id, data in nodes.items()}
 
 
+def get_bounding_box(
+    node_coordinates: Dict[int, Tuple[float, float]]
+) -> Tuple[float, float, float, float]:
+    """
+    Get the bounding box of node coordinates.
+
+    Args:
+        node_coordinates (dict): Dictionary of node (latitude, longitude)
+         coordinates.
+
+    Returns:
+        tuple: Bounding box (west, south, east, north).
+    """
+    latitudes, longitudes = zip(*node_coordinates.values())
+    return min(longitudes), min(latitudes), max(longitudes), max(latitudes)
+
+
+def _read_pixels(
+    raster_band: gdal.Band,
+    raster_x: np.ndarray,
+    raster_y: np.ndarray,
+    max_window_pixels: int,
+) -> np.ndarray:
+    """
+    Read the values of raster pixels in bulk.
+
+    The window covering all pixels is read at once if it is small enough,
+    otherwise only the raster blocks containing pixels are read.
+
+    Args:
+        raster_band (gdal.Band): Raster band to read from.
+        raster_x (numpy.ndarray): Column index of every pixel.
+        raster_y (numpy.ndarray): Row index of every pixel.
+        max_window_pixels (int): Maximum number of pixels of a single read.
+
+    Returns:
+        numpy.ndarray: Value of every pixel.
+    """
+    x_min, x_max = raster_x.min(), raster_x.max()
+    y_min, y_max = raster_y.min(), raster_y.max()
+    width = int(x_max - x_min + 1)
+    height = int(y_max - y_min + 1)
+    if width * height <= max_window_pixels:
+        window = raster_band.ReadAsArray(int(x_min), int(y_min), width, height)
+        return window[raster_y - y_min, raster_x - x_min]
+
+    # pixels spread over a large area: read only the touched blocks
+    block_width, block_height = raster_band.GetBlockSize()
+    block_ids = np.column_stack((raster_x // block_width, raster_y // block_height))
+    unique_blocks, block_of_pixel = np.unique(block_ids, axis=0, return_inverse=True)
+    block_of_pixel = block_of_pixel.reshape(-1)
+    values = np.empty(len(raster_x), dtype=float)
+    for i, (block_x, block_y) in enumerate(unique_blocks):
+        x_offset = int(block_x * block_width)
+        y_offset = int(block_y * block_height)
+        block = raster_band.ReadAsArray(
+            x_offset,
+            y_offset,
+            min(block_width, raster_band.XSize - x_offset),
+            min(block_height, raster_band.YSize - y_offset),
+        )
+        in_block = block_of_pixel == i
+        values[in_block] = block[
+            raster_y[in_block] - y_offset, raster_x[in_block] - x_offset
+        ]
+    return values
+
+
 def get_population_at_nodes(
-    raster_dataset: gdal.Dataset, nodes: Dict[int, Tuple[float, float]]
+    raster_dataset: gdal.Dataset,
+    nodes: Dict[int, Tuple[float, float]],
+    max_window_pixels: int = 2**26,
 ) -> List[float]:
     """
     Get population values at nodes by sampling from a reprojected raster dataset.
 
+    The pixel indices of all nodes are computed at once and the pixels are
+    read in bulk. Nodes outside of the raster or on pixels with negative or
+    no-data values get a population of 0.
+
     Args:
         raster_dataset (gdal.Dataset): Reprojected raster dataset.
         nodes (dict): Dictionary of node coordinates.
+        max_window_pixels (int, optional): Maximum number of pixels read at
+         once, larger areas are read block by block. Defaults to 2**26.
 
     Returns:
         list: A list of population values corresponding to each node.
     """
+    if not nodes:
+        return []
     geotransform = raster_dataset.GetGeoTransform()
     origin_x = geotransform[0]
     origin_y = geotransform[3]
     pixel_width = geotransform[1]
     pixel_height = geotransform[5]
 
-    population_at_nodes = []
-
-    # get population values at nodes
-    for osm_id, (y, x) in nodes.items():
-        raster_x = int((x - origin_x) / pixel_width)
-        raster_y = int((y - origin_y) / pixel_height)
+    coordinates = np.array(list(nodes.values()), dtype=float)
+    raster_x = np.floor((coordinates[:, 1] - origin_x) / pixel_width).astype(np.int64)
+    raster_y = np.floor((coordinates[:, 0] - origin_y) / pixel_height).astype(np.int64)
+
+    inside = (
+        (raster_x >= 0)
+        & (raster_x < raster_dataset.RasterXSize)
+        & (raster_y >= 0)
+        & (raster_y < raster_dataset.RasterYSize)
+    )
+    if not inside.all():
+        log.warning(
+            f"{np.count_nonzero(~inside)} nodes are outside of the raster."
+            " Their population is set to 0."
+        )
 
+    population_at_nodes = np.zeros(len(coordinates), dtype=float)
+    if inside.any():
         raster_band = raster_dataset.GetRasterBand(1)
-        pixel_value = raster_band.ReadAsArray(raster_x, raster_y, 1, 1)[0][0]
+        population_at_nodes[inside] = _read_pixels(
+            raster_band,
+            raster_x[inside],
+            raster_y[inside],
+            max_window_pixels,
+        )
+        populated = np.isfinite(population_at_nodes) & (population_at_nodes > 0)
+        no_data_value = raster_band.GetNoDataValue()
+        if no_data_value is not None:
+            populated &= population_at_nodes != no_data_value
+        population_at_nodes[~populated] = 0.0
+    return population_at_nodes.tolist()
+
+
+def get_populated_cells(
+    raster_dataset: gdal.Dataset, bbox: Tuple[float, float, float, float]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the centre and population of every populated cell in a bounding box.
+
+    The raster window covering the bounding box is read once as an array.
+    Cells without population, with negative or no-data values are skipped.
 
-        population_at_nodes.append(pixel_value)
+    Args:
+        raster_dataset (gdal.Dataset): Raster dataset in EPSG 4326.
+        bbox (tuple): Bounding box (west, south, east, north) in EPSG 4326.
 
-    return population_at_nodes
+    Returns:
+        tuple: Longitude and latitude of the cell centres and their population.
+    """
+    window = _reprojected_window(raster_dataset, bbox)
+    if window is None:
+        log.warning("The study area does not overlap the raster dataset.")
+        return np.empty(0), np.empty(0), np.empty(0)
+    x_offset, y_offset, x_size, y_size = window
+    raster_band = raster_dataset.GetRasterBand(1)
+    population = raster_band.ReadAsArray(x_offset, y_offset, x_size, y_size)
+
+    populated = np.isfinite(population) & (population > 0)
+    no_data_value = raster_band.GetNoDataValue()
+    if no_data_value is not None:
+        populated &= population != no_data_value
+    rows, columns = np.nonzero(populated)
+
+    (
+        origin_x,
+        pixel_width,
+        _,
+        origin_y,
+        _,
+        pixel_height,
+    ) = raster_dataset.GetGeoTransform()
+    x = origin_x + (x_offset + columns + 0.5) * pixel_width
+    y = origin_y + (y_offset + rows + 0.5) * pixel_height
+    return x, y, population[rows, columns].astype(float)
+
+
+def distribute_cell_population(
+    node_index: NodeIndex,
+    x: np.ndarray,
+    y: np.ndarray,
+    population: np.ndarray,
+    num_nearest: int = 4,
+    max_distance: float = 1000.0,
+    chunk_size: int = 1_000_000,
+) -> np.ndarray:
+    """
+    Distribute the population of raster cells over their nearest nodes.
+
+    Every populated cell is a demand source. Its population is split over
+    its nearest nodes within max_distance in inverse proportion to their
+    distance (at least 1 m), so every cell is counted exactly once, however
+    many nodes it contains. Cells without a node within max_distance are
+    dropped. The cells are snapped in chunks with one bulk query each.
+
+    Args:
+        node_index (NodeIndex): Index of the graph nodes.
+        x (numpy.ndarray): Longitude of every cell centre.
+        y (numpy.ndarray): Latitude of every cell centre.
+        population (numpy.ndarray): Population of every cell.
+        num_nearest (int, optional): Number of nodes a cell is split over.
+         Defaults to 4.
+        max_distance (float, optional): Maximum distance between a cell
+         centre and its nodes in metres. Defaults to 1000.
+        chunk_size (int, optional): Number of cells per query.
+         Defaults to 1,000,000.
+
+    Returns:
+        numpy.ndarray: Population of every node, in the order of the node IDs
+         of the index.
+    """
+    num_nodes = len(node_index.node_ids)
+    num_nearest = min(num_nearest, num_nodes)
+    node_population = np.zeros(num_nodes)
+    dropped_population = 0.0
+    for start in range(0, len(x), chunk_size):
+        cells = slice(start, start + chunk_size)
+        cell_population = population[cells]
+        distances, positions = node_index.tree.query(
+            node_index.project(x[cells], y[cells]),
+            k=num_nearest,
+            distance_upper_bound=max_distance,
+            workers=-1,
+        )
+        distances = distances.reshape(len(cell_population), num_nearest)
+        positions = positions.reshape(len(cell_population), num_nearest)
+
+        # missing neighbours have an infinite distance and get no share
+        shares = 1 / np.maximum(distances, 1.0)
+        totals = shares.sum(axis=1)
+        snapped = totals > 0
+        dropped_population += cell_population[~snapped].sum()
+        shares[snapped] *= (cell_population[snapped] / totals[snapped])[:, None]
+
+        found = np.isfinite(distances)
+        node_population += np.bincount(
+            positions[found], weights=shares[found], minlength=num_nodes
+        )
+    if dropped_population > 0:
+        log.warning(
+            f"Population of {dropped_population:.6g} is further than"
+            f" {max_distance} m from the network and dropped."
+        )
+    return node_population
 
 
 def select_nodes_by_population_weight(
     nodes: Dict[int, Tuple[float, float]],
     population_weights: List[float],
     num_nodes_to_select: int,
+    seed: Optional[int] = None,
+    exclude_same_nodes: bool = False,
 ) -> Tuple[List[int], List[int]]:
     """
     Get a pair of start and end nodes weighted by population.
 
+    If the sum of the population weights is 0, the nodes are selected randomly.
+
     Args:
         nodes (dict): Dictionary of node coordinates.
         population_weights (list): List of population values at nodes.
         num_nodes_to_select (int): Number of nodes to select.
+        seed (int, optional): Seed of the random selection. Defaults to None.
+        exclude_same_nodes (bool, optional): Do not select the same start and
+         end node at the same index. Defaults to False.
 
     Returns:
         tuple: Two lists containing the selected start and end nodes.
     """
-    if sum(population_weights) == 0:
-        log.warning(
-            "The sum of population weights is 0. "
-            "Cannot select nodes. Using random selection."
-        )
-        start_nodes = random.choices(list(nodes), k=num_nodes_to_select)
+    sampler = ODSampler(list(nodes), weights=population_weights, seed=seed)
+    return sampler.sample_pairs(
+        num_nodes_to_select, exclude_same_nodes=exclude_same_nodes
+    )
 
-        end_nodes = random.choices(list(nodes), k=num_nodes_to_select)
-    # TODO: check that start and end node at the same index are not the same
-    else:
-        start_nodes = random.choices(
-            list(nodes), weights=population_weights, k=num_nodes_to_select
-        )
-
-        end_nodes = random.choices(
-            list(nodes), weights=population_weights, k=num_nodes_to_select
-        )
-    return start_nodes, end_nodes
 
-
-def get_population_weighted_nodes(
+def get_population_sampler(
     nodes: Dict[int, Dict[str, float]],
-    num_nodes_to_select: int,
-) -> Tuple[List[int], List[int]]:
+    seed: Optional[int] = None,
+    raster_dataset: Optional[gdal.Dataset] = None,
+    population_model: str = "node",
+    node_index: Optional[NodeIndex] = None,
+    margin: float = 0.01,
+) -> ODSampler:
     """
-    Get a pair of start and end nodes weighted by population.
+    Get a sampler of start and end nodes weighted by population.
+
+    The "node" model gives every node the population of the cell it lies in.
+    The "cell" model distributes the population of every populated cell over
+    its nearest nodes (see `distribute_cell_population`).
 
     Args:
         nodes (dict): Dictionary of node coordinates.
-        num_nodes_to_select (int): Number of nodes to select.
+        seed (int, optional): Seed of the random selection. Defaults to None.
+        raster_dataset (gdal.Dataset, optional): Already opened population
+         raster in EPSG 4326, e.g. shared between batch jobs. Defaults to None
+         (open the raster at RASTER_PATH).
+        population_model (str, optional): "node" or "cell". Defaults to "node".
+        node_index (NodeIndex, optional): Index of the nodes for the cell
+         model. Defaults to None (build the index).
+        margin (float, optional): Margin around the nodes in degrees within
+         which cells are read by the cell model. Defaults to 0.01.
 
     Returns:
-        tuple: Two lists containing the selected start and end nodes.
+        ODSampler: Sampler of the nodes weighted by their population.
     """
+    if population_model not in POPULATION_MODELS:
+        log.error(f"Unknown population model: '{population_model}'.")
+        raise ValueError(f"Unknown population model: '{population_model}'.")
     try:
         absolute_path = RASTER_PATH
-        raster_dataset = open_and_reproject_raster(absolute_path)
+        node_coordinates = get_node_coordinates(nodes)
+        if raster_dataset is None:
+            raster_dataset = open_and_reproject_raster(
+                absolute_path, bbox=get_bounding_box(node_coordinates)
+            )
         if raster_dataset is None:
             log.error("Failed to access the raster dataset.")
             raise Exception("Failed to access the raster dataset.")
-        node_coordinates = get_node_coordinates(nodes)
-        population_at_nodes = get_population_at_nodes(raster_dataset, node_coordinates)
-        start_nodes, end_nodes = select_nodes_by_population_weight(
-            node_coordinates, population_at_nodes, num_nodes_to_select
+        if population_model == "node":
+            population_at_nodes = get_population_at_nodes(
+                raster_dataset, node_coordinates
+            )
+            return ODSampler(list(node_coordinates), population_at_nodes, seed=seed)
+
+        if node_index is None:
+            latitudes, longitudes = np.array(list(node_coordinates.values())).T
+            node_index = NodeIndex.from_coordinates(
+                list(node_coordinates), longitudes, latitudes
+            )
+        west, south, east, north = get_bounding_box(node_coordinates)
+        x, y, population = get_populated_cells(
+            raster_dataset,
+            (west - margin, south - margin, east + margin, north + margin),
         )
-        return start_nodes, end_nodes
+        log.info(f"Distribute the population of {len(population)} cells.")
+        node_population = distribute_cell_population(node_index, x, y, population)
+        return ODSampler(node_index.node_ids, node_population, seed=seed)
 
     except Exception as e:
-        log.error(f"Error in get_population_weighted_nodes: {e}")
+        log.error(f"Error in get_population_sampler: {e}")
         raise e
+
+
+def get_population_weighted_nodes(
+    nodes: Dict[int, Dict[str, float]],
+    num_nodes_to_select: int,
+    seed: Optional[int] = None,
+    exclude_same_nodes: bool = False,
+    raster_dataset: Optional[gdal.Dataset] = None,
+) -> Tuple[List[int], List[int]]:
+    """
+    Get a pair of start and end nodes weighted by population.
+
+    Args:
+        nodes (dict): Dictionary of node coordinates.
+        num_nodes_to_select (int): Number of nodes to select.
+        seed (int, optional): Seed of the random selection. Defaults to None.
+        exclude_same_nodes (bool, optional): Do not select the same start and
+         end node at the same index. Defaults to False.
+        raster_dataset (gdal.Dataset, optional): Already opened population
+         raster in EPSG 4326, e.g. shared between batch jobs. Defaults to None
+         (open the raster at RASTER_PATH).
+
+    Returns:
+        tuple: Two lists containing the selected start and end nodes.
+    """
+    sampler = get_population_sampler(nodes, seed=seed, raster_dataset=raster_dataset)
+    return sampler.sample_pairs(
+        num_nodes_to_select, exclude_same_nodes=exclude_same_nodes
+    )
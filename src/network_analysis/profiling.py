@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import functools
+import logging as log
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from definitions import PROFILERS
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# stage records of this process, in the order the stages finished
+_records: List[Dict[str, Any]] = []
+_active_stages: List[str] = []
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """
+    Get the peak resident set size of this process so far.
+
+    Returns:
+        float or None: Peak RSS in MB, None if unknown on this platform.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _children_cpu_time() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Record the wall time, CPU time and peak RSS of a pipeline stage.
+
+    Stages may be nested, every record names its enclosing stage. The CPU
+    time of worker processes is counted once they have finished.
+
+    Args:
+        name (str): Name of the stage.
+    """
+    parent = _active_stages[-1] if _active_stages else None
+    _active_stages.append(name)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    children_start = _children_cpu_time()
+    try:
+        yield
+    finally:
+        _active_stages.pop()
+        _records.append(
+            {
+                "stage": name,
+                "parent": parent,
+                "wall_time": time.perf_counter() - wall_start,
+                "cpu_time": time.process_time() - cpu_start,
+                "child_cpu_time": _children_cpu_time() - children_start,
+                "peak_rss_mb": _peak_rss_mb(),
+                "pid": os.getpid(),
+            }
+        )
+
+
+def profiled(name: str) -> Callable:
+    """
+    Decorate a function to record every call as a stage.
+
+    Args:
+        name (str): Name of the stage.
+
+    Returns:
+        function: The decorator.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_stage_records() -> List[Dict[str, Any]]:
+    """
+    Get the stages recorded in this process so far.
+
+    Returns:
+        list: Copy of the stage records with the stage and parent names, wall
+         and CPU time, CPU time of child processes, peak RSS and process ID.
+    """
+    return list(_records)
+
+
+def reset_stages() -> None:
+    """
+    Remove all recorded stages.
+
+    Only meant for tests, which need a clean record per test. A run records
+    its stages once from the start of the process.
+    """
+    _records.clear()
+
+
+def add_stage_records(records: List[Dict[str, Any]]) -> None:
+    """
+    Add the stage records of a worker process to this process.
+
+    Args:
+        records (list): Stage records of the worker.
+    """
+    _records.extend(records)
+
+
+def run_with_stages(
+    function: Callable, *args, **kwargs
+) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    Call a function in a worker process and return its stage records.
+
+    Args:
+        function (function): Function to call.
+        *args: Positional arguments of the function.
+        **kwargs: Keyword arguments of the function.
+
+    Returns:
+        tuple: The result of the function and the stages recorded during
+         the call.
+    """
+    # a forked worker inherits the records of its parent
+    start = len(_records)
+    result = function(*args, **kwargs)
+    return result, _records[start:]
+
+
+def summarize_stages(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Sum up the records of every stage.
+
+    Args:
+        records (list): Stage records.
+
+    Returns:
+        dict: Number of calls, wall time, CPU time and peak RSS per stage.
+    """
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(
+            record["stage"],
+            {"calls": 0, "wall_time": 0.0, "cpu_time": 0.0, "peak_rss_mb": None},
+        )
+        entry["calls"] += 1
+        entry["wall_time"] += record["wall_time"]
+        entry["cpu_time"] += record["cpu_time"] + record["child_cpu_time"]
+        if record["peak_rss_mb"] is not None:
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"] or 0, record["peak_rss_mb"])
+    return summary
+
+
+def write_stage_report(
+    output_folder: str,
+    total_wall_time: Optional[float] = None,
+    file_name: str = "stage_timings.json",
+) -> str:
+    """
+    Write the recorded stages as JSON next to the results.
+
+    Args:
+        output_folder (str): Folder of the report.
+        total_wall_time (float, optional): Wall time of the whole run.
+         Defaults to None.
+        file_name (str, optional): Name of the report.
+         Defaults to "stage_timings.json".
+
+    Returns:
+        str: Path to the report.
+    """
+    records = get_stage_records()
+    report = {
+        "total_wall_time": total_wall_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        "summary": summarize_stages(records),
+        "stages": records,
+    }
+    os.makedirs(output_folder, exist_ok=True)
+    report_path = os.path.join(output_folder, file_name)
+    with open(report_path, "w") as file:
+        json.dump(report, file, indent=2)
+    log.info(f"Stage timings saved to: {report_path}")
+    return report_path
+
+
+@contextmanager
+def profile_run(profiler: Optional[str], output_folder: str) -> Iterator[None]:
+    """
+    Profile a block of code with cProfile or pyinstrument.
+
+    cProfile writes "profile.prof" (readable with pstats or snakeviz),
+    pyinstrument writes "profile.html".
+
+    Args:
+        profiler (str or None): "cprofile", "pyinstrument" or None (no
+         profiling).
+        output_folder (str): Folder of the profile.
+    """
+    if profiler is None:
+        yield
+        return
+    if profiler not in PROFILERS:
+        log.error(f"Unknown profiler: '{profiler}'.")
+        raise ValueError(f"Unknown profiler: '{profiler}'.")
+    os.makedirs(output_folder, exist_ok=True)
+
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile_path = os.path.join(output_folder, "profile.prof")
+            profile.dump_stats(profile_path)
+            log.info(f"Profile saved to: {profile_path}")
+        return
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError as e:
+        log.error("pyinstrument is not installed, use --profile cprofile.")
+        raise e
+    profile = Profiler()
+    profile.start()
+    try:
+        yield
+    finally:
+        profile.stop()
+        profile_path = os.path.join(output_folder, "profile.html")
+        with open(profile_path, "w") as file:
+            file.write(profile.output_html())
+        log.info(f"Profile saved to: {profile_path}")
@@ -0,0 +1,703 @@
+import logging as log
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from heapq import heappush, heappop
+from itertools import count
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from network_analysis.contraction import ContractionHierarchy
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.od_sampler import ODSampler
+from network_analysis.shared_graph import SharedGraph, pool_graph, worker_graph
+
+
+# graph and edge counter of a worker process, set once by the pool initializer
+_worker_graph = None
+_worker_counter = None
+
+
+def group_pairs_by_origin(
+    start_nodes: List[Hashable], end_nodes: List[Hashable]
+) -> Dict[Hashable, List[Hashable]]:
+    """
+    Group origin-destination pairs by their origin.
+
+    Repeated pairs are kept, so every pair still yields its own route.
+
+    Args:
+        start_nodes (list): Origin node of every pair.
+        end_nodes (list): Destination node of every pair.
+
+    Returns:
+        dict: Destinations keyed by origin, in the order of the pairs.
+    """
+    destinations_by_origin = {}
+    for origin_node, destination_node in zip(start_nodes, end_nodes):
+        destinations_by_origin.setdefault(origin_node, []).append(destination_node)
+    return destinations_by_origin
+
+
+def group_pair_volumes(
+    start_nodes: List[Hashable], end_nodes: List[Hashable], volumes: Sequence[float]
+) -> Dict[Hashable, Dict[Hashable, float]]:
+    """
+    Group weighted origin-destination pairs by their origin.
+
+    Repeated pairs are merged and their volumes summed, so every distinct
+    pair is routed only once.
+
+    Args:
+        start_nodes (list): Origin node of every pair.
+        end_nodes (list): Destination node of every pair.
+        volumes (sequence): Trip volume of every pair.
+
+    Returns:
+        dict: Volume keyed by destination, keyed by origin.
+    """
+    volumes_by_origin = {}
+    for origin_node, destination_node, volume in zip(start_nodes, end_nodes, volumes):
+        destination_volumes = volumes_by_origin.setdefault(origin_node, {})
+        destination_volumes[destination_node] = (
+            destination_volumes.get(destination_node, 0) + volume
+        )
+    return volumes_by_origin
+
+
+def shortest_path_tree(
+    graph: nx.MultiDiGraph,
+    origin: Hashable,
+    destinations: Iterable[Hashable],
+    weight: str,
+) -> Dict[Hashable, Optional[Hashable]]:
+    """
+    Grow a shortest path tree (Dijkstra) until all destinations are settled.
+
+    Parallel edges are weighted with their minimal weight and missing
+    weights count as 1, like ``ox.shortest_path``.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street network graph.
+        origin (Hashable): Origin node.
+        destinations (iterable): Destination nodes.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        dict: Predecessor of every settled node (None for the origin).
+    """
+    remaining = set(destinations)
+    pred = {origin: None}
+    seen = {origin: 0}
+    settled = {}
+    c = count()
+    Q = [(0, next(c), origin)]
+    while Q and remaining:
+        dist, _, v = heappop(Q)
+        if v in settled:
+            continue
+        settled[v] = pred[v]
+        remaining.discard(v)
+        for w, edge_data in graph._adj[v].items():
+            vw_dist = dist + min(attr.get(weight, 1) for attr in edge_data.values())
+            if w not in settled and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                pred[w] = v
+                heappush(Q, (vw_dist, next(c), w))
+    return settled
+
+
+def path_from_tree(
+    tree: Dict[Hashable, Optional[Hashable]], destination: Hashable
+) -> Optional[List[Hashable]]:
+    """
+    Extract the node path to a destination from a shortest path tree.
+
+    Args:
+        tree (dict): Predecessor of every settled node.
+        destination (Hashable): Destination node.
+
+    Returns:
+        list or None: Nodes along the path, None if the destination was not
+         reached.
+    """
+    if destination not in tree:
+        return None
+    path = [destination]
+    while tree[path[-1]] is not None:
+        path.append(tree[path[-1]])
+    return path[::-1]
+
+
+class EdgeCounter:
+    """
+    Streaming counter of the routes that use each edge.
+
+    The counts are kept in a NumPy array indexed by edge ID. The edge IDs of
+    added routes are buffered and added in bulk, so no per-route data is
+    kept. Node routes are mapped to the parallel edge with the lowest
+    "length", like ``ox.utils_graph.route_to_gdf``. A weighted counter adds
+    the trip volume of every route instead of one.
+
+    Attributes:
+        edges (list): (u, v, key) tuple of every edge ID.
+        counts (numpy.ndarray): Number of routes (or trip volume) using every
+         edge.
+        num_routes (int): Number of added routes.
+    """
+
+    def __init__(
+        self,
+        edges: List[Tuple[Hashable, Hashable, Hashable]],
+        pair_edge: Optional[Dict[Tuple[Hashable, Hashable], int]] = None,
+        buffer_size: int = 1_000_000,
+        weighted: bool = False,
+    ):
+        """
+        Args:
+            edges (list): (u, v, key) tuple of every edge ID.
+            pair_edge (dict, optional): Edge ID used for a step between two
+             nodes of a route. Only needed to add node routes.
+            buffer_size (int, optional): Number of buffered edge IDs before
+             they are added to the counts. Defaults to 1,000,000.
+            weighted (bool, optional): Count trip volumes as floats.
+             Defaults to False.
+        """
+        self.edges = edges
+        self.pair_edge = pair_edge
+        self.weighted = weighted
+        self.counts = np.zeros(len(edges), dtype=np.float64 if weighted else np.int64)
+        self.num_routes = 0
+        self._buffer = []
+        self._volumes = []
+        self._buffer_size = buffer_size
+
+    @classmethod
+    def from_graph(
+        cls,
+        graph: Union[nx.MultiDiGraph, CSRGraph, ContractionHierarchy],
+        weight: str = "length",
+        weighted: bool = False,
+    ) -> "EdgeCounter":
+        """
+        Create an empty counter for the edges of a graph.
+
+        Args:
+            graph (networkx.MultiDiGraph, CSRGraph or ContractionHierarchy):
+             Street network graph.
+            weight (str, optional): Edge attribute to choose among parallel
+             edges of node routes. Defaults to "length".
+            weighted (bool, optional): Count trip volumes as floats.
+             Defaults to False.
+
+        Returns:
+            EdgeCounter: Counter with the edge IDs of the graph.
+        """
+        if isinstance(graph, ContractionHierarchy):
+            graph = graph.graph
+        if isinstance(graph, CSRGraph):
+            return cls(graph.edge_tuples(), weighted=weighted)
+        edges = list(graph.edges(keys=True))
+        edge_id = {edge: i for i, edge in enumerate(edges)}
+        pair_edge = {
+            (u, v): edge_id[
+                (u, v, min(graph[u][v].items(), key=lambda item: item[1][weight])[0])
+            ]
+            for u, v in dict.fromkeys(graph.edges())
+        }
+        return cls(edges, pair_edge, weighted=weighted)
+
+    def copy_empty(self) -> "EdgeCounter":
+        """
+        Create an empty counter sharing the edge IDs of this counter.
+
+        Returns:
+            EdgeCounter: Counter without routes.
+        """
+        return EdgeCounter(
+            self.edges, self.pair_edge, self._buffer_size, weighted=self.weighted
+        )
+
+    def add_route(self, route: List[Hashable], volume: float = 1) -> None:
+        """
+        Count the edges of a node route.
+
+        Args:
+            route (list): Nodes along the route.
+            volume (float, optional): Trip volume of the route, only used by
+             weighted counters. Defaults to 1.
+        """
+        pair_edge = self.pair_edge
+        self.add_edge_ids(
+            [pair_edge[pair] for pair in zip(route[:-1], route[1:])], volume
+        )
+
+    def add_edge_ids(self, edge_ids: List[int], volume: float = 1) -> None:
+        """
+        Count the edges of a route given by edge IDs.
+
+        Args:
+            edge_ids (list): Edge IDs along the route.
+            volume (float, optional): Trip volume of the route, only used by
+             weighted counters. Defaults to 1.
+        """
+        self._buffer.extend(edge_ids)
+        if self.weighted:
+            self._volumes.extend([volume] * len(edge_ids))
+        self.num_routes += 1
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Add the buffered edge IDs to the counts.
+        """
+        if self._buffer:
+            self.counts += np.bincount(
+                self._buffer,
+                weights=self._volumes if self.weighted else None,
+                minlength=len(self.edges),
+            )
+            self._buffer = []
+            self._volumes = []
+
+    def merge(self, counts: np.ndarray, num_routes: int) -> None:
+        """
+        Add the counts of another counter over the same edge IDs.
+
+        Args:
+            counts (numpy.ndarray): Number of routes using every edge.
+            num_routes (int): Number of routes of the other counter.
+        """
+        self.counts += counts
+        self.num_routes += num_routes
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the number of routes of every used edge.
+
+        Returns:
+            pandas.DataFrame: Columns u, v, key and centrality.
+        """
+        self.flush()
+        used = np.flatnonzero(self.counts)
+        centrality_df = pd.DataFrame(
+            [self.edges[i] for i in used], columns=["u", "v", "key"]
+        )
+        centrality_df["centrality"] = self.counts[used]
+        return centrality_df
+
+
+def _init_worker(
+    graph: Union[nx.MultiDiGraph, CSRGraph, ContractionHierarchy, SharedGraph],
+    weighted: bool = False,
+) -> None:
+    """
+    Store the graph and its edge IDs in a worker process, so they are
+    transferred and built only once. Shared graph arrays are attached
+    instead of copied.
+
+    Args:
+        graph (networkx.MultiDiGraph, CSRGraph, ContractionHierarchy or
+         SharedGraph): Street network graph.
+        weighted (bool, optional): Count trip volumes. Defaults to False.
+    """
+    global _worker_graph, _worker_counter
+    if isinstance(graph, SharedGraph):
+        graph = graph.attach()
+    _worker_graph = graph
+    _worker_counter = EdgeCounter.from_graph(graph, weighted=weighted)
+
+
+def _count_routes(
+    graph: Union[nx.MultiDiGraph, CSRGraph, ContractionHierarchy],
+    destinations_by_origin: Dict[Hashable, Iterable[Hashable]],
+    weight: str,
+    edge_counter: EdgeCounter,
+) -> None:
+    """
+    Route a shard of origin-destination pairs and count the edge usage.
+
+    Args:
+        graph (networkx.MultiDiGraph, CSRGraph or ContractionHierarchy): Street
+         network graph. For a CSRGraph or ContractionHierarchy the nodes are
+         given as node positions.
+        destinations_by_origin (dict): Destinations keyed by origin, either a
+         list or a dict of their trip volumes.
+        weight (str): Edge attribute used as weight.
+        edge_counter (EdgeCounter): Counter to which the routes are added.
+    """
+    for origin_node, destination_nodes in destinations_by_origin.items():
+        volumes = destination_nodes if isinstance(destination_nodes, dict) else None
+        if isinstance(graph, ContractionHierarchy):
+            # one query per pair, the hierarchy makes each query cheap
+            routes = (
+                graph.shortest_path_edges(origin_node, destination_node)
+                for destination_node in destination_nodes
+            )
+        elif isinstance(graph, CSRGraph):
+            tree = graph.shortest_path_tree(origin_node, destination_nodes, weight)
+            routes = (
+                graph.path_edges(tree, destination_node, weight)
+                for destination_node in destination_nodes
+            )
+        else:
+            tree = shortest_path_tree(graph, origin_node, destination_nodes, weight)
+            routes = (
+                path_from_tree(tree, destination_node)
+                for destination_node in destination_nodes
+            )
+
+        for destination_node, route in zip(destination_nodes, routes):
+            volume = volumes[destination_node] if volumes is not None else 1
+            if isinstance(graph, nx.Graph):
+                if route is not None and len(route) > 1:
+                    edge_counter.add_route(route, volume)
+            elif route:
+                edge_counter.add_edge_ids(route, volume)
+
+
+def _count_routes_in_worker(
+    destinations_by_origin: Dict[Hashable, Iterable[Hashable]], weight: str
+) -> Tuple[np.ndarray, int]:
+    """
+    Route a shard of origin-destination pairs on the graph of the worker.
+
+    Args:
+        destinations_by_origin (dict): Destinations keyed by origin, either a
+         list or a dict of their trip volumes.
+        weight (str): Edge attribute used as weight.
+
+    Returns:
+        tuple: Number of routes using every edge and the number of routes.
+    """
+    edge_counter = _worker_counter.copy_empty()
+    _count_routes(_worker_graph, destinations_by_origin, weight, edge_counter)
+    edge_counter.flush()
+    return edge_counter.counts, edge_counter.num_routes
+
+
+def _count_shards(
+    executor: ProcessPoolExecutor,
+    shards: List[Dict[Hashable, Iterable[Hashable]]],
+    weight: str,
+    edge_counter: EdgeCounter,
+) -> None:
+    """
+    Route the shards in a pool of `routing_pool` and merge their edge counts.
+
+    Args:
+        executor (ProcessPoolExecutor): Pool of workers holding the graph.
+        shards (list): Destinations keyed by origin of every shard.
+        weight (str): Edge attribute used as weight.
+        edge_counter (EdgeCounter): Counter to which the routes are added.
+    """
+    edge_counter.flush()
+    for counts, num_routes in executor.map(
+        _count_routes_in_worker, shards, [weight] * len(shards)
+    ):
+        edge_counter.merge(counts, num_routes)
+
+
+def _shard_origins(
+    destinations_by_origin: Dict[Hashable, Iterable[Hashable]], num_shards: int
+) -> List[Dict[Hashable, Iterable[Hashable]]]:
+    """
+    Split the origins into shards with a similar number of pairs.
+
+    Origins stay whole so every origin is searched only once. The split
+    only depends on the pairs, not on timing.
+
+    Args:
+        destinations_by_origin (dict): Destinations keyed by origin.
+        num_shards (int): Number of shards.
+
+    Returns:
+        list: Non-empty shards of destinations keyed by origin.
+    """
+    shards = [{} for _ in range(num_shards)]
+    sizes = [0] * num_shards
+    # largest origins first, each to the currently smallest shard
+    for origin_node, destination_nodes in sorted(
+        destinations_by_origin.items(), key=lambda item: -len(item[1])
+    ):
+        smallest = sizes.index(min(sizes))
+        shards[smallest][origin_node] = destination_nodes
+        sizes[smallest] += len(destination_nodes)
+    return [shard for shard in shards if shard]
+
+
+@contextmanager
+def routing_pool(
+    graph: Union[nx.MultiDiGraph, CSRGraph, ContractionHierarchy, SharedGraph],
+    workers: int,
+    weighted: bool = False,
+) -> Iterator[Optional[ProcessPoolExecutor]]:
+    """
+    Start worker processes that receive the graph once for many routings.
+
+    Args:
+        graph (networkx.MultiDiGraph, CSRGraph, ContractionHierarchy or
+         SharedGraph): Street network graph.
+        workers (int): Number of worker processes.
+        weighted (bool, optional): Count trip volumes. Defaults to False.
+
+    Yields:
+        ProcessPoolExecutor or None: The pool, None for a single worker.
+    """
+    if workers <= 1:
+        yield None
+        return
+    with worker_graph(graph, workers) as graph_for_workers:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(graph_for_workers, weighted),
+        ) as executor:
+            yield executor
+
+
+def count_route_edges(
+    graph: Union[nx.MultiDiGraph, CSRGraph, ContractionHierarchy, SharedGraph],
+    start_nodes: List[Hashable],
+    end_nodes: List[Hashable],
+    weight: str,
+    workers: int = 1,
+    volumes: Optional[Sequence[float]] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    edge_counter: Optional[EdgeCounter] = None,
+) -> EdgeCounter:
+    """
+    Count how many shortest paths of origin-destination pairs use each edge.
+
+    The pairs are grouped by origin and sharded across a process pool whose
+    workers receive the graph once at start-up. A NetworkX graph is
+    converted to a CSRGraph for the pool and the arrays are put into shared
+    memory, so the workers attach them instead of unpickling a copy each.
+    Every worker returns the edge counts of its shard, which are summed at
+    the end, so the result does not depend on the number of workers (up to
+    ties between equally short routes, see `pool_graph`).
+
+    With trip volumes every distinct pair is routed once and its edges are
+    counted with the summed volume of the pair.
+
+    A ContractionHierarchy answers every pair with a bidirectional query
+    instead of one Dijkstra search per origin. It must be built for the
+    weight of the routes.
+
+    Args:
+        graph (networkx.MultiDiGraph, CSRGraph, ContractionHierarchy or
+         SharedGraph): Street network graph.
+        start_nodes (list): OSM ID of the origin of every pair.
+        end_nodes (list): OSM ID of the destination of every pair.
+        weight (str): Edge attribute used as weight.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        volumes (sequence, optional): Trip volume of every pair. Defaults to
+         None (every pair is one route).
+        executor (ProcessPoolExecutor, optional): Running pool of
+         `routing_pool` for the same graph, e.g. shared by several batches.
+         Defaults to None (start a pool for more than one worker).
+        edge_counter (EdgeCounter, optional): Counter to which the routes are
+         added, e.g. with the routes of earlier batches. Defaults to None
+         (new counter).
+
+    Returns:
+        EdgeCounter: Number of routes (or trip volume) using each edge.
+    """
+    if workers <= 0:
+        log.error("Number of workers must be a positive integer.")
+        raise ValueError("Number of workers must be a positive integer.")
+
+    shared_graph = None
+    if isinstance(graph, SharedGraph):
+        shared_graph = graph
+        graph = shared_graph.attach()
+    elif executor is None:
+        graph = pool_graph(graph, workers)
+    if isinstance(graph, ContractionHierarchy) and graph.weight != weight:
+        log.error(
+            f"Contraction hierarchy for '{graph.weight}' cannot route by '{weight}'."
+        )
+        raise ValueError(
+            f"Contraction hierarchy for '{graph.weight}' cannot route by '{weight}'."
+        )
+    if volumes is not None and len(volumes) != len(start_nodes):
+        log.error("The number of volumes does not match the number of pairs.")
+        raise ValueError("The number of volumes does not match the number of pairs.")
+    if isinstance(graph, (CSRGraph, ContractionHierarchy)):
+        node_index = graph.node_index
+        start_nodes = [node_index[node] for node in start_nodes]
+        end_nodes = [node_index[node] for node in end_nodes]
+    if volumes is None:
+        destinations_by_origin = group_pairs_by_origin(start_nodes, end_nodes)
+    else:
+        destinations_by_origin = group_pair_volumes(start_nodes, end_nodes, volumes)
+    log.info(
+        f"Route {len(start_nodes)} pairs from {len(destinations_by_origin)}"
+        f" distinct origins with {workers} worker processes."
+    )
+
+    weighted = volumes is not None
+    if edge_counter is None:
+        edge_counter = EdgeCounter.from_graph(graph, weighted=weighted)
+    if executor is None and workers == 1:
+        _count_routes(graph, destinations_by_origin, weight, edge_counter)
+        edge_counter.flush()
+        return edge_counter
+
+    shards = _shard_origins(destinations_by_origin, workers * 4)
+    if executor is None:
+        with routing_pool(shared_graph or graph, workers, weighted) as executor:
+            _count_shards(executor, shards, weight, edge_counter)
+    else:
+        _count_shards(executor, shards, weight, edge_counter)
+    return edge_counter
+
+
+def split_half_error(first: np.ndarray, second: np.ndarray) -> float:
+    """
+    Estimate the sampling error of edge counts from two halves of the routes.
+
+    Both halves are independent samples of the same distribution, so the
+    difference of their normalized counts is sampling noise only. Each half
+    has twice the variance of the combined counts, so the standard error of
+    the combined normalized counts is about half of that difference. The
+    error of every edge is relative to the largest combined normalized
+    count, so rarely used edges do not dominate the measure.
+
+    Args:
+        first (numpy.ndarray): Edge counts of the first half of the routes.
+        second (numpy.ndarray): Edge counts of the second half of the routes.
+
+    Returns:
+        float: Half of the largest absolute difference of the normalized
+         counts of both halves divided by the largest combined normalized
+         count, infinity if a half is empty.
+    """
+    first_total = first.sum()
+    second_total = second.sum()
+    if first_total == 0 or second_total == 0:
+        return float("inf")
+    first_share = first / first_total
+    second_share = second / second_total
+    combined_share = (first + second) / (first_total + second_total)
+    return float(np.abs(first_share - second_share).max() / 2 / combined_share.max())
+
+
+def count_route_edges_until_converged(
+    graph: Union[nx.MultiDiGraph, CSRGraph, ContractionHierarchy, SharedGraph],
+    sampler: ODSampler,
+    max_routes: int,
+    weight: str,
+    tolerance: float,
+    batch_size: int = 1000,
+    workers: int = 1,
+    exclude_same_nodes: bool = False,
+    on_batch: Optional[Callable[[EdgeCounter, int, float], None]] = None,
+) -> Tuple[EdgeCounter, List[float]]:
+    """
+    Count the edge usage of sampled routes in batches until the counts converge.
+
+    Every batch is split into two halves that are counted separately. After
+    every batch the sampling error of the combined counts is estimated from
+    the difference between both halves (see `split_half_error`). Routing
+    stops once the error is at most the tolerance or max_routes pairs are
+    sampled. Unlike the change between consecutive batches, the error does
+    not depend on the batch size, which only sets how often it is checked.
+    The worker processes are started once and receive the graph once, every
+    batch is sharded over the same pool.
+
+    Args:
+        graph (networkx.MultiDiGraph, CSRGraph, ContractionHierarchy or
+         SharedGraph): Street network graph.
+        sampler (ODSampler): Sampler of the origin-destination pairs.
+        max_routes (int): Maximum number of pairs to sample.
+        weight (str): Edge attribute used as weight.
+        tolerance (float): Estimated error of the normalized edge usage,
+         relative to the most used edge, at which routing stops.
+        batch_size (int, optional): Number of pairs per batch. Defaults to 1000.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        exclude_same_nodes (bool, optional): Do not sample pairs with the same
+         origin and destination. Defaults to False.
+        on_batch (function, optional): Called after every batch with the edge
+         counter, the batch number and the error. Defaults to None.
+
+    Returns:
+        tuple: The edge counter and the estimated error after every batch.
+    """
+    if max_routes <= 0:
+        log.error("Number of routes must be a positive integer.")
+        raise ValueError("Number of routes must be a positive integer.")
+    if batch_size <= 0:
+        log.error("Batch size must be a positive integer.")
+        raise ValueError("Batch size must be a positive integer.")
+    if tolerance <= 0:
+        log.error("Tolerance must be positive.")
+        raise ValueError("Tolerance must be positive.")
+
+    shared_graph = None
+    if isinstance(graph, SharedGraph):
+        shared_graph = graph
+        graph = shared_graph.attach()
+    graph = pool_graph(graph, workers)
+    first_half = EdgeCounter.from_graph(graph)
+    second_half = first_half.copy_empty()
+    errors = []
+    num_sampled = 0
+    # the workers start once and keep the graph for all batches
+    with routing_pool(shared_graph or graph, workers) as executor:
+        while num_sampled < max_routes:
+            num_pairs = min(batch_size, max_routes - num_sampled)
+            start_nodes, end_nodes = sampler.sample_pairs(
+                num_pairs, exclude_same_nodes=exclude_same_nodes
+            )
+            num_sampled += num_pairs
+            middle = num_pairs // 2
+            for half, pairs in [
+                (first_half, slice(None, middle)),
+                (second_half, slice(middle, None)),
+            ]:
+                count_route_edges(
+                    graph,
+                    start_nodes[pairs],
+                    end_nodes[pairs],
+                    weight,
+                    workers=workers,
+                    executor=executor,
+                    edge_counter=half,
+                )
+            edge_counter = first_half.copy_empty()
+            edge_counter.merge(
+                first_half.counts + second_half.counts,
+                first_half.num_routes + second_half.num_routes,
+            )
+            error = split_half_error(first_half.counts, second_half.counts)
+            errors.append(error)
+            log.info(
+                f"Batch {len(errors)}: {edge_counter.num_routes} routes,"
+                f" estimated error of the edge distribution {error:.4g}."
+            )
+            if on_batch is not None:
+                on_batch(edge_counter, len(errors), error)
+            if error <= tolerance:
+                log.info(f"Edge distribution converged after {num_sampled} pairs.")
+                break
+        else:
+            log.warning(
+                f"Edge distribution did not converge to {tolerance} within"
+                f" {max_routes} pairs."
+            )
+    return edge_counter, errors
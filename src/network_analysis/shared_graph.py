@@ -0,0 +1,263 @@
+import os
+import logging as log
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import networkx as nx
+import numpy as np
+
+from network_analysis.csr_graph import CSRGraph
+
+# arrays of a CSRGraph, the edge weights are stored as "weight_<name>"
+SHARED_ARRAYS = [
+    "node_ids",
+    "x",
+    "y",
+    "edge_u",
+    "edge_v",
+    "edge_keys",
+    "indptr",
+    "edge_pair",
+    "pair_indptr",
+    "pair_u",
+    "pair_v",
+]
+WEIGHT_PREFIX = "weight_"
+
+
+def _graph_arrays(graph: CSRGraph) -> Dict[str, np.ndarray]:
+    """
+    Get the arrays of a CSRGraph keyed by name.
+
+    Args:
+        graph (CSRGraph): Array representation of the graph.
+
+    Returns:
+        dict: Arrays keyed by name, see SHARED_ARRAYS.
+    """
+    arrays = {name: getattr(graph, name) for name in SHARED_ARRAYS}
+    for name, values in graph.weights.items():
+        arrays[WEIGHT_PREFIX + name] = values
+    for name, values in arrays.items():
+        if values.dtype.hasobject:
+            log.error(f"The graph array '{name}' holds Python objects.")
+            raise ValueError(f"The graph array '{name}' holds Python objects.")
+    return arrays
+
+
+def _graph_from_arrays(arrays: Dict[str, np.ndarray]) -> CSRGraph:
+    """
+    Build a CSRGraph on top of existing arrays without copying them.
+
+    Args:
+        arrays (dict): Arrays keyed by name, see `_graph_arrays`.
+
+    Returns:
+        CSRGraph: Array representation of the graph.
+    """
+    weights = {
+        name[len(WEIGHT_PREFIX) :]: values
+        for name, values in arrays.items()
+        if name.startswith(WEIGHT_PREFIX)
+    }
+    return CSRGraph(weights=weights, **{name: arrays[name] for name in SHARED_ARRAYS})
+
+
+@dataclass
+class SharedGraph:
+    """
+    Picklable handle of the arrays of a CSRGraph in shared memory or in a
+    memory-mapped .npy bundle on disk.
+
+    Only the names, data types and shapes of the arrays are pickled, so
+    sending the handle to a worker process is cheap. `attach` maps the
+    arrays read-only into the process without copying them. The adjacency
+    lists of the routing are still built per process on first use.
+
+    Attributes:
+        arrays (dict): Data type and shape of every array keyed by name.
+        memory_names (dict): Shared memory block of every array, None for a
+         bundle.
+        bundle_dir (str): Directory of the .npy bundle, None for shared memory.
+    """
+
+    arrays: Dict[str, Tuple[str, Tuple[int, ...]]]
+    memory_names: Optional[Dict[str, str]] = None
+    bundle_dir: Optional[str] = None
+    _blocks: List[shared_memory.SharedMemory] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_bundle(cls, bundle_dir: str) -> "SharedGraph":
+        """
+        Open a bundle written by `save_graph_bundle`.
+
+        Args:
+            bundle_dir (str): Directory of the bundle.
+
+        Returns:
+            SharedGraph: Handle of the bundle.
+        """
+        arrays = {}
+        for file_name in sorted(os.listdir(bundle_dir)):
+            name, extension = os.path.splitext(file_name)
+            if extension == ".npy":
+                values = np.load(os.path.join(bundle_dir, file_name), mmap_mode="r")
+                arrays[name] = (values.dtype.str, values.shape)
+        missing = [name for name in SHARED_ARRAYS if name not in arrays]
+        if missing:
+            log.error(f"Graph bundle '{bundle_dir}' misses the arrays {missing}.")
+            raise ValueError(
+                f"Graph bundle '{bundle_dir}' misses the arrays {missing}."
+            )
+        return cls(arrays, bundle_dir=bundle_dir)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_blocks"] = []
+        return state
+
+    def attach(self) -> CSRGraph:
+        """
+        Map the shared arrays into this process.
+
+        Returns:
+            CSRGraph: Read-only graph on top of the shared arrays.
+        """
+        arrays = {}
+        blocks = []
+        for name, (dtype, shape) in self.arrays.items():
+            if self.bundle_dir is not None:
+                values = np.load(
+                    os.path.join(self.bundle_dir, name + ".npy"), mmap_mode="r"
+                )
+            else:
+                block = shared_memory.SharedMemory(name=self.memory_names[name])
+                blocks.append(block)
+                values = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                values.flags.writeable = False
+            arrays[name] = values
+        graph = _graph_from_arrays(arrays)
+        # the blocks are closed together with the graph using them
+        graph._buffers = blocks
+        return graph
+
+    def unlink(self) -> None:
+        """
+        Free the shared memory blocks created by `share_graph`. Graphs that
+        are already attached stay valid until they are deleted.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def share_graph(graph: Union[nx.MultiDiGraph, CSRGraph]) -> SharedGraph:
+    """
+    Copy the arrays of a graph into shared memory.
+
+    The blocks live until `SharedGraph.unlink` is called by the process that
+    shared them.
+
+    Args:
+        graph (networkx.MultiDiGraph or CSRGraph): Street network graph.
+
+    Returns:
+        SharedGraph: Handle of the shared arrays.
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_graph(graph)
+    shared_graph = SharedGraph({}, memory_names={})
+    try:
+        for name, values in _graph_arrays(graph).items():
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            shared_graph._blocks.append(block)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            shared_graph.arrays[name] = (values.dtype.str, values.shape)
+            shared_graph.memory_names[name] = block.name
+    except Exception as e:
+        shared_graph.unlink()
+        raise e
+    return shared_graph
+
+
+def save_graph_bundle(
+    graph: Union[nx.MultiDiGraph, CSRGraph], bundle_dir: str
+) -> SharedGraph:
+    """
+    Save the arrays of a graph as a bundle of .npy files.
+
+    The bundle outlives the process and is memory-mapped by every process
+    attaching it, e.g. workers of several analyses of the same graph.
+
+    Args:
+        graph (networkx.MultiDiGraph or CSRGraph): Street network graph.
+        bundle_dir (str): Directory of the bundle, created if missing.
+
+    Returns:
+        SharedGraph: Handle of the bundle.
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_graph(graph)
+    os.makedirs(bundle_dir, exist_ok=True)
+    for name, values in _graph_arrays(graph).items():
+        np.save(os.path.join(bundle_dir, name + ".npy"), values)
+    return SharedGraph.from_bundle(bundle_dir)
+
+
+def pool_graph(graph, workers: int):
+    """
+    Get the graph representation used with worker processes.
+
+    A NetworkX multigraph would be pickled into every worker, so for more
+    than one worker it is converted to a CSRGraph, whose arrays the workers
+    attach from shared memory (see `worker_graph`). Routes and betweenness
+    on both representations are the same, only ties between equally short
+    routes may be resolved differently.
+
+    Args:
+        graph (networkx.Graph, CSRGraph, ContractionHierarchy or SharedGraph):
+         Street network graph.
+        workers (int): Number of worker processes.
+
+    Returns:
+        CSRGraph or graph: The converted graph, otherwise the graph itself.
+    """
+    if workers > 1 and isinstance(graph, nx.MultiDiGraph):
+        log.info("Convert the graph to CSR arrays shared with the workers.")
+        return CSRGraph.from_graph(graph)
+    return graph
+
+
+@contextmanager
+def worker_graph(graph, workers: int) -> Iterator:
+    """
+    Get the graph to send to worker processes.
+
+    A CSRGraph is shared for more than one worker, so the workers attach its
+    arrays instead of unpickling a copy each. Other graphs, or a CSRGraph
+    that cannot be shared, are sent as they are.
+
+    Args:
+        graph (networkx.Graph, CSRGraph, ContractionHierarchy or SharedGraph):
+         Street network graph.
+        workers (int): Number of worker processes.
+
+    Yields:
+        SharedGraph or graph: Graph for the pool initializer.
+    """
+    if workers <= 1 or not isinstance(graph, CSRGraph):
+        yield graph
+        return
+    try:
+        shared_graph = share_graph(graph)
+    except (OSError, ValueError) as e:
+        log.warning(f"Failed to share the graph arrays, copy them instead: {e}")
+        yield graph
+        return
+    try:
+        yield shared_graph
+    finally:
+        shared_graph.unlink()
@@ -0,0 +1,361 @@
+import math
+import logging as log
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import geopandas as gpd
+import networkx as nx
+import osmnx as ox
+import pandas as pd
+import shapely
+from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+
+from network_analysis.betweenness import source_edge_betweenness
+from network_analysis.graph_cache import (
+    graph_cache_key,
+    load_cached_graph,
+    save_cached_graph,
+)
+from network_analysis.utils import add_travel_time
+
+# metres per degree of latitude
+METRES_PER_DEGREE = 111_320
+
+
+def make_tiles(
+    bounds: Tuple[float, float, float, float], tile_size: float, tile_buffer: float
+) -> List[Dict[str, Tuple[float, float, float, float]]]:
+    """
+    Split a bounding box into a grid of tiles with overlapping buffers.
+
+    Args:
+        bounds (tuple): Bounding box (west, south, east, north) in EPSG 4326.
+        tile_size (float): Edge length of a tile in kilometres.
+        tile_buffer (float): Width of the buffer around a tile in kilometres.
+
+    Returns:
+        list: Tiles with their "core" and "buffered" bounding boxes.
+    """
+    if tile_size <= 0 or tile_buffer < 0:
+        log.error("Tile size must be positive and the buffer non-negative.")
+        raise ValueError("Tile size must be positive and the buffer non-negative.")
+    west, south, east, north = bounds
+    cos_latitude = math.cos(math.radians((south + north) / 2))
+    size_y = tile_size * 1000 / METRES_PER_DEGREE
+    size_x = size_y / cos_latitude
+    buffer_y = tile_buffer * 1000 / METRES_PER_DEGREE
+    buffer_x = buffer_y / cos_latitude
+
+    num_x = max(1, math.ceil((east - west) / size_x))
+    num_y = max(1, math.ceil((north - south) / size_y))
+    tiles = []
+    for i in range(num_y):
+        for j in range(num_x):
+            core = (
+                west + j * size_x,
+                south + i * size_y,
+                # the last tiles end exactly at the bounds
+                east if j == num_x - 1 else west + (j + 1) * size_x,
+                north if i == num_y - 1 else south + (i + 1) * size_y,
+            )
+            buffered = (
+                core[0] - buffer_x,
+                core[1] - buffer_y,
+                core[2] + buffer_x,
+                core[3] + buffer_y,
+            )
+            tiles.append({"core": core, "buffered": buffered})
+    return tiles
+
+
+def core_nodes(
+    graph: nx.MultiDiGraph,
+    core: Tuple[float, float, float, float],
+    bounds: Tuple[float, float, float, float],
+) -> List[int]:
+    """
+    Get the nodes of a graph inside the core of a tile.
+
+    Cores are half-open, except at the outer bounds of the study area, so
+    every node belongs to exactly one tile.
+
+    Args:
+        graph (networkx.MultiDiGraph): Graph of the buffered tile.
+        core (tuple): Core bounding box (west, south, east, north).
+        bounds (tuple): Bounding box of the study area.
+
+    Returns:
+        list: Nodes inside the core.
+    """
+    west, south, east, north = core
+    nodes = []
+    for node, data in graph.nodes(data=True):
+        x, y = data["x"], data["y"]
+        inside_x = west <= x < east or (east == bounds[2] and x == east)
+        inside_y = south <= y < north or (north == bounds[3] and y == north)
+        if inside_x and inside_y:
+            nodes.append(node)
+    return nodes
+
+
+def get_tile_graph(
+    polygon: BaseGeometry,
+    location: str,
+    buffered: Tuple[float, float, float, float],
+    network_type: str,
+    use_cache: bool = True,
+) -> Optional[nx.MultiDiGraph]:
+    """
+    Retrieve the street network of the study area within a buffered tile.
+
+    Tile graphs are not simplified, so their edges are OSM way segments
+    between consecutive OSM nodes and identical in every tile that contains
+    them. Simplifying a tile would end its streets at the tile border.
+    Tile graphs are cached like whole graphs, keyed by location and tile.
+
+    Args:
+        polygon (shapely.Geometry): Polygon of the study area.
+        location (str): The location (place name) of the study area.
+        buffered (tuple): Buffered bounding box of the tile.
+        network_type (str): The type of network.
+        use_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+
+    Returns:
+        networkx.MultiDiGraph or None: The graph, None if the tile contains
+         no street network.
+    """
+    tile_polygon = polygon.intersection(box(*buffered))
+    if tile_polygon.is_empty:
+        return None
+    tile_location = f"{location} tile {tuple(round(value, 6) for value in buffered)}"
+    cache_key = graph_cache_key(tile_location, network_type, False)
+    if use_cache:
+        graph = load_cached_graph(cache_key)
+        if graph is not None:
+            return graph
+    try:
+        graph = ox.graph_from_polygon(
+            tile_polygon, network_type=network_type, simplify=False
+        )
+    except (ValueError, ox._errors.InsufficientResponseError) as e:
+        log.warning(f"No street network in tile {buffered}: {e}")
+        return None
+    graph.graph["cache_key"] = cache_key
+    if use_cache:
+        save_cached_graph(graph, cache_key)
+    return graph
+
+
+def street_nodes(graph: nx.MultiDiGraph) -> Set[Hashable]:
+    """
+    Get the nodes of an unsimplified graph that remain after simplification,
+    i.e. intersections and dead ends.
+
+    Args:
+        graph (networkx.MultiDiGraph): Unsimplified street network graph.
+
+    Returns:
+        set: Nodes of the simplified graph.
+    """
+    return set(ox.simplify_graph(graph).nodes)
+
+
+def tile_centrality(
+    graph: nx.MultiDiGraph,
+    sources: List[int],
+    route_type: str,
+    targets: Optional[Set[Hashable]] = None,
+) -> pd.DataFrame:
+    """
+    Calculate the unscaled edge betweenness of the sources of one tile.
+
+    With the nodes of the simplified graph as sources and targets, the
+    paths are those of the simplified graph, and every segment of a
+    simplified edge gets the value of that edge.
+
+    Args:
+        graph (networkx.MultiDiGraph): Graph of the buffered tile.
+        sources (list): Nodes inside the core of the tile.
+        route_type (str): Edge attribute used as weight.
+        targets (set, optional): Nodes counted as path targets. Defaults to
+         None (all nodes).
+
+    Returns:
+        pandas.DataFrame: Edges with u, v, key, osmid, length, geometry and
+         centrality.
+    """
+    betweenness = source_edge_betweenness(graph, sources, route_type, targets=targets)
+    edges = ox.graph_to_gdfs(graph, nodes=False)[["osmid", "length", "geometry"]]
+    edges["centrality"] = pd.Series(betweenness)
+    return pd.DataFrame(edges.reset_index())
+
+
+def _process_tile(
+    polygon: BaseGeometry,
+    location: str,
+    tile: Dict[str, Tuple[float, float, float, float]],
+    bounds: Tuple[float, float, float, float],
+    route_type: str,
+    network_type: str,
+    use_cache: bool,
+) -> Tuple[Optional[pd.DataFrame], int]:
+    """
+    Load the graph of a tile and calculate the centrality of its sources.
+
+    Args:
+        polygon (shapely.Geometry): Polygon of the study area.
+        location (str): The location (place name) of the study area.
+        tile (dict): Core and buffered bounding box of the tile.
+        bounds (tuple): Bounding box of the study area.
+        route_type (str): Edge attribute used as weight.
+        network_type (str): The type of network.
+        use_cache (bool): Use the processed graph cache.
+
+    Returns:
+        tuple: Edge results of the tile (None without graph) and its number
+         of sources.
+    """
+    graph = get_tile_graph(
+        polygon, location, tile["buffered"], network_type, use_cache=use_cache
+    )
+    if graph is None:
+        return None, 0
+    # route between the nodes of the simplified graph along the segments
+    targets = street_nodes(graph)
+    sources = [
+        node for node in core_nodes(graph, tile["core"], bounds) if node in targets
+    ]
+    if not sources:
+        return None, 0
+    if route_type == "travel_time":
+        graph = add_travel_time(graph, network_type)
+    log.info(
+        f"Tile {tile['core']}: {len(sources)} sources in a graph with"
+        f" {len(graph)} nodes."
+    )
+    return tile_centrality(graph, sources, route_type, targets), len(sources)
+
+
+def merge_tile_results(
+    tile_results: List[pd.DataFrame], num_nodes: int
+) -> gpd.GeoDataFrame:
+    """
+    Merge the segment results of overlapping tiles into one GeoDataFrame.
+
+    Segments in the buffer zones appear in several tiles with the same nodes
+    and way ID; their unscaled values are summed, because every tile only
+    contributes the paths of its own sources. The merged segments are then
+    simplified into one edge per street. A tile counts its paths on every
+    segment of a street it contains, and a tile buffer can only cut paths
+    off, so a street gets the largest value of its segments. The values are
+    normalized like the betweenness of the whole graph.
+
+    Args:
+        tile_results (list): Segment results of every tile.
+        num_nodes (int): Number of sources of the study area.
+
+    Returns:
+        geopandas.GeoDataFrame: Centrality keyed by (u, v, key).
+    """
+    segments = pd.concat(tile_results, ignore_index=True)
+    merged = segments.groupby(["u", "v", "osmid"], sort=False).agg(
+        centrality=("centrality", "sum"),
+        length=("length", "first"),
+        geometry=("geometry", "first"),
+    )
+    u = merged.index.get_level_values("u")
+    v = merged.index.get_level_values("v")
+    # segments are straight lines between their nodes
+    starts = shapely.get_coordinates(shapely.get_point(merged["geometry"].values, 0))
+    ends = shapely.get_coordinates(shapely.get_point(merged["geometry"].values, -1))
+    graph = nx.MultiDiGraph(crs="epsg:4326")
+    graph.add_nodes_from(
+        (node, {"x": x, "y": y})
+        for nodes, coordinates in ((u, starts), (v, ends))
+        for node, (x, y) in zip(nodes, coordinates.tolist())
+    )
+    graph.add_edges_from(
+        (start, end, {"osmid": osmid, "length": length, "centrality": centrality})
+        for (start, end, osmid), length, centrality in zip(
+            merged.index, merged["length"], merged["centrality"]
+        )
+    )
+
+    edges = ox.graph_to_gdfs(ox.simplify_graph(graph), nodes=False)
+    centrality = edges["centrality"].map(
+        lambda values: max(values) if isinstance(values, list) else values
+    )
+    if num_nodes > 1:
+        centrality *= 1 / (num_nodes * (num_nodes - 1))
+    return gpd.GeoDataFrame(
+        {
+            "centrality": centrality,
+            "osmid": edges["osmid"].astype(str),
+            "geometry": edges["geometry"],
+        },
+        geometry="geometry",
+        crs=4326,
+    )
+
+
+def tiled_analyser(
+    location: str,
+    route_type: str,
+    network_type: str,
+    tile_size: float,
+    tile_buffer: float = 2.0,
+    workers: int = 1,
+    use_graph_cache: bool = True,
+) -> gpd.GeoDataFrame:
+    """
+    Analyze network centrality of a large study area tile by tile.
+
+    The study area is split into tiles with overlapping buffers. For every
+    tile only the graph of the buffered tile is loaded, and the shortest
+    paths from the nodes inside the tile are followed within it. Paths
+    longer than the buffer are cut at the buffer, so the result approaches
+    the centrality of the whole graph as the buffer grows. Memory use is
+    bounded by the tile size times the number of workers.
+
+    Args:
+        location (str): The location or area for which to analyze centrality.
+        route_type (str): The type of route for centrality calculation.
+        network_type (str): The network type for routing and graph generation.
+        tile_size (float): Edge length of a tile in kilometres.
+        tile_buffer (float, optional): Width of the tile buffers in
+         kilometres. Defaults to 2.0.
+        workers (int, optional): Number of tiles processed in parallel.
+         Defaults to 1.
+        use_graph_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+
+    Returns:
+        geopandas.GeoDataFrame: GeoDataFrame containing centrality data.
+    """
+    polygon = ox.geocode_to_gdf(location).unary_union
+    bounds = tuple(polygon.bounds)
+    tiles = make_tiles(bounds, tile_size, tile_buffer)
+    log.info(
+        f"Start tiled betweenness centrality analysis with {len(tiles)} tiles"
+        f" of {tile_size} km and {tile_buffer} km buffers."
+    )
+
+    arguments = (bounds, route_type, network_type, use_graph_cache)
+    if workers <= 1:
+        results = [_process_tile(polygon, location, tile, *arguments) for tile in tiles]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_process_tile, polygon, location, tile, *arguments)
+                for tile in tiles
+            ]
+            results = [future.result() for future in futures]
+
+    tile_results = [result for result, _ in results if result is not None]
+    if not tile_results:
+        log.error(f"No street network found for '{location}'.")
+        raise ValueError(f"No street network found for '{location}'.")
+    num_nodes = sum(num_sources for _, num_sources in results)
+    return merge_tile_results(tile_results, num_nodes)
@@ -0,0 +1,160 @@
+import json
+import hashlib
+import logging as log
+from typing import Dict, Optional
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+# maxspeed format of the OSM wiki, as in osmnx.speed
+MAXSPEED_PATTERN = r"^([0-9][\.,0-9]+?)(?:[ ]?(?:km/h|kmh|kph|mph|knots))?$"
+MILES_TO_KM = 1.60934
+
+
+def clean_maxspeeds(maxspeeds: pd.Series) -> pd.Series:
+    """
+    Convert maxspeed tags to speeds in km/h.
+
+    Values with several lanes ("50|30") are averaged, values in mph are
+    converted. Missing or invalid values become NaN, like in
+    ``osmnx.add_edge_speeds``.
+
+    Args:
+        maxspeeds (pandas.Series): Maxspeed tags as strings.
+
+    Returns:
+        pandas.Series: Speed in km/h with the index of the tags.
+    """
+    text = maxspeeds.astype(str)
+    parts = text.str.split("|").explode()
+    numbers = parts.str.extract(MAXSPEED_PATTERN, expand=False).str.replace(",", ".")
+    values = pd.to_numeric(numbers, errors="coerce")
+    # a single invalid lane invalidates the whole tag
+    invalid = values.isna().groupby(level=0).any()
+    speeds = values.groupby(level=0).mean().where(~invalid)
+    mph = text.str.contains("mph", case=False, na=False)
+    return speeds.where(~mph, speeds * MILES_TO_KM)
+
+
+def collapse_maxspeed_lists(maxspeeds: pd.Series) -> pd.Series:
+    """
+    Collapse the maxspeed lists of simplified edges into single tags.
+
+    Every list becomes the truncated mean of its valid speeds in km/h,
+    missing if it has none. Other values are kept.
+
+    Args:
+        maxspeeds (pandas.Series): Maxspeed tags, lists as tuples.
+
+    Returns:
+        pandas.Series: Maxspeed tags without lists.
+    """
+    is_list = maxspeeds.map(lambda value: isinstance(value, tuple))
+    if not is_list.any():
+        return maxspeeds
+    elements = maxspeeds[is_list].explode()
+    speeds = clean_maxspeeds(elements.reset_index(drop=True))
+    speeds.index = elements.index
+    means = speeds.groupby(level=0).mean()
+    collapsed = means.map(lambda value: None if np.isnan(value) else str(int(value)))
+    result = maxspeeds.copy()
+    result[is_list] = collapsed
+    return result
+
+
+def impute_speeds(
+    highways: pd.Series, speeds: pd.Series, hwy_speeds: Dict[str, Optional[float]]
+) -> pd.Series:
+    """
+    Fill missing speeds by highway type.
+
+    Highway types in hwy_speeds get their given speed, the others the mean of
+    their known speeds, and types without any speed the mean over all types.
+
+    Args:
+        highways (pandas.Series): Highway type of every edge.
+        speeds (pandas.Series): Known speed of every edge, NaN if unknown.
+        hwy_speeds (dict): Speed in km/h of highway types, None if unknown.
+
+    Returns:
+        pandas.Series: Speed of every edge.
+    """
+    hwy_speed_avg = pd.Series(hwy_speeds, dtype=float).dropna()
+    observed = speeds.groupby(highways).mean()
+    hwy_speed_avg = pd.concat(
+        [hwy_speed_avg, observed[observed.index.difference(hwy_speed_avg.index)]]
+    )
+    hwy_speed_avg = hwy_speed_avg.fillna(hwy_speed_avg.mean())
+    return speeds.fillna(highways.map(hwy_speed_avg))
+
+
+def _profile_digest(hwy_speeds: Dict[str, Optional[float]]) -> str:
+    return hashlib.sha1(json.dumps(hwy_speeds, sort_keys=True).encode()).hexdigest()
+
+
+def add_edge_travel_times(
+    graph: nx.MultiDiGraph, hwy_speeds: Dict[str, Optional[float]]
+) -> nx.MultiDiGraph:
+    """
+    Add the speed_kph and travel_time attributes to all edges in bulk.
+
+    Gives the same values as ``ox.add_edge_speeds`` followed by
+    ``ox.add_edge_travel_times``, but the tags are read in one pass over the
+    edges, cleaned once per distinct value and written back in one pass.
+    The graph remembers its speed profile, so adding the same profile again
+    returns immediately; remove ``graph.graph["travel_time_profile"]`` after
+    changing edge tags to recalculate.
+
+    Args:
+        graph (networkx.MultiDiGraph): Street network graph, changed in place.
+        hwy_speeds (dict): Speed in km/h of highway types, None if unknown.
+
+    Returns:
+        networkx.MultiDiGraph: The graph with travel times.
+    """
+    profile = _profile_digest(hwy_speeds)
+    if graph.graph.get("travel_time_profile") == profile:
+        return graph
+
+    edge_data = [data for _, _, data in graph.edges(data=True)]
+    highways = pd.Series(
+        [
+            highway[0] if isinstance(highway, list) else highway
+            for highway in (data.get("highway") for data in edge_data)
+        ],
+        dtype=object,
+    )
+    maxspeeds = pd.Series(
+        [
+            tuple(maxspeed) if isinstance(maxspeed, list) else maxspeed
+            for maxspeed in (data.get("maxspeed") for data in edge_data)
+        ],
+        dtype=object,
+    )
+    lengths = np.array([data.get("length", np.nan) for data in edge_data], dtype=float)
+
+    # clean every distinct tag once
+    codes, tags = pd.factorize(maxspeeds)
+    tag_speeds = clean_maxspeeds(collapse_maxspeed_lists(pd.Series(tags, dtype=object)))
+    # missing tags have the code -1 and get NaN
+    speeds = pd.Series(np.append(tag_speeds.to_numpy(dtype=float), np.nan)[codes])
+    speeds = impute_speeds(highways, speeds, hwy_speeds)
+    if speeds.isna().all():
+        log.error("No edge speeds known, the speed profile is missing highway types.")
+        raise ValueError(
+            "No edge speeds known, the speed profile is missing highway types."
+        )
+    if speeds.isna().any() or np.isnan(lengths).any():
+        log.error("Edge length and speed_kph values must be non-null.")
+        raise ValueError("Edge length and speed_kph values must be non-null.")
+
+    speed_kph = speeds.round(1).to_numpy()
+    travel_time = np.round(lengths / 1000 / (speed_kph / 3600), 1)
+    for data, speed, seconds in zip(
+        edge_data, speed_kph.tolist(), travel_time.tolist()
+    ):
+        data["speed_kph"] = speed
+        data["travel_time"] = seconds
+    graph.graph["travel_time_profile"] = profile
+    return graph
@@ -1,140 +1,233 @@
 import re
 
 import geopandas as gpd
-import matplotlib.pyplot as plt
 
 import networkx as nx
+import numpy as np
 import osmnx as ox
 import pandas as pd
+import shapely
+from packaging.version import Version
+from shapely.geometry import box
 
-import argparse
+import inspect
 import logging as log
 import os
-import sys
-from argparse import Namespace
+import shutil
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from network_analysis.betweenness import (
+    approximate_edge_betweenness,
+    edge_betweenness_centrality,
+)
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.graph_cache import (
+    graph_cache_key,
+    load_cached_graph,
+    save_cached_graph,
+)
+from network_analysis.profiling import profiled, run_with_stages
+from network_analysis.shared_graph import SharedGraph
+from network_analysis.travel_time import add_edge_travel_times
+from definitions import OUTPUT_FORMATS
+
+
+def _has_parameter(function, parameter: str) -> bool:
+    return parameter in inspect.signature(function).parameters
+
+
+def _arrow_engine() -> dict:
+    """
+    Get the to_file options of the Arrow-based OGR engine, if supported.
+
+    Arrow writes need pyarrow, pyogrio 0.8 or newer and pyogrio built against
+    GDAL 3.8 or newer. Older versions would take ``use_arrow`` for an OGR
+    creation option, so the default engine is used instead.
+
+    Returns:
+        dict: Keyword arguments for ``GeoDataFrame.to_file``, empty for the
+         default engine.
+    """
+    try:
+        import pyarrow  # noqa: F401
+        import pyogrio
+    except ImportError:
+        log.warning("pyogrio or pyarrow not installed, writing row by row.")
+        return {}
+    if Version(pyogrio.__version__) < Version("0.8") or (
+        pyogrio.__gdal_version__ < (3, 8, 0)
+    ):
+        log.warning(
+            f"Arrow writes need pyogrio 0.8 and GDAL 3.8, found pyogrio"
+            f" {pyogrio.__version__} with GDAL {pyogrio.__gdal_version_string__},"
+            " writing row by row."
+        )
+        return {}
+    return {"engine": "pyogrio", "use_arrow": True}
 
 
-def save_centrality_results(centrality_gdf, output_folder) -> None:
+def _check_format_dependency(output_format: str) -> None:
     """
-    Save centrality results to a GeoPackage file.
+    Check that the library writing an output format is installed.
+
+    GeoPackage and FlatGeobuf fall back to writing row by row, GeoParquet
+    can only be written with pyarrow.
+
+    Args:
+        output_format (str): "gpkg", "parquet" or "fgb".
+    """
+    if output_format != "parquet":
+        return
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        log.error("Saving GeoParquet requires pyarrow, which is not installed.")
+        raise ImportError("Saving GeoParquet requires pyarrow, which is not installed.")
+
+
+@profiled("save_centrality_results")
+def save_centrality_results(
+    centrality_gdf,
+    output_folder,
+    file_name="centrality_results",
+    output_format="gpkg",
+    spatial_sort=False,
+    row_group_size=65536,
+) -> str:
+    """
+    Save centrality results to a GeoPackage, GeoParquet or FlatGeobuf file.
+
+    GeoParquet is written with pyarrow. GeoPackage and FlatGeobuf are written
+    through Arrow if pyogrio supports it (see `_arrow_engine`). GeoParquet is
+    compressed with zstd and stores a bounding box per edge, so readers can
+    load single columns and skip row groups outside their area. FlatGeobuf
+    contains a spatial index for bounding box reads. Sorting the edges along
+    a Hilbert curve keeps nearby edges in the same row groups.
 
     Args:
         centrality_gdf (geopandas.GeoDataFrame): GeoDataFrame containing
          centrality data.
         output_folder (str): The folder where results will be saved.
+        file_name (str, optional): Name of the file without extension.
+         Defaults to "centrality_results".
+        output_format (str, optional): "gpkg", "parquet" or "fgb".
+         Defaults to "gpkg".
+        spatial_sort (bool, optional): Sort the edges along a Hilbert curve.
+         Defaults to False.
+        row_group_size (int, optional): Number of edges per GeoParquet row
+         group. Defaults to 65536.
+
+    Returns:
+        str: Path to the saved file. Errors of writing the file, an
+         unsupported format or a missing writer library are raised.
     """
-    log.info("Save output to GeoPackage.")
+    if output_format not in OUTPUT_FORMATS:
+        log.error(f"Unsupported output format: '{output_format}'.")
+        raise ValueError(f"Unsupported output format: '{output_format}'.")
+    _check_format_dependency(output_format)
+    log.info(f"Save output as {output_format}.")
     try:
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
+        output_filepath = os.path.join(
+            output_folder, file_name + OUTPUT_FORMATS[output_format]
+        )
 
-        output_filepath = os.path.join(output_folder, "centrality_results.gpkg")
-        centrality_gdf.to_file(output_filepath, driver="GPKG", index=False)
+        if spatial_sort and len(centrality_gdf) > 0:
+            order = np.argsort(
+                centrality_gdf.geometry.hilbert_distance().to_numpy(), kind="stable"
+            )
+            centrality_gdf = centrality_gdf.iloc[order]
+        if output_format == "parquet":
+            options = {"compression": "zstd", "row_group_size": row_group_size}
+            if _has_parameter(gpd.GeoDataFrame.to_parquet, "write_covering_bbox"):
+                options["write_covering_bbox"] = True
+            centrality_gdf.to_parquet(output_filepath, index=False, **options)
+        elif output_format == "fgb":
+            centrality_gdf.to_file(
+                output_filepath,
+                driver="FlatGeobuf",
+                index=False,
+                SPATIAL_INDEX="YES",
+                **_arrow_engine(),
+            )
+        else:
+            centrality_gdf.to_file(
+                output_filepath, driver="GPKG", index=False, **_arrow_engine()
+            )
 
         log.info(f"Centrality results saved to: {output_filepath}")
+        return output_filepath
     except Exception as e:
         log.error(f"An error occurred while saving centrality results: {e}")
+        raise e
 
 
-def parse_arguments() -> Namespace:
+def load_centrality_results(path, columns=None, bbox=None) -> gpd.GeoDataFrame:
     """
-    Parse command-line arguments for the network analysis.
+    Load saved centrality results, optionally only some columns and an area.
+
+    Args:
+        path (str): Path to a GeoPackage, GeoParquet or FlatGeobuf file.
+        columns (list, optional): Columns to read besides the geometry.
+         Defaults to None (all columns).
+        bbox (tuple, optional): Bounding box (west, south, east, north) of the
+         edges to read. Defaults to None (all edges).
 
     Returns:
-        Namespace: The configured argument namespace.
+        geopandas.GeoDataFrame: The centrality results.
     """
-    parser = argparse.ArgumentParser(
-        description="Calculate centrality for a study area."
-    )
-    parser.add_argument(
-        "-l",
-        "--location",
-        type=str,
-        nargs="?",
-        default="Heidelberg, Germany",
-        help="Study area, e.g., 'Heidelberg, Germany'"
-        " (default: 'Heidelberg, Germany')",
-    )
-    parser.add_argument(
-        "-m",
-        "--centrality_method",
-        type=str,
-        choices=["networkx", "geographical"],
-        default="networkx",
-        help="Method to calculate centrality "
-        "(networkx or geographical, default: networkx)",
-    )
-    parser.add_argument(
-        "-n",
-        "--num_routes",
-        type=int,
-        help="Number of routes (only for the networkx method)",
-    )
-    parser.add_argument(
-        "-r",
-        "--route_type",
-        type=str,
-        choices=["length", "travel_time"],
-        default="length",
-        help="Route type for which the betweeness centrality will be calculated, (default: length)",
-    )
-    parser.add_argument(
-        "-o",
-        "--output_folder",
-        type=str,
-        default="output_results",
-        nargs="?",
-        help="Output folder for results (default: output_results)",
-    )
-    parser.add_argument(
-        "-t",
-        "--network_type",
-        type=str,
-        choices=["all_private", "all", "bike", "drive", "drive_service", "walk"],
-        default="drive",
-        help="Type of street network (default: drive)",
-    )
-    parser.add_argument(
-        "-w",
-        "--weighting",
-        type=str,
-        default="random",
-        choices=["random", "population"],
-        help="Weighting method for geographical centrality (default: random)",
-    )
-    args = parser.parse_args()
-
-    if args.centrality_method == "geographical":
-        if args.num_routes is None:
-            log.error("Number of routes must be specified for geographical analysis.")
-            sys.exit(1)
-        if args.num_routes <= 0:
-            log.error("Number of routes must be a positive integer.")
-            sys.exit(1)
-    if args.centrality_method == "networkx":
-        if args.num_routes:
-            log.warning("Networkx method does not support a number of routes.")
-        if args.weighting:
-            log.warning("Networkx method does not support a weighting method.")
-
-    return args
-
-
-def get_osm_graph(location: str, network_type: str) -> nx.Graph:
+    if path.endswith(OUTPUT_FORMATS["parquet"]):
+        if columns is not None:
+            columns = list(columns) + ["geometry"]
+        if bbox is not None and not _has_parameter(gpd.read_parquet, "bbox"):
+            # older GeoPandas filters after reading
+            gdf = gpd.read_parquet(path, columns=columns)
+            return gdf[gdf.intersects(box(*bbox))]
+        return gpd.read_parquet(path, columns=columns, bbox=bbox)
+    return gpd.read_file(path, columns=columns, bbox=bbox)
+
+
+@profiled("get_osm_graph")
+def get_osm_graph(
+    location: str,
+    network_type: str,
+    simplify: bool = True,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+) -> nx.Graph:
     """
     Retrieves a street network graph for a given location and network type
     based on OpenStreetMap.
 
+    Processed graphs are cached on disk, keyed by location, network type,
+    simplification and OSMnx version, so repeated analyses of the same area
+    skip geocoding, parsing and simplification.
+
     Args:
         location (str): The location (place name) for which to fetch the graph.
         network_type (str): The type of network data to retrieve
         ("all_private", "all", "bike", "drive", "drive_service", "walk").
+        simplify (bool, optional): Simplify the graph topology. Defaults to True.
+        use_cache (bool, optional): Use the processed graph cache.
+         Defaults to True.
+        refresh_cache (bool, optional): Rebuild the cached graph.
+         Defaults to False.
 
     Returns:
         networkx.Graph: The OpenStreetMap graph.
     """
+    cache_key = graph_cache_key(location, network_type, simplify)
+    if use_cache and not refresh_cache:
+        graph = load_cached_graph(cache_key)
+        if graph is not None:
+            log.info(f"Loaded graph for '{location}' from the graph cache.")
+            return graph
     try:
-        return ox.graph_from_place(location, network_type=network_type, simplify=True)
+        graph = ox.graph_from_place(
+            location, network_type=network_type, simplify=simplify
+        )
     except ox._errors.InsufficientResponseError as e:
         log.error(
             f"Place not found: '{location}'. Please check the spelling and try again."
@@ -145,8 +238,13 @@ def get_osm_graph(location: str, network_type: str) -> nx.Graph:
             f"An unexpected error occurred while creating a graph from location: {e}"
         )
         raise e
+    graph.graph["cache_key"] = cache_key
+    if use_cache:
+        save_cached_graph(graph, cache_key)
+    return graph
 
 
+@profiled("create_centrality_geodataframe")
 def create_centrality_geodataframe(centrality_df, graph) -> gpd.GeoDataFrame:
     """
     Creates a GeoDataFrame with centrality information based on a DataFrame
@@ -159,17 +257,87 @@ def create_centrality_geodataframe(centrality_df, graph) -> gpd.GeoDataFrame:
     Returns:
         geopandas.GeoDataFrame: GeoDataFrame with centrality information.
     """
-    centrality_df.columns = ["u", "v", "key", "centrality"]
+    centrality_df.columns = ["u", "v", "key", "centrality"] + list(
+        centrality_df.columns[4:]
+    )
     centrality_df = centrality_df.set_index(["u", "v", "key"])
-    nodes_df, edges_df = ox.graph_to_gdfs(graph)
+    edges_df = ox.graph_to_gdfs(graph, nodes=False)
     centrality_gdf = centrality_df.join(edges_df[["osmid", "geometry"]])
     centrality_gdf = gpd.GeoDataFrame(centrality_gdf, crs=4326)
     centrality_gdf["osmid"] = centrality_gdf["osmid"].astype(str)
     return centrality_gdf
 
 
+def _line_segments(geometries, values):
+    """
+    Split line geometries into straight segments for a LineCollection.
+
+    Args:
+        geometries (numpy.ndarray): LineString of every edge.
+        values (numpy.ndarray): Value of every edge.
+
+    Returns:
+        tuple: Segments as an array of shape (n, 2, 2) and the value of
+         every segment.
+    """
+    coordinates, index = shapely.get_coordinates(geometries, return_index=True)
+    # consecutive points of the same edge form a segment
+    starts = np.flatnonzero(index[1:] == index[:-1])
+    segments = np.stack([coordinates[starts], coordinates[starts + 1]], axis=1)
+    return segments, values[index[starts]]
+
+
+def _plot_fast(geodataframe, column, cmap, max_edges):
+    """
+    Draw the edges as one LineCollection, at most max_edges of them.
+
+    Only the edges with the highest values are kept and drawn on top of the
+    lower ones, the colour scale still covers all values.
+
+    Args:
+        geodataframe (geopandas.GeoDataFrame): GeoDataFrame with road network data.
+        column (str): The column to use for coloring the plot.
+        cmap (str): The colormap to use for coloring the plot.
+        max_edges (int): Maximum number of drawn edges.
+
+    Returns:
+        matplotlib.figure.Figure: The figure.
+    """
+    values = geodataframe[column].to_numpy(dtype=float)
+    order = np.argsort(np.nan_to_num(values, nan=-np.inf), kind="stable")
+    if len(order) > max_edges:
+        log.info(
+            f"Plot the {max_edges} of {len(order)} edges with the highest {column}."
+        )
+        order = order[-max_edges:]
+    segments, segment_values = _line_segments(
+        geodataframe.geometry.to_numpy()[order], values[order]
+    )
+
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    fig, ax = plt.subplots(figsize=(10, 10))
+    collection = LineCollection(
+        segments, array=segment_values, cmap=cmap, linewidths=0.6, rasterized=True
+    )
+    if np.isfinite(values).any():
+        collection.set_clim(np.nanmin(values), np.nanmax(values))
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    ax.set_aspect("equal")
+    fig.colorbar(collection, ax=ax, shrink=0.8)
+    return fig
+
+
+@profiled("plot_road_network")
 def plot_road_network(
-    geodataframe, output_folder, column="centrality", cmap="magma_r"
+    geodataframe,
+    output_folder,
+    column="centrality",
+    cmap="magma_r",
+    mode="full",
+    max_edges=200_000,
 ) -> None:
     """
     Plots the road network and saves the plot to an output folder.
@@ -181,14 +349,28 @@ def plot_road_network(
          Defaults to "centrality".
         cmap (str, optional): The colormap to use for coloring the plot.
          Defaults to "magma_r".
+        mode (str, optional): "none", "fast" (bulk line rendering of the
+         max_edges highest edges) or "full" (every edge). Defaults to "full".
+        max_edges (int, optional): Maximum number of edges drawn in fast mode.
+         Defaults to 200,000.
     """
+    if mode == "none":
+        return
     log.info("Creating output plot.")
+    # matplotlib is only loaded by runs that plot
+    import matplotlib.pyplot as plt
+
     try:
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
-        fig, ax = plt.subplots(figsize=(10, 10))
-        geodataframe.plot(column=column, cmap=cmap, ax=ax, legend=True)
+        if mode == "fast":
+            _plot_fast(geodataframe, column, cmap, max_edges)
+            dpi = 150
+        else:
+            fig, ax = plt.subplots(figsize=(10, 10))
+            geodataframe.plot(column=column, cmap=cmap, ax=ax, legend=True)
+            dpi = 300
         plt.title("Road Network Centrality")
         plt.xlabel("Longitude")
         plt.ylabel("Latitude")
@@ -196,7 +378,7 @@ def plot_road_network(
         output_filepath = os.path.join(
             output_folder, "road_network_centrality_plot.png"
         )
-        plt.savefig(output_filepath, dpi=300, bbox_inches="tight")
+        plt.savefig(output_filepath, dpi=dpi, bbox_inches="tight")
         plt.close()
 
         log.info(f"Plot saved to: {output_filepath}")
@@ -205,6 +387,44 @@ def plot_road_network(
         log.info(f"An error occurred in the plot creation: {e}")
 
 
+def start_plot_road_network(
+    geodataframe, output_folder, column="centrality", cmap="magma_r", mode="full"
+) -> Optional[Future]:
+    """
+    Plot the road network in a worker process, so saving the results does
+    not wait for the plot.
+
+    Args:
+        geodataframe (geopandas.GeoDataFrame): GeoDataFrame with road network data.
+        output_folder (str): Path to the folder where the plot should be saved.
+        column (str, optional): The column to use for coloring the plot.
+         Defaults to "centrality".
+        cmap (str, optional): The colormap to use for coloring the plot.
+         Defaults to "magma_r".
+        mode (str, optional): Plot mode, see `plot_road_network`.
+         Defaults to "full".
+
+    Returns:
+        concurrent.futures.Future or None: Finishes with the plot, see
+         `run_with_stages` for its result. None for the mode "none".
+    """
+    if mode == "none":
+        return None
+    executor = ProcessPoolExecutor(max_workers=1)
+    future = executor.submit(
+        run_with_stages,
+        plot_road_network,
+        geodataframe,
+        output_folder,
+        column,
+        cmap,
+        mode,
+    )
+    # the worker exits after the plot
+    executor.shutdown(wait=False)
+    return future
+
+
 # Dictionary of speed limits for different road types.
 speed_limits = {
     "drive": {
@@ -256,32 +476,88 @@ speed_limits = {
 }
 
 
-def calculate_route(graph, route_type, network_type) -> pd.DataFrame:
+@profiled("calculate_route")
+def calculate_route(
+    graph,
+    route_type,
+    network_type,
+    num_pivots=None,
+    pivot_strategy="random",
+    seed=None,
+    workers=1,
+    graph_backend="networkx",
+) -> pd.DataFrame:
     """
     Calculates centrality metrics for a given graph based on the selected route type.
 
+    Shared graph arrays (see `share_graph` and `save_graph_bundle`) are
+    attached and calculated with the CSR backend. They already hold the
+    travel times of the exported graph.
+
     Args:
-        graph (networkx.Graph): Street network graph.
+        graph (networkx.Graph or SharedGraph): Street network graph.
         route_type (str): The type of route for centrality calculation.
         network_type (str, optional): The network type for speed limit information.
+        num_pivots (int, optional): Number of sampled sources for an approximate
+         calculation. Defaults to None (exact calculation).
+        pivot_strategy (str, optional): Pivot selection for the approximate
+         calculation ("random", "stratified" or "spread"). Defaults to "random".
+        seed (int, optional): Seed for the pivot selection. Defaults to None.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        graph_backend (str, optional): Graph representation for the calculation
+         ("networkx" or "csr"). Defaults to "networkx".
 
     Returns:
-        pandas.DataFrame: DataFrame containing centrality values.
+        pandas.DataFrame: DataFrame containing centrality values and, for the
+         approximate calculation, their standard error.
     """
-    if route_type == "travel_time":
+    if isinstance(graph, SharedGraph):
+        graph = graph.attach()
+        graph_backend = "csr"
+    elif route_type == "travel_time":
         graph = add_travel_time(graph, network_type)
-    betweenness_centrality = nx.edge_betweenness_centrality(graph, weight=route_type)
-    centrality_df = pd.DataFrame(
-        index=betweenness_centrality.keys(),
-        data=betweenness_centrality.values(),
-    )
+    if graph_backend == "csr" and not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_graph(graph)
+    if num_pivots is None:
+        if workers > 1 or graph_backend == "csr":
+            betweenness_centrality = edge_betweenness_centrality(
+                graph, route_type, workers=workers
+            )
+        else:
+            betweenness_centrality = nx.edge_betweenness_centrality(
+                graph, weight=route_type
+            )
+        centrality_df = pd.DataFrame(
+            index=betweenness_centrality.keys(),
+            data=betweenness_centrality.values(),
+        )
+    else:
+        betweenness_centrality, standard_error = approximate_edge_betweenness(
+            graph,
+            route_type,
+            num_pivots,
+            pivot_strategy=pivot_strategy,
+            seed=seed,
+            workers=workers,
+        )
+        centrality_df = pd.DataFrame(
+            index=betweenness_centrality.keys(),
+            data={
+                0: betweenness_centrality.values(),
+                "centrality_stderr": standard_error.values(),
+            },
+        )
     return centrality_df
 
 
+@profiled("add_travel_time")
 def add_travel_time(graph, network_type) -> nx.Graph:
     """
     Adds travel time information to the graph based on speed limits.
 
+    The speeds are calculated in bulk and only once per graph and network type
+    (see ``travel_time.add_edge_travel_times``).
+
     Args:
         graph (networkx.Graph): Street network graph.
         network_type (str): The network type for speed limit information.
@@ -297,10 +573,51 @@ def add_travel_time(graph, network_type) -> nx.Graph:
             f" Please choose one of the following: {speed_limits.keys()}"
         )
         raise KeyError
-    graph = ox.add_edge_speeds(graph, hwy_speeds)
-    graph = ox.add_edge_travel_times(graph)
+    return add_edge_travel_times(graph, hwy_speeds)
 
-    return graph
+
+def output_folder_path(
+    output_path: str,
+    location: str,
+    centrality_method: str,
+    route_type: str,
+) -> str:
+    """
+    Get the path of the output folder of an analysis without creating it.
+
+    Args:
+        output_path (str): The base path for the output folder.
+        location (str): The location or study area name.
+        centrality_method (str): The method used for centrality analysis.
+        route_type (str): The type of route for analysis.
+
+    Returns:
+        str: The path to the output folder.
+    """
+    folder_name = location + "_" + centrality_method + "_" + route_type
+    folder_name = re.sub(r"[^a-zA-Z0-9]+", "_", folder_name)
+    return os.path.join(output_path, folder_name)
+
+
+def replace_output_folder(source_folder: str, folder_path: str) -> str:
+    """
+    Move finished results into the output folder, replacing older results.
+
+    The results of a previous run are only deleted once the new results are
+    complete, so a failed or interrupted run keeps them.
+
+    Args:
+        source_folder (str): Folder with the results of the finished run.
+        folder_path (str): The output folder, see `output_folder_path`.
+
+    Returns:
+        str: The path to the output folder.
+    """
+    if os.path.isdir(folder_path):
+        shutil.rmtree(folder_path)
+    os.replace(source_folder, folder_path)
+    log.info(f"Your results are saved to {folder_path}")
+    return folder_path
 
 
 def create_output_folder(
@@ -321,10 +638,9 @@ def create_output_folder(
     Returns:
         str: The path to the created output folder.
     """
-    folder_name = location + "_" + centrality_method + "_" + route_type
-    folder_name = re.sub(r"[^a-zA-Z0-9]+", "_", folder_name)
-
-    folder_path = os.path.join(output_path, folder_name)
+    folder_path = output_folder_path(
+        output_path, location, centrality_method, route_type
+    )
 
     if os.path.isdir(folder_path):
         # If it exists, delete it
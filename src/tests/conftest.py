@@ -1,5 +1,6 @@
 import os
 
+import networkx as nx
 import numpy as np
 import pytest
 import geopandas as gpd
@@ -25,6 +26,32 @@ def test_graph():
     return ox.graph_from_place("Dossenheim, Germany", network_type="drive")
 
 
+@pytest.fixture
+def synthetic_graph():
+    # offline street grid with one-way streets and a parallel edge
+    graph = nx.MultiDiGraph(crs="epsg:4326")
+    size = 5
+    for i in range(size):
+        for j in range(size):
+            graph.add_node(i * size + j, x=8.68 + 0.001 * j, y=49.40 + 0.001 * i)
+    for i in range(size):
+        for j in range(size):
+            node = i * size + j
+            if j + 1 < size:
+                length = 70.0 + 5 * ((i + j) % 3)
+                graph.add_edge(node, node + 1, length=length, highway="residential")
+                if i % 2 == 0:
+                    graph.add_edge(node + 1, node, length=length, highway="residential")
+            if i + 1 < size:
+                length = 110.0 + 10 * (j % 2)
+                graph.add_edge(node, node + size, length=length, highway="primary")
+                graph.add_edge(node + size, node, length=length, highway="primary")
+    graph.add_edge(0, 1, length=70.0, highway="service")
+    for osmid, (u, v, key) in enumerate(graph.edges(keys=True)):
+        graph.edges[u, v, key]["osmid"] = 1000 + osmid
+    return graph
+
+
 @pytest.fixture
 def test_centrality_df():
     return pd.DataFrame(
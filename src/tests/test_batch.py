@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from network_analysis import batch
+from network_analysis.batch import (
+    group_jobs,
+    load_jobs,
+    run_jobs,
+    write_timing_summary,
+)
+
+
+@pytest.fixture
+def job_csv(tmp_path):
+    job_file = tmp_path / "jobs.csv"
+    job_file.write_text(
+        "location,method,route_type,network_type,num_routes,weighting\n"
+        "Synthetic,networkx,length,drive,,\n"
+        "Synthetic,geographical,travel_time,drive,20,random\n"
+        "Other,networkx,length,walk,,\n"
+    )
+    return str(job_file)
+
+
+def test_load_jobs_csv(job_csv):
+    # Test loading a CSV job list with defaults for empty values
+    jobs = load_jobs(job_csv)
+    assert len(jobs) == 3
+    assert jobs[0]["centrality_method"] == "networkx"
+    assert jobs[0]["num_routes"] is None
+    assert jobs[0]["weighting"] == "random"
+    assert jobs[1]["num_routes"] == 20
+    assert [job["job"] for job in jobs] == [0, 1, 2]
+
+
+def test_load_jobs_yaml(tmp_path):
+    # Test loading a YAML job list
+    pytest.importorskip("yaml")
+    job_file = tmp_path / "jobs.yaml"
+    job_file.write_text(
+        "jobs:\n"
+        "  - location: Synthetic\n"
+        "    centrality_method: geographical\n"
+        "    num_routes: 5\n"
+        "    weighting: population\n"
+    )
+    jobs = load_jobs(str(job_file))
+    assert jobs[0]["num_routes"] == 5
+    assert jobs[0]["route_type"] == "length"
+    assert jobs[0]["network_type"] == "drive"
+
+
+def test_load_jobs_invalid(tmp_path):
+    # Test that invalid jobs are rejected
+    job_file = tmp_path / "jobs.csv"
+    job_file.write_text("location,centrality_method\nSynthetic,geographical\n")
+    with pytest.raises(ValueError):
+        load_jobs(str(job_file))
+    job_file.write_text("location,speed\nSynthetic,10\n")
+    with pytest.raises(ValueError):
+        load_jobs(str(job_file))
+
+
+def test_group_jobs(job_csv):
+    # Test that jobs with the same graph are grouped
+    groups = group_jobs(load_jobs(job_csv))
+    assert [[job["job"] for job in group] for group in groups] == [[0, 1], [2]]
+
+
+def test_run_jobs(job_csv, synthetic_graph, tmp_path, monkeypatch):
+    # Test that a batch reuses the graph of a location and records timings
+    loaded = []
+
+    def get_graph(location, network_type, use_cache):
+        loaded.append(location)
+        if location == "Other":
+            raise ValueError("Place not found.")
+        return synthetic_graph.copy()
+
+    monkeypatch.setattr(batch, "get_osm_graph", get_graph)
+    output_folder = str(tmp_path / "results")
+    timings = run_jobs(load_jobs(job_csv), output_folder, plot="none")
+
+    assert loaded == ["Synthetic", "Other"]
+    assert [timing["status"] for timing in timings] == ["done", "done", "failed"]
+    assert timings[1]["graph_time"] == 0.0
+    assert os.path.isdir(timings[0]["output_folder"])
+
+    summary_path = write_timing_summary(timings, output_folder)
+    with open(summary_path) as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 4
+    assert lines[0].startswith("job,location")
+
+
+def test_run_jobs_save_failed(job_csv, synthetic_graph, tmp_path, monkeypatch):
+    # Test that a job whose results could not be saved is recorded as failed
+    def get_graph(location, network_type, use_cache):
+        return synthetic_graph.copy()
+
+    def save_results(**kwargs):
+        raise OSError("Failed to save the results.")
+
+    monkeypatch.setattr(batch, "get_osm_graph", get_graph)
+    monkeypatch.setattr(batch, "save_centrality_results", save_results)
+    jobs = load_jobs(job_csv)[:1]
+    timings = run_jobs(jobs, str(tmp_path / "results"), plot="none")
+
+    assert timings[0]["status"] == "failed"
+    assert "Failed to save" in timings[0]["error"]
+
+
+if __name__ == "__main__":
+    pytest.main()
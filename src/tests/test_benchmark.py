@@ -0,0 +1,80 @@
+import json
+
+import networkx as nx
+import pytest
+
+from network_analysis.benchmark import (
+    append_history,
+    compare_runs,
+    grid_street_graph,
+    load_history,
+    previous_run,
+    random_geometric_street_graph,
+    run_benchmarks,
+)
+
+
+def test_grid_street_graph():
+    # Test if the grid is a connected OSMnx-like graph with one-way streets
+    graph = grid_street_graph(6, seed=1)
+    assert len(graph) == 36
+    assert graph.graph["crs"] == "epsg:4326"
+    assert nx.is_weakly_connected(graph)
+    # 60 streets, in both directions unless one-way
+    assert 60 < graph.number_of_edges() <= 120
+    for _, _, data in graph.edges(data=True):
+        assert 50 < data["length"] < 120
+        assert data["highway"] in ("primary", "residential")
+    assert graph.edges == grid_street_graph(6, seed=1).edges
+
+
+def test_random_geometric_street_graph():
+    # Test if only the largest component is kept with positive lengths
+    graph = random_geometric_street_graph(100, seed=2)
+    assert 0 < len(graph) <= 100
+    assert sorted(graph.nodes) == list(range(len(graph)))
+    assert nx.is_weakly_connected(graph)
+    assert all(data["length"] > 0 for _, _, data in graph.edges(data=True))
+
+
+def test_run_benchmarks():
+    # Test if every case is timed on every graph
+    graphs = {"grid_4": grid_street_graph(4)}
+    results = run_benchmarks(graphs, cases=["add_travel_time", "write_fgb"], repeat=2)
+    assert [result["case"] for result in results] == ["add_travel_time", "write_fgb"]
+    for result in results:
+        assert result["graph"] == "grid_4" and result["nodes"] == 16
+        assert 0 <= result["min"] <= result["median"]
+
+    with pytest.raises(ValueError):
+        run_benchmarks(graphs, cases=["unknown"], repeat=1)
+
+
+def test_history(tmp_path):
+    # Test if runs are appended and compared with the previous run
+    history_path = str(tmp_path / "history.json")
+    first = append_history(
+        [{"case": "a", "graph": "g", "min": 1.0, "median": 2.0}], history_path, {}
+    )
+    second = append_history(
+        [
+            {"case": "a", "graph": "g", "min": 2.0, "median": 3.0},
+            {"case": "b", "graph": "g", "skipped": "No module"},
+        ],
+        history_path,
+        {},
+    )
+    history = load_history(history_path)
+    assert len(history) == 2
+    with open(history_path) as file:
+        assert json.load(file)[0]["results"] == first["results"]
+
+    assert previous_run(history, second)["timestamp"] == first["timestamp"]
+    assert previous_run(history[:1], first) is None
+    comparison = compare_runs(first, second)
+    assert len(comparison) == 1
+    assert comparison[0]["ratio"] == pytest.approx(1.5)
+
+
+if __name__ == "__main__":
+    pytest.main()
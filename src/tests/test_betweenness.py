@@ -0,0 +1,79 @@
+import networkx as nx
+import pytest
+
+from network_analysis.betweenness import (
+    approximate_edge_betweenness,
+    edge_betweenness_centrality,
+    select_pivots,
+)
+
+
+def test_approximate_edge_betweenness_all_pivots(synthetic_graph):
+    # Test if sampling all nodes reproduces the exact NetworkX result
+    expected = nx.edge_betweenness_centrality(synthetic_graph, weight="length")
+    result, standard_error = approximate_edge_betweenness(
+        synthetic_graph, "length", len(synthetic_graph)
+    )
+    assert result.keys() == expected.keys()
+    for edge, value in expected.items():
+        assert result[edge] == pytest.approx(value)
+        assert standard_error[edge] == 0
+
+
+@pytest.mark.parametrize("pivot_strategy", ["random", "stratified", "spread"])
+def test_approximate_edge_betweenness_sampled(synthetic_graph, pivot_strategy):
+    # Test if the estimate is reproducible and reports a standard error
+    expected = nx.edge_betweenness_centrality(synthetic_graph, weight="length")
+    result, standard_error = approximate_edge_betweenness(
+        synthetic_graph, "length", 12, pivot_strategy=pivot_strategy, seed=1
+    )
+    repeated, _ = approximate_edge_betweenness(
+        synthetic_graph, "length", 12, pivot_strategy=pivot_strategy, seed=1
+    )
+    assert result == repeated
+    assert result.keys() == expected.keys()
+    assert sum(result.values()) == pytest.approx(sum(expected.values()), rel=0.5)
+    if pivot_strategy != "spread":
+        assert max(standard_error.values()) > 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_edge_betweenness_centrality(synthetic_graph, workers):
+    # Test if the parallel engine matches the serial NetworkX result
+    expected = nx.edge_betweenness_centrality(synthetic_graph, weight="length")
+    result = edge_betweenness_centrality(synthetic_graph, "length", workers=workers)
+    assert result.keys() == expected.keys()
+    for edge, value in expected.items():
+        assert result[edge] == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+
+def test_approximate_edge_betweenness_parallel(synthetic_graph):
+    # Test if the sampled estimate does not depend on the number of workers
+    serial = approximate_edge_betweenness(
+        synthetic_graph, "length", 12, pivot_strategy="stratified", seed=1
+    )
+    parallel = approximate_edge_betweenness(
+        synthetic_graph, "length", 12, pivot_strategy="stratified", seed=1, workers=2
+    )
+    for serial_values, parallel_values in zip(serial, parallel):
+        for edge, value in serial_values.items():
+            assert parallel_values[edge] == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+
+def test_select_pivots(synthetic_graph):
+    # Test if the pivots are distinct nodes of the graph
+    for pivot_strategy in ["random", "stratified", "spread"]:
+        pivots, labels = select_pivots(synthetic_graph, 8, pivot_strategy, seed=3)
+        assert len(set(pivots)) == 8
+        assert set(pivots) <= set(synthetic_graph.nodes)
+        assert len(labels) == len(synthetic_graph)
+
+
+def test_select_pivots_invalid_strategy(synthetic_graph):
+    # Test parameter validation for the pivot strategy
+    with pytest.raises(ValueError):
+        select_pivots(synthetic_graph, 8, "invalid_strategy")
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,47 @@
+import sys
+import subprocess
+
+import pytest
+
+from definitions import ROOT_DIR
+from network_analysis.benchmark import STARTUP_TIME_BUDGET, time_startup
+from network_analysis.cli import parse_arguments
+
+HEAVY_MODULES = ["geopandas", "matplotlib", "networkx", "osgeo", "osmnx", "pandas"]
+
+
+def test_cli_imports():
+    # Test if the argument parsing loads none of the heavy dependencies
+    code = (
+        "import sys, network_analysis.cli;"
+        f"print([m for m in {HEAVY_MODULES} if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_help_startup_time():
+    # Test if a cold start with --help stays within the budget
+    assert time_startup("main.py", repeat=3)["median"] < STARTUP_TIME_BUDGET
+
+
+def test_parse_arguments(monkeypatch):
+    # Test if the defaults are set and invalid values exit before the analysis
+    monkeypatch.setattr(sys, "argv", ["main.py", "-l", "Dossenheim, Germany"])
+    args = parse_arguments()
+    assert args.centrality_method == "networkx"
+    assert args.output_format == "gpkg" and args.plot == "full"
+
+    monkeypatch.setattr(sys, "argv", ["main.py", "-m", "geographical", "-n", "0"])
+    with pytest.raises(SystemExit):
+        parse_arguments()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,111 @@
+import os
+import random
+
+import networkx as nx
+import pytest
+
+from network_analysis.contraction import (
+    build_contraction_hierarchy,
+    get_contraction_hierarchy,
+)
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.routing import count_route_edges
+
+
+def _path_length(csr_graph, edge_ids):
+    edge_weight = csr_graph.edge_weight("length")
+    return sum(edge_weight[edge] for edge in edge_ids)
+
+
+def test_shortest_path_edges(synthetic_graph):
+    # Test if all queries find a path of the same length as Dijkstra
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    hierarchy = build_contraction_hierarchy(csr_graph, "length")
+    for origin in range(len(csr_graph)):
+        for destination in range(len(csr_graph)):
+            edges = hierarchy.shortest_path_edges(origin, destination)
+            expected = csr_graph.shortest_path_edges(origin, destination, "length")
+            if expected is None:
+                assert edges is None
+                continue
+            assert _path_length(csr_graph, edges) == pytest.approx(
+                _path_length(csr_graph, expected)
+            )
+            # consecutive edges form a path from the origin to the destination
+            tuples = [csr_graph.edge_tuples()[edge] for edge in edges]
+            nodes = [csr_graph.node_index[u] for u, _, _ in tuples]
+            assert nodes[:1] == ([origin] if edges else [])
+            for (_, v, _), (u, _, _) in zip(tuples[:-1], tuples[1:]):
+                assert v == u
+
+
+def test_shortest_path_random_graph():
+    # Test if the distances match NetworkX on an irregular one-way network
+    rng = random.Random(1)
+    graph = nx.gnm_random_graph(60, 180, seed=1, directed=True)
+    graph = nx.MultiDiGraph(graph)
+    for u, v, key in graph.edges(keys=True):
+        graph.edges[u, v, key]["length"] = rng.randint(1, 20)
+    csr_graph = CSRGraph.from_graph(graph)
+    hierarchy = build_contraction_hierarchy(csr_graph, "length")
+    distances = dict(nx.all_pairs_dijkstra_path_length(graph, weight="length"))
+    for origin in graph.nodes:
+        for destination in graph.nodes:
+            edges = hierarchy.shortest_path_edges(
+                csr_graph.node_index[origin], csr_graph.node_index[destination]
+            )
+            if destination not in distances[origin]:
+                assert edges is None
+            else:
+                assert _path_length(csr_graph, edges) == pytest.approx(
+                    distances[origin][destination]
+                )
+
+
+def test_get_contraction_hierarchy_cache(synthetic_graph, tmp_path):
+    # Test if the hierarchy is cached and rebuilt after a weight change
+    cache_dir = str(tmp_path)
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    hierarchy = get_contraction_hierarchy(
+        csr_graph, "length", cache_key="abc", cache_dir=cache_dir
+    )
+    assert os.listdir(cache_dir) == ["abc.ch_length.pkl"]
+    cached = get_contraction_hierarchy(
+        csr_graph, "length", cache_key="abc", cache_dir=cache_dir
+    )
+    assert cached.graph is csr_graph
+    assert (cached.rank == hierarchy.rank).all()
+    assert (cached.arc_weight == hierarchy.arc_weight).all()
+
+    for _, _, data in synthetic_graph.edges(data=True):
+        data["length"] *= 2
+    changed_graph = CSRGraph.from_graph(synthetic_graph)
+    rebuilt = get_contraction_hierarchy(
+        changed_graph, "length", cache_key="abc", cache_dir=cache_dir
+    )
+    assert rebuilt.weight_digest != hierarchy.weight_digest
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_count_route_edges_contraction_hierarchy(synthetic_graph, workers):
+    # Test if routing on the hierarchy gives routes of Dijkstra's length
+    start_nodes = [0, 0, 12, 24, 5, 5, 3]
+    end_nodes = [24, 7, 3, 0, 19, 5, 21]
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    hierarchy = build_contraction_hierarchy(csr_graph, "length")
+    edge_counter = count_route_edges(
+        hierarchy, start_nodes, end_nodes, "length", workers=workers
+    )
+    expected = count_route_edges(csr_graph, start_nodes, end_nodes, "length")
+    assert edge_counter.num_routes == expected.num_routes == 6
+    edge_weight = csr_graph.edge_weight("length")
+    assert (edge_counter.counts * edge_weight).sum() == pytest.approx(
+        (expected.counts * edge_weight).sum()
+    )
+
+    with pytest.raises(ValueError):
+        count_route_edges(hierarchy, start_nodes, end_nodes, "travel_time")
+
+
+if __name__ == "__main__":
+    pytest.main()
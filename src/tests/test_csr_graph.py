@@ -0,0 +1,72 @@
+import networkx as nx
+import pytest
+
+from network_analysis.betweenness import (
+    approximate_edge_betweenness,
+    edge_betweenness_centrality,
+)
+from network_analysis.csr_graph import CSRGraph
+
+
+def test_csr_graph_from_graph(synthetic_graph):
+    # Test if the arrays describe the nodes and edges of the graph
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    assert len(csr_graph) == len(synthetic_graph)
+    assert csr_graph.num_edges == synthetic_graph.number_of_edges()
+    assert sorted(csr_graph.edge_tuples()) == sorted(synthetic_graph.edges(keys=True))
+    assert csr_graph.num_pairs == len(set(synthetic_graph.edges()))
+    assert csr_graph.indptr[-1] == csr_graph.num_edges
+    assert "length" in csr_graph.weights
+    assert "travel_time" not in csr_graph.weights
+
+
+def test_csr_graph_missing_weight(synthetic_graph):
+    # Test if a weight that is not stored raises a KeyError
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    with pytest.raises(KeyError):
+        csr_graph.adjacency("travel_time")
+
+
+def test_csr_shortest_path_edges(synthetic_graph):
+    # Test if the shortest path has the length of the NetworkX shortest path
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    node_index = csr_graph.node_index
+    for origin, destination in [(0, 24), (24, 0), (3, 20), (7, 7)]:
+        path = csr_graph.shortest_path_edges(
+            node_index[origin], node_index[destination], "length"
+        )
+        expected = nx.shortest_path_length(
+            synthetic_graph, origin, destination, weight="length"
+        )
+        assert csr_graph.weights["length"][path].sum() == pytest.approx(expected)
+        if path:
+            edges = csr_graph.edge_tuples(path)
+            assert edges[0][0] == origin
+            assert edges[-1][1] == destination
+
+
+def test_csr_edge_betweenness_centrality(synthetic_graph):
+    # Test if the CSR graph gives the NetworkX betweenness centrality
+    expected = nx.edge_betweenness_centrality(synthetic_graph, weight="length")
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    result = edge_betweenness_centrality(csr_graph, "length")
+    assert result.keys() == expected.keys()
+    for edge, value in expected.items():
+        assert result[edge] == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+
+def test_csr_approximate_edge_betweenness(synthetic_graph):
+    # Test if the CSR graph selects the same pivots as the NetworkX graph
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    expected, _ = approximate_edge_betweenness(
+        synthetic_graph, "length", 10, pivot_strategy="stratified", seed=4
+    )
+    result, _ = approximate_edge_betweenness(
+        csr_graph, "length", 10, pivot_strategy="stratified", seed=4
+    )
+    for edge, value in expected.items():
+        assert result[edge] == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+
+if __name__ == "__main__":
+    pytest.main()
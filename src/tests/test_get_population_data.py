@@ -1,10 +1,18 @@
+import os
+
+import numpy as np
 import pytest
-from osgeo import osr
+from osgeo import gdal, osr
 
+from network_analysis.node_index import NodeIndex
 from network_analysis.population_data import (
     open_and_reproject_raster,
     get_node_coordinates,
+    get_bounding_box,
     get_population_at_nodes,
+    get_populated_cells,
+    distribute_cell_population,
+    get_population_sampler,
     select_nodes_by_population_weight,
     get_population_weighted_nodes,
 )
@@ -20,6 +28,47 @@ def test_open_and_reproject_raster(temp_raster_file):
     assert raster_dataset.GetRasterBand(1).ReadAsArray(1, 1, 1, 1)[0, 0] == 4.0
 
 
+def test_open_and_reproject_raster_keeps_source(temp_raster_file):
+    # Test that re-projecting does not modify the source raster
+    open_and_reproject_raster(temp_raster_file)
+    source_srs = osr.SpatialReference(wkt=gdal.Open(temp_raster_file).GetProjection())
+    assert source_srs.GetAttrValue("AUTHORITY", 1) == "4324"
+
+
+def test_open_and_reproject_raster_cached_window(
+    temp_raster_file, sample_nodes, tmp_path, monkeypatch
+):
+    # Test that only the study area window is re-projected and cached
+    bbox = get_bounding_box(get_node_coordinates(sample_nodes))
+    raster_dataset = open_and_reproject_raster(
+        temp_raster_file, bbox=bbox, cache_dir=str(tmp_path)
+    )
+    assert len(os.listdir(tmp_path)) == 1
+    assert raster_dataset.RasterXSize == 2
+    assert raster_dataset.RasterYSize == 1
+    population_values = get_population_at_nodes(
+        raster_dataset, get_node_coordinates(sample_nodes)
+    )
+    assert population_values == [3.0, 4.0]
+
+    # a repeated run over the same area reads the cached window
+    def fail_translate(*args, **kwargs):
+        raise AssertionError("The raster window was re-projected again.")
+
+    monkeypatch.setattr(gdal, "Translate", fail_translate)
+    raster_dataset = open_and_reproject_raster(
+        temp_raster_file, bbox=bbox, cache_dir=str(tmp_path)
+    )
+    assert raster_dataset.RasterYSize == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_get_bounding_box(sample_nodes):
+    # Test the bounding box of node coordinates
+    bbox = get_bounding_box(get_node_coordinates(sample_nodes))
+    assert bbox == (-179.1, 88.7, -178.9, 88.8)
+
+
 def test_get_node_coordinates(sample_nodes):
     # Test extracting coordinates from node data
     coordinates = get_node_coordinates(sample_nodes)
@@ -37,6 +86,101 @@ def test_get_population_at_nodes(temp_raster_file, sample_nodes):
     assert population_values == [3.0, 4.0]
 
 
+def test_get_population_at_nodes_block_reads(temp_raster_file, sample_nodes):
+    # Test that reading block by block gives the same values as one window
+    raster_dataset = open_and_reproject_raster(temp_raster_file)
+    node_coordinates = get_node_coordinates(sample_nodes)
+    population_values = get_population_at_nodes(
+        raster_dataset, node_coordinates, max_window_pixels=1
+    )
+    assert population_values == [3.0, 4.0]
+
+
+def test_get_population_at_nodes_outside_raster(temp_raster_file, sample_nodes):
+    # Test that nodes outside of the raster get a population of 0
+    raster_dataset = open_and_reproject_raster(temp_raster_file)
+    node_coordinates = get_node_coordinates(sample_nodes)
+    node_coordinates[3] = (88.7, -180.5)
+    node_coordinates[4] = (80.0, -179.1)
+    population_values = get_population_at_nodes(raster_dataset, node_coordinates)
+    assert population_values == [3.0, 4.0, 0.0, 0.0]
+    assert get_population_at_nodes(raster_dataset, {}) == []
+
+
+def test_get_population_at_nodes_no_data(tmp_path, sample_nodes):
+    # Test that nodes on no-data or negative pixels get a population of 0
+    raster_path = str(tmp_path / "no_data_raster.tif")
+    ds = gdal.GetDriverByName("GTiff").Create(raster_path, 2, 2, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform((-180, 1, 0, 90, 0, -1))
+    ds.GetRasterBand(1).WriteArray(np.array([[1.0, 2.0], [-200.0, -1.0]]))
+    ds.GetRasterBand(1).SetNoDataValue(-200.0)
+    target_srs = osr.SpatialReference()
+    target_srs.ImportFromEPSG(4324)
+    ds.SetProjection(target_srs.ExportToWkt())
+    ds.FlushCache()
+    ds = None
+
+    raster_dataset = open_and_reproject_raster(raster_path)
+    node_coordinates = get_node_coordinates(sample_nodes)
+    population_values = get_population_at_nodes(raster_dataset, node_coordinates)
+    assert population_values == [0.0, 0.0]
+    sampler = get_population_sampler(
+        sample_nodes, seed=0, raster_dataset=raster_dataset
+    )
+    assert sampler.probability is None
+
+
+def test_get_populated_cells(temp_raster_file, sample_nodes):
+    # Test reading the centre and population of the cells of a window
+    raster_dataset = open_and_reproject_raster(temp_raster_file)
+    bbox = get_bounding_box(get_node_coordinates(sample_nodes))
+    x, y, population = get_populated_cells(raster_dataset, bbox)
+    assert x.tolist() == [-179.5, -178.5]
+    assert y.tolist() == [88.5, 88.5]
+    assert population.tolist() == [3.0, 4.0]
+    x, y, population = get_populated_cells(raster_dataset, (10, 10, 11, 11))
+    assert len(x) == len(y) == len(population) == 0
+
+
+def test_distribute_cell_population():
+    # Test splitting the population of cells over their nearest nodes
+    node_index = NodeIndex.from_coordinates(
+        [10, 11, 12], [8.0, 8.001, 8.1], [49.0, 49.0, 49.0]
+    )
+    x = np.array([8.0005, 8.1, 9.0])
+    y = np.array([49.0, 49.0, 49.0])
+    population = np.array([10.0, 4.0, 3.0])
+    node_population = distribute_cell_population(
+        node_index, x, y, population, num_nearest=2
+    )
+    # the middle cell is split evenly, the far cell is dropped
+    assert node_population == pytest.approx([5.0, 5.0, 4.0], rel=1e-3)
+
+    chunked = distribute_cell_population(
+        node_index, x, y, population, num_nearest=2, chunk_size=1
+    )
+    assert chunked == pytest.approx(node_population)
+
+    # a single nearest node takes the whole cell
+    node_population = distribute_cell_population(
+        node_index, x, y, population, num_nearest=1, max_distance=1e6
+    )
+    assert node_population.sum() == pytest.approx(17.0)
+
+
+def test_get_population_sampler_cell_model(temp_raster_file, sample_nodes):
+    # Test the sampler of the cell population model
+    raster_dataset = open_and_reproject_raster(temp_raster_file)
+    sampler = get_population_sampler(
+        sample_nodes, seed=0, raster_dataset=raster_dataset, population_model="cell"
+    )
+    assert set(sampler.nodes.tolist()) == set(sample_nodes)
+    with pytest.raises(ValueError):
+        get_population_sampler(
+            sample_nodes, raster_dataset=raster_dataset, population_model="zone"
+        )
+
+
 def test_select_nodes_by_population_weight(temp_raster_file, sample_nodes):
     # Test selecting nodes by population weight
     raster_dataset = open_and_reproject_raster(temp_raster_file)
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from network_analysis.graph_cache import (
+    clear_graph_cache,
+    enforce_cache_size,
+    graph_cache_key,
+    load_cached_graph,
+    save_cached_graph,
+)
+
+
+def test_graph_cache_key():
+    # Test if the key changes with every parameter of the graph
+    key = graph_cache_key("Dossenheim, Germany", "drive", True)
+    assert key == graph_cache_key("Dossenheim, Germany", "drive", True)
+    assert key != graph_cache_key("Dossenheim, Germany", "bike", True)
+    assert key != graph_cache_key("Dossenheim, Germany", "drive", False)
+    assert key != graph_cache_key("Heidelberg, Germany", "drive", True)
+
+
+def test_save_and_load_cached_graph(synthetic_graph, tmp_path):
+    # Test if a cached graph is loaded with all nodes and edges
+    cache_dir = str(tmp_path)
+    assert load_cached_graph("missing", cache_dir) is None
+    save_cached_graph(synthetic_graph, "abc", cache_dir)
+    graph = load_cached_graph("abc", cache_dir)
+    assert list(graph.nodes(data=True)) == list(synthetic_graph.nodes(data=True))
+    assert list(graph.edges(keys=True, data=True)) == list(
+        synthetic_graph.edges(keys=True, data=True)
+    )
+
+
+def test_enforce_cache_size(synthetic_graph, tmp_path):
+    # Test if the least recently used graphs are removed above the size cap
+    cache_dir = str(tmp_path)
+    save_cached_graph(synthetic_graph, "old", cache_dir)
+    save_cached_graph(synthetic_graph, "new", cache_dir)
+    old_path = os.path.join(cache_dir, "old.graph.pkl")
+    os.utime(old_path, (0, 0))
+    enforce_cache_size(cache_dir, os.path.getsize(old_path))
+    assert load_cached_graph("old", cache_dir) is None
+    assert load_cached_graph("new", cache_dir) is not None
+
+
+def test_clear_graph_cache(synthetic_graph, tmp_path):
+    # Test if the cache is invalidated per graph and completely
+    cache_dir = str(tmp_path)
+    save_cached_graph(synthetic_graph, "first", cache_dir)
+    save_cached_graph(synthetic_graph, "second", cache_dir)
+    clear_graph_cache("first", cache_dir)
+    assert load_cached_graph("first", cache_dir) is None
+    assert load_cached_graph("second", cache_dir) is not None
+    clear_graph_cache(cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == []
+
+
+if __name__ == "__main__":
+    pytest.main()
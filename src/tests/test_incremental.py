@@ -0,0 +1,80 @@
+import networkx as nx
+import pytest
+
+from network_analysis.incremental import (
+    build_centrality_baseline,
+    load_centrality_baseline,
+    save_centrality_baseline,
+    update_centrality,
+)
+
+
+def assert_matches_networkx(graph, baseline):
+    expected = nx.edge_betweenness_centrality(graph, weight="length")
+    result = baseline.centrality(graph)
+    assert result.keys() == expected.keys()
+    for edge, value in expected.items():
+        assert result[edge] == pytest.approx(value, rel=1e-9, abs=1e-12)
+
+
+def test_build_centrality_baseline(synthetic_graph):
+    # Test that the baseline equals the NetworkX centrality
+    baseline = build_centrality_baseline(synthetic_graph, "length")
+    assert len(baseline.dependencies) == len(synthetic_graph)
+    assert_matches_networkx(synthetic_graph, baseline)
+
+
+@pytest.mark.parametrize(
+    "removals, insertions, weight_changes",
+    [
+        ([(5, 10, 0)], [], {}),
+        ([], [], {(12, 13, 0): 500.0}),
+        ([], [], {(12, 17, 0): 10.0}),
+        ([], [(0, 24, {"length": 150.0})], {}),
+        ([], [(24, 25, {"length": 50.0}), (25, 0, {"length": 50.0})], {}),
+        ([(0, 1, 0), (0, 1, 1)], [(3, 2, {"length": 75.0})], {(7, 8, 0): 60.0}),
+    ],
+)
+def test_update_centrality(synthetic_graph, removals, insertions, weight_changes):
+    # Test that incremental updates equal a full recalculation
+    graph = synthetic_graph.copy()
+    baseline = build_centrality_baseline(graph, "length")
+    recalculated = update_centrality(
+        graph, baseline, removals, insertions, weight_changes
+    )
+    assert 0 < len(recalculated) <= len(graph)
+    assert_matches_networkx(graph, baseline)
+
+
+def test_update_centrality_unaffected(synthetic_graph):
+    # Test that changes outside of all shortest paths recalculate nothing
+    graph = synthetic_graph.copy()
+    baseline = build_centrality_baseline(graph, "length")
+    # the parallel edge keeps the shortest weight between nodes 0 and 1
+    recalculated = update_centrality(graph, baseline, weight_changes={(0, 1, 1): 90.0})
+    assert recalculated == []
+    assert_matches_networkx(graph, baseline)
+
+
+def test_update_centrality_missing_edge(synthetic_graph):
+    # Test that removing a missing edge raises an error
+    graph = synthetic_graph.copy()
+    baseline = build_centrality_baseline(graph, "length")
+    with pytest.raises(KeyError):
+        update_centrality(graph, baseline, removals=[(5, 10, 0), (0, 24, 0)])
+    # the graph is left unchanged
+    assert graph.has_edge(5, 10, 0)
+
+
+def test_save_and_load_centrality_baseline(synthetic_graph, tmp_path):
+    # Test that a saved baseline can be updated after loading
+    graph = synthetic_graph.copy()
+    path = str(tmp_path / "baseline.pkl")
+    save_centrality_baseline(build_centrality_baseline(graph, "length"), path)
+    baseline = load_centrality_baseline(path)
+    update_centrality(graph, baseline, removals=[(5, 10, 0)])
+    assert_matches_networkx(graph, baseline)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -5,7 +5,9 @@ from network_analysis.networkx_analyser import networkx_analyser
 
 def test_networkx_analyser_return():
     # Test if the function returns a GeoDataFrame and the expected columns
-    result = networkx_analyser("Dossenheim, Germany", "length", "drive")
+    result = networkx_analyser(
+        "Dossenheim, Germany", "length", "drive", use_graph_cache=False
+    )
     assert isinstance(result, gpd.GeoDataFrame)
 
     assert "osmid" in result.columns
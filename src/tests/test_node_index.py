@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+
+from network_analysis.node_index import NodeIndex, get_node_index
+
+
+def test_nearest(synthetic_graph):
+    # Test if points are snapped to their closest nodes with metric distances
+    node_index = NodeIndex.from_graph(synthetic_graph)
+    assert "UTM zone 32N" in node_index.projected_crs
+    nodes, distances = node_index.nearest(
+        np.array([8.6801, 8.6839, 8.682]), np.array([49.4, 49.4041, 49.402])
+    )
+    assert list(nodes) == [0, 24, 12]
+    # 0.0001 degrees of longitude at 49.4 degrees are about 7 m
+    assert distances[0] == pytest.approx(7.2, abs=0.2)
+    assert distances[2] == pytest.approx(0, abs=1e-6)
+
+    nodes, distances = node_index.nearest(np.array([8.6801]), np.array([49.4]), k=3)
+    assert nodes.shape == (1, 3)
+    assert list(nodes[0][:2]) == [0, 1]
+    assert np.all(np.diff(distances[0]) >= 0)
+    with pytest.raises(ValueError):
+        node_index.nearest(np.array([8.68]), np.array([49.4]), k=26)
+
+
+def test_within(synthetic_graph):
+    # Test if all node pairs within the radius are returned, ordered by point
+    node_index = NodeIndex.from_graph(synthetic_graph)
+    points, nodes, distances = node_index.within(
+        np.array([8.682, 8.70]), np.array([49.402, 49.40]), 80
+    )
+    # neighbours in x are 72 m away, in y 111 m
+    assert list(points) == [0] * 3
+    assert nodes[0] == 12
+    assert set(nodes) == {11, 12, 13}
+    assert np.all(distances <= 80)
+
+    empty_points, _, _ = node_index.within(np.array([8.70]), np.array([49.40]), 80)
+    assert len(empty_points) == 0
+
+
+def test_get_node_index(synthetic_graph, tmp_path):
+    # Test if the index is cached and rebuilt once the nodes move
+    cache_dir = str(tmp_path)
+    node_index = get_node_index(synthetic_graph, cache_key="grid", cache_dir=cache_dir)
+    assert os.path.exists(os.path.join(cache_dir, "grid.node_index.pkl"))
+    cached = get_node_index(synthetic_graph, cache_key="grid", cache_dir=cache_dir)
+    assert cached.node_digest == node_index.node_digest
+    assert list(cached.nearest(np.array([8.682]), np.array([49.402]))[0]) == [12]
+
+    synthetic_graph.nodes[12]["x"] += 0.01
+    moved = get_node_index(synthetic_graph, cache_key="grid", cache_dir=cache_dir)
+    assert moved.node_digest != node_index.node_digest
+    assert list(moved.nearest(np.array([8.682]), np.array([49.402]))[0]) != [12]
+
+
+if __name__ == "__main__":
+    pytest.main()
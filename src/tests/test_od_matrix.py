@@ -0,0 +1,93 @@
+import geopandas as gpd
+import networkx as nx
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+
+from network_analysis.od_matrix import load_od_node_pairs, read_od_matrix
+from network_analysis.osmnx_analyser import osmnx_analyser
+
+
+@pytest.fixture
+def od_files(synthetic_graph, tmp_path):
+    # zones around nodes 0, 4, 24 (polygon) and one point zone at node 12
+    zones = gpd.GeoDataFrame(
+        {
+            "zone_id": [1, 2, 3, 4],
+            "geometry": [
+                Point(8.6801, 49.4001),
+                Point(8.6839, 49.4001),
+                box(8.6835, 49.4035, 8.6845, 49.4045),
+                Point(8.682, 49.402),
+            ],
+        },
+        crs="epsg:4326",
+    )
+    zones_path = str(tmp_path / "zones.gpkg")
+    zones.to_file(zones_path, driver="GPKG")
+    od_matrix = pd.DataFrame(
+        {
+            "origin": [1, 1, 2, 1, 3, 9, 4],
+            "destination": [3, 2, 4, 3, 1, 1, 4],
+            "trips": [2.0, 1.0, 4.0, 3.0, 0.0, 5.0, 7.0],
+        }
+    )
+    csv_path = str(tmp_path / "od.csv")
+    od_matrix.to_csv(csv_path, index=False)
+    parquet_path = str(tmp_path / "od.parquet")
+    od_matrix.to_parquet(parquet_path, index=False)
+    return zones_path, csv_path, parquet_path
+
+
+def test_read_od_matrix(od_files):
+    # Test if CSV and Parquet matrices are read in chunks with renamed columns
+    _, csv_path, parquet_path = od_files
+    for path in (csv_path, parquet_path):
+        chunks = list(read_od_matrix(path, chunk_size=3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert list(chunks[0].columns) == ["origin", "destination", "volume"]
+    with pytest.raises(ValueError):
+        next(read_od_matrix("od.txt"))
+
+
+@pytest.mark.parametrize("chunk_size", [2, 100])
+def test_load_od_node_pairs(synthetic_graph, od_files, chunk_size):
+    # Test if zone pairs are mapped to node pairs and their trips summed
+    zones_path, csv_path, parquet_path = od_files
+    for path in (csv_path, parquet_path):
+        start_nodes, end_nodes, volumes = load_od_node_pairs(
+            path, zones_path, synthetic_graph, chunk_size=chunk_size
+        )
+        pairs = dict(zip(zip(start_nodes.tolist(), end_nodes.tolist()), volumes))
+        # unknown zone 9 and zero trips are dropped
+        assert pairs == {(0, 24): 5.0, (0, 4): 1.0, (4, 12): 4.0, (12, 12): 7.0}
+
+
+def test_osmnx_analyser_od(synthetic_graph, od_files):
+    # Test if the centrality sums the trips of every edge
+    zones_path, csv_path, _ = od_files
+    centrality_gdf = osmnx_analyser(
+        "synthetic",
+        None,
+        "length",
+        "drive",
+        "od",
+        graph=synthetic_graph,
+        od_matrix_path=csv_path,
+        zones_path=zones_path,
+    )
+    # the routes 0-24, 0-4 and 4-12 have trips, 12-12 has no route
+    expected = sum(
+        volume * (len(nx.shortest_path(synthetic_graph, u, v, weight="length")) - 1)
+        for u, v, volume in [(0, 24, 5.0), (0, 4, 1.0), (4, 12, 4.0)]
+    )
+    assert centrality_gdf["centrality"].sum() == pytest.approx(expected)
+
+    with pytest.raises(ValueError):
+        osmnx_analyser(
+            "synthetic", None, "length", "drive", "od", graph=synthetic_graph
+        )
+
+
+if __name__ == "__main__":
+    pytest.main()
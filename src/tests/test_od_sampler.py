@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from network_analysis.od_sampler import ODSampler, build_alias_table
+
+
+def test_build_alias_table():
+    # Test that the alias tables reproduce the distribution
+    weights = np.array([1.0, 0.0, 3.0, 4.0])
+    probability, alias = build_alias_table(weights)
+    num = len(weights)
+    # probability mass of every node: own bucket plus buckets aliasing to it
+    mass = probability / num
+    np.add.at(mass, alias, (1.0 - probability) / num)
+    assert np.allclose(mass, weights / weights.sum())
+
+
+def test_sample_pairs_weighted():
+    # Test that pairs are drawn proportional to the weights
+    sampler = ODSampler(["a", "b", "c"], weights=[0.0, 1.0, 3.0], seed=0)
+    start_nodes, end_nodes = sampler.sample_pairs(40000)
+    assert len(start_nodes) == len(end_nodes) == 40000
+    assert "a" not in start_nodes and "a" not in end_nodes
+    assert start_nodes.count("c") / len(start_nodes) == pytest.approx(0.75, abs=0.02)
+
+
+def test_sample_pairs_reproducible():
+    # Test that the same seed draws the same pairs
+    nodes = list(range(100))
+    pairs = ODSampler(nodes, seed=42).sample_pairs(50)
+    assert pairs == ODSampler(nodes, seed=42).sample_pairs(50)
+    assert all(isinstance(node, int) for node in pairs[0])
+
+
+def test_sample_pairs_exclude_same_nodes():
+    # Test that start and end node at the same index differ
+    sampler = ODSampler([1, 2], weights=[1.0, 1.0], seed=1)
+    start_nodes, end_nodes = sampler.sample_pairs(1000, exclude_same_nodes=True)
+    assert all(start != end for start, end in zip(start_nodes, end_nodes))
+
+    sampler = ODSampler([1, 2], weights=[0.0, 1.0])
+    with pytest.raises(ValueError):
+        sampler.sample_pairs(10, exclude_same_nodes=True)
+
+
+def test_sampler_zero_weights():
+    # Test that zero weights fall back to uniform selection
+    sampler = ODSampler([1, 2, 3], weights=[0.0, 0.0, 0.0], seed=0)
+    start_nodes, _ = sampler.sample_pairs(300)
+    assert set(start_nodes) == {1, 2, 3}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -4,7 +4,7 @@ import pytest
 
 def test_osmnx_analyser_random_weighting_return():
     result = osmnx_analyser.osmnx_analyser(
-        "Heidelberg, Germany", 5, "length", "drive", "random"
+        "Heidelberg, Germany", 5, "length", "drive", "random", use_graph_cache=False
     )
     assert result is not None
 
@@ -18,7 +18,7 @@ def test_osmnx_analyser_parameter_validation():
 
 def test_osmnx_analyser_population_weighting():
     result = osmnx_analyser.osmnx_analyser(
-        "Heidelberg, Germany", 5, "length", "drive", "population"
+        "Heidelberg, Germany", 5, "length", "drive", "population", use_graph_cache=False
     )
     assert result is not None
 
@@ -0,0 +1,83 @@
+import os
+import json
+import pstats
+
+import pytest
+
+from network_analysis.profiling import (
+    add_stage_records,
+    get_stage_records,
+    profile_run,
+    profiled,
+    reset_stages,
+    run_with_stages,
+    stage,
+    summarize_stages,
+    write_stage_report,
+)
+
+
+@profiled("square")
+def _square(value):
+    return value * value
+
+
+def test_stage_records():
+    # Test if nested stages and decorated calls are recorded with their parent
+    reset_stages()
+    with stage("outer"):
+        assert _square(3) == 9
+        _square(4)
+    records = get_stage_records()
+    assert [record["stage"] for record in records] == ["square", "square", "outer"]
+    assert [record["parent"] for record in records] == ["outer", "outer", None]
+    for record in records:
+        assert record["wall_time"] >= 0 and record["cpu_time"] >= 0
+        assert record["peak_rss_mb"] > 0
+
+    summary = summarize_stages(records)
+    assert summary["square"]["calls"] == 2
+    assert summary["outer"]["wall_time"] >= summary["square"]["wall_time"]
+
+
+def test_run_with_stages():
+    # Test if only the stages of the call are returned and can be merged
+    reset_stages()
+    _square(2)
+    result, records = run_with_stages(_square, 5)
+    assert result == 25
+    assert len(records) == 1
+    add_stage_records(records)
+    assert len(get_stage_records()) == 3
+
+
+def test_write_stage_report(tmp_path):
+    # Test if the report contains the summary and every stage
+    reset_stages()
+    _square(2)
+    path = write_stage_report(str(tmp_path), total_wall_time=1.5)
+    with open(path) as file:
+        report = json.load(file)
+    assert report["total_wall_time"] == 1.5
+    assert report["summary"]["square"]["calls"] == 1
+    assert len(report["stages"]) == 1
+
+
+def test_profile_run(tmp_path):
+    # Test if cProfile writes a readable profile and no profiler writes nothing
+    with profile_run(None, str(tmp_path)):
+        _square(2)
+    assert os.listdir(str(tmp_path)) == []
+
+    with profile_run("cprofile", str(tmp_path)):
+        _square(2)
+    stats = pstats.Stats(os.path.join(str(tmp_path), "profile.prof"))
+    assert stats.total_calls > 0
+
+    with pytest.raises(ValueError):
+        with profile_run("unknown", str(tmp_path)):
+            pass
+
+
+if __name__ == "__main__":
+    pytest.main()
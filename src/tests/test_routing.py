@@ -0,0 +1,244 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from network_analysis.csr_graph import CSRGraph
+from network_analysis import routing
+from network_analysis.od_sampler import ODSampler
+from network_analysis.routing import (
+    count_route_edges,
+    count_route_edges_until_converged,
+    EdgeCounter,
+    group_pair_volumes,
+    group_pairs_by_origin,
+    path_from_tree,
+    split_half_error,
+    shortest_path_tree,
+)
+
+
+def _path_length(graph, route):
+    return sum(
+        min(data["length"] for data in graph[u][v].values())
+        for u, v in zip(route[:-1], route[1:])
+    )
+
+
+def test_group_pairs_by_origin():
+    # Test if repeated origins are grouped and repeated pairs are kept
+    grouped = group_pairs_by_origin([1, 2, 1, 1], [5, 6, 7, 5])
+    assert grouped == {1: [5, 7, 5], 2: [6]}
+
+
+def test_group_pair_volumes():
+    # Test if repeated pairs are merged with their summed volume
+    grouped = group_pair_volumes([1, 2, 1, 1], [5, 6, 7, 5], [1.0, 2.0, 3.0, 0.5])
+    assert grouped == {1: {5: 1.5, 7: 3.0}, 2: {6: 2.0}}
+
+
+def test_shortest_path_tree_early_termination(synthetic_graph):
+    # Test if the search stops once all destinations are settled
+    tree = shortest_path_tree(synthetic_graph, 0, [1], "length")
+    assert 1 in tree
+    assert len(tree) < len(synthetic_graph)
+
+
+def test_path_from_tree(synthetic_graph):
+    # Test if the routes of one search are shortest paths for every destination
+    end_nodes = [24, 7, 3, 19]
+    tree = shortest_path_tree(synthetic_graph, 0, end_nodes, "length")
+    for end_node in end_nodes:
+        route = path_from_tree(tree, end_node)
+        expected = nx.shortest_path_length(
+            synthetic_graph, 0, end_node, weight="length"
+        )
+        assert route[0] == 0 and route[-1] == end_node
+        assert _path_length(synthetic_graph, route) == pytest.approx(expected)
+
+
+def test_count_route_edges_no_path():
+    # Test if pairs without a path are skipped
+    graph = nx.MultiDiGraph()
+    graph.add_edge(1, 2, length=1.0)
+    graph.add_node(3)
+    edge_counter = count_route_edges(graph, [2, 1], [1, 3], "length")
+    assert edge_counter.num_routes == 0
+    assert edge_counter.counts.sum() == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_count_route_edges(synthetic_graph, workers):
+    # Test if the edge counts match for both graphs and any number of workers
+    start_nodes = [0, 0, 12, 24, 5, 5, 3]
+    end_nodes = [24, 7, 3, 0, 19, 5, 21]
+    expected = Counter()
+    for start_node, end_node in zip(start_nodes, end_nodes):
+        tree = shortest_path_tree(synthetic_graph, start_node, [end_node], "length")
+        route = path_from_tree(tree, end_node)
+        expected.update(
+            (u, v, min(synthetic_graph[u][v].items(), key=lambda i: i[1]["length"])[0])
+            for u, v in zip(route[:-1], route[1:])
+        )
+
+    edge_counter = count_route_edges(
+        synthetic_graph, start_nodes, end_nodes, "length", workers=workers
+    )
+    assert edge_counter.num_routes == 6
+    centrality_df = edge_counter.to_dataframe()
+    counts = dict(
+        zip(
+            zip(centrality_df.u, centrality_df.v, centrality_df.key),
+            centrality_df.centrality,
+        )
+    )
+    assert counts == dict(expected)
+
+    csr_counter = count_route_edges(
+        CSRGraph.from_graph(synthetic_graph),
+        start_nodes,
+        end_nodes,
+        "length",
+        workers=workers,
+    )
+    assert csr_counter.num_routes == 6
+    assert csr_counter.counts.sum() == sum(expected.values())
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_count_route_edges_volumes(synthetic_graph, workers):
+    # Test if distinct pairs are routed once and counted with their volume
+    start_nodes = [0, 0, 12, 0, 5]
+    end_nodes = [24, 7, 3, 24, 5]
+    volumes = [2.0, 0.5, 1.0, 3.0, 4.0]
+    unweighted = count_route_edges(synthetic_graph, start_nodes, end_nodes, "length")
+    expected = EdgeCounter.from_graph(synthetic_graph, weighted=True)
+    for start, end, volume in [(0, 24, 5.0), (0, 7, 0.5), (12, 3, 1.0)]:
+        single = count_route_edges(synthetic_graph, [start], [end], "length")
+        expected.merge(single.counts * volume, 1)
+
+    for graph in (synthetic_graph, CSRGraph.from_graph(synthetic_graph)):
+        edge_counter = count_route_edges(
+            graph, start_nodes, end_nodes, "length", workers=workers, volumes=volumes
+        )
+        assert edge_counter.num_routes == 3
+        counts = dict(zip(edge_counter.edges, edge_counter.counts))
+        assert counts == pytest.approx(dict(zip(expected.edges, expected.counts)))
+    assert unweighted.num_routes == 4
+
+    with pytest.raises(ValueError):
+        count_route_edges(synthetic_graph, [0], [1], "length", volumes=[1.0, 2.0])
+
+
+def test_edge_counter(synthetic_graph):
+    # Test if buffered routes are counted on the lowest parallel edge
+    edge_counter = EdgeCounter.from_graph(synthetic_graph)
+    edge_counter._buffer_size = 3
+    for _ in range(4):
+        edge_counter.add_route([0, 1, 2])
+    centrality_df = edge_counter.to_dataframe()
+    assert edge_counter.num_routes == 4
+    assert list(centrality_df.centrality) == [4, 4]
+    assert set(zip(centrality_df.u, centrality_df.v)) == {(0, 1), (1, 2)}
+
+
+def test_split_half_error():
+    # Test the error estimated from the edge counts of two halves of the routes
+    first = np.array([2, 2, 0])
+    second = np.array([4, 2, 2])
+    # shares 0.5, 0.5, 0 and 0.5, 0.25, 0.25, the combined maximum is 0.5
+    assert split_half_error(first, second) == pytest.approx(0.25)
+    assert split_half_error(first, first * 3) == 0.0
+    assert split_half_error(np.zeros(3), second) == float("inf")
+
+
+def test_split_half_error_num_routes():
+    # Test that the error shrinks like the standard error with more routes
+    rng = np.random.default_rng(0)
+    probability = np.array([0.4, 0.3, 0.2, 0.1])
+    errors = []
+    for num_routes in [1000, 100000]:
+        first = rng.multinomial(num_routes // 2, probability)
+        second = rng.multinomial(num_routes // 2, probability)
+        errors.append(split_half_error(first, second))
+    # the standard error shrinks with the square root of the number of routes
+    assert errors[1] < errors[0] / 3
+    assert errors[1] < 0.02
+
+
+def test_count_route_edges_until_converged(synthetic_graph):
+    # Test that batches stop at the tolerance and sum up like one run
+    batches = []
+    edge_counter, errors = count_route_edges_until_converged(
+        synthetic_graph,
+        ODSampler(synthetic_graph.nodes, seed=3),
+        max_routes=10000,
+        weight="length",
+        tolerance=0.2,
+        batch_size=100,
+        on_batch=lambda counter, batch, error: batches.append(batch),
+    )
+    assert len(errors) > 1
+    assert errors[-1] <= 0.2
+    assert all(error > 0.2 for error in errors[:-1])
+    assert batches == list(range(1, len(errors) + 1))
+
+    sampler = ODSampler(synthetic_graph.nodes, seed=3)
+    start_nodes, end_nodes = [], []
+    for _ in errors:
+        batch_start, batch_end = sampler.sample_pairs(100)
+        start_nodes += batch_start
+        end_nodes += batch_end
+    expected = count_route_edges(synthetic_graph, start_nodes, end_nodes, "length")
+    assert np.array_equal(edge_counter.counts, expected.counts)
+    assert edge_counter.num_routes == expected.num_routes
+
+
+def test_count_route_edges_until_converged_max_routes(synthetic_graph):
+    # Test that routing stops at the maximum number of routes
+    edge_counter, errors = count_route_edges_until_converged(
+        synthetic_graph,
+        ODSampler(synthetic_graph.nodes, seed=3),
+        max_routes=250,
+        weight="length",
+        tolerance=1e-9,
+        batch_size=100,
+        exclude_same_nodes=True,
+    )
+    assert len(errors) == 3
+    assert edge_counter.num_routes == 250
+
+
+def test_count_route_edges_until_converged_one_pool(synthetic_graph, monkeypatch):
+    # Test that all batches are routed by one pool with the same result
+    pools = []
+
+    class CountingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(routing, "ProcessPoolExecutor", CountingPool)
+    arguments = dict(max_routes=300, weight="length", tolerance=1e-9, batch_size=100)
+    edge_counter, errors = count_route_edges_until_converged(
+        synthetic_graph,
+        ODSampler(synthetic_graph.nodes, seed=3),
+        workers=2,
+        **arguments,
+    )
+    assert len(errors) == 3
+    assert len(pools) == 1
+    # the workers route on the shared CSR arrays of the graph
+    expected, _ = count_route_edges_until_converged(
+        CSRGraph.from_graph(synthetic_graph),
+        ODSampler(synthetic_graph.nodes, seed=3),
+        **arguments,
+    )
+    assert np.array_equal(edge_counter.counts, expected.counts)
+    assert edge_counter.num_routes == expected.num_routes
+
+
+if __name__ == "__main__":
+    pytest.main()
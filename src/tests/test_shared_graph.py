@@ -0,0 +1,115 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from network_analysis.betweenness import edge_betweenness_centrality
+from network_analysis.csr_graph import CSRGraph
+from network_analysis.routing import count_route_edges
+from network_analysis.shared_graph import (
+    SharedGraph,
+    pool_graph,
+    save_graph_bundle,
+    share_graph,
+    worker_graph,
+)
+from network_analysis.utils import calculate_route
+
+
+def _assert_same_arrays(graph, attached):
+    for name in ["node_ids", "x", "y", "edge_u", "edge_keys", "indptr", "pair_v"]:
+        assert np.array_equal(getattr(graph, name), getattr(attached, name))
+    assert attached.weights.keys() == graph.weights.keys()
+    assert np.array_equal(attached.weights["length"], graph.weights["length"])
+
+
+def test_share_graph(synthetic_graph):
+    # Test if attached shared arrays equal the graph and are read-only
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    shared_graph = share_graph(synthetic_graph)
+    try:
+        # only the names of the blocks are pickled
+        assert len(pickle.dumps(shared_graph)) < 2000
+        attached = pickle.loads(pickle.dumps(shared_graph)).attach()
+        _assert_same_arrays(csr_graph, attached)
+        assert not attached.edge_u.flags.writeable
+        assert attached.shortest_path_edges(0, 24, "length") == (
+            csr_graph.shortest_path_edges(0, 24, "length")
+        )
+        del attached
+    finally:
+        shared_graph.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared_graph.attach()
+
+
+def test_save_graph_bundle(synthetic_graph, tmp_path):
+    # Test if a bundle on disk is memory-mapped with the same arrays
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    save_graph_bundle(csr_graph, str(tmp_path / "bundle"))
+    shared_graph = SharedGraph.from_bundle(str(tmp_path / "bundle"))
+    attached = shared_graph.attach()
+    _assert_same_arrays(csr_graph, attached)
+    assert isinstance(attached.edge_v, np.memmap)
+
+    with pytest.raises(ValueError):
+        SharedGraph.from_bundle(str(tmp_path))
+
+
+def test_worker_graph(synthetic_graph):
+    # Test if only CSR graphs of several workers are shared
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    with worker_graph(csr_graph, 1) as graph:
+        assert graph is csr_graph
+    with worker_graph(synthetic_graph, 2) as graph:
+        assert graph is synthetic_graph
+    with worker_graph(csr_graph, 2) as graph:
+        assert isinstance(graph, SharedGraph)
+        name = graph.memory_names["edge_u"]
+    with pytest.raises(FileNotFoundError):
+        SharedGraph({"edge_u": ("<i8", (1,))}, memory_names={"edge_u": name}).attach()
+
+
+def test_pool_graph(synthetic_graph):
+    # Test if NetworkX graphs are converted to CSR arrays for several workers
+    assert pool_graph(synthetic_graph, 1) is synthetic_graph
+    csr_graph = pool_graph(synthetic_graph, 2)
+    assert isinstance(csr_graph, CSRGraph)
+    assert pool_graph(csr_graph, 2) is csr_graph
+    with worker_graph(csr_graph, 2) as graph:
+        assert isinstance(graph, SharedGraph)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_count_route_edges_shared_graph(synthetic_graph, workers):
+    # Test if routing on shared arrays counts like routing on the CSR graph
+    start_nodes = [0, 0, 12, 24, 5, 3]
+    end_nodes = [24, 7, 3, 0, 19, 21]
+    csr_graph = CSRGraph.from_graph(synthetic_graph)
+    expected = count_route_edges(csr_graph, start_nodes, end_nodes, "length")
+    shared_graph = share_graph(csr_graph)
+    try:
+        edge_counter = count_route_edges(
+            shared_graph, start_nodes, end_nodes, "length", workers=workers
+        )
+    finally:
+        shared_graph.unlink()
+    assert edge_counter.num_routes == expected.num_routes
+    assert np.array_equal(edge_counter.counts, expected.counts)
+
+
+def test_calculate_route_shared_graph(synthetic_graph):
+    # Test if the centrality of shared arrays matches the CSR backend
+    expected = edge_betweenness_centrality(
+        CSRGraph.from_graph(synthetic_graph), "length"
+    )
+    shared_graph = share_graph(synthetic_graph)
+    try:
+        centrality_df = calculate_route(shared_graph, "length", "drive", workers=2)
+    finally:
+        shared_graph.unlink()
+    assert centrality_df[0].to_dict() == pytest.approx(expected)
+
+
+if __name__ == "__main__":
+    pytest.main()
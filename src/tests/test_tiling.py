@@ -0,0 +1,87 @@
+import networkx as nx
+import osmnx as ox
+import pytest
+
+from network_analysis.tiling import (
+    core_nodes,
+    make_tiles,
+    merge_tile_results,
+    street_nodes,
+    tile_centrality,
+)
+
+
+def test_make_tiles():
+    # Test the tile grid and its buffers
+    bounds = (8.60, 49.35, 8.75, 49.45)
+    tiles = make_tiles(bounds, tile_size=5, tile_buffer=1)
+    assert len(tiles) == 3 * 3
+    assert tiles[0]["core"][:2] == bounds[:2]
+    assert tiles[-1]["core"][2:] == bounds[2:]
+    for tile in tiles:
+        core, buffered = tile["core"], tile["buffered"]
+        assert buffered[0] < core[0] and buffered[1] < core[1]
+        assert buffered[2] > core[2] and buffered[3] > core[3]
+        assert core[3] - core[1] <= 5 / 111.32 + 1e-12
+    with pytest.raises(ValueError):
+        make_tiles(bounds, tile_size=0, tile_buffer=1)
+
+
+def test_core_nodes(synthetic_graph):
+    # Test that every node belongs to exactly one tile
+    bounds = (8.68, 49.40, 8.684, 49.404)
+    tiles = make_tiles(bounds, tile_size=0.2, tile_buffer=0.1)
+    assert len(tiles) > 1
+    nodes = [
+        node
+        for tile in tiles
+        for node in core_nodes(synthetic_graph, tile["core"], bounds)
+    ]
+    assert sorted(nodes) == sorted(synthetic_graph.nodes)
+
+
+def test_merge_tile_results(synthetic_graph):
+    # Test that tiles with buffers covering the graph give the exact centrality
+    targets = street_nodes(synthetic_graph)
+    nodes = [node for node in synthetic_graph.nodes if node in targets]
+    tile_results = [
+        tile_centrality(synthetic_graph, nodes[:10], "length", targets),
+        tile_centrality(synthetic_graph, nodes[10:], "length", targets),
+    ]
+    result = merge_tile_results(tile_results, len(nodes))
+    expected = nx.edge_betweenness_centrality(
+        ox.simplify_graph(synthetic_graph), weight="length"
+    )
+    assert len(result) == len(expected)
+    assert result.crs.to_epsg() == 4326
+    for edge, value in expected.items():
+        assert result.loc[edge, "centrality"] == pytest.approx(value, abs=1e-12)
+
+
+def test_merge_tile_results_shared_street():
+    # Test that a street split by the tile borders is merged into one edge
+    graph = nx.MultiDiGraph(crs="epsg:4326")
+    for node in range(6):
+        graph.add_node(node, x=8.68 + 0.001 * node, y=49.40)
+    for node in range(5):
+        for u, v in ((node, node + 1), (node + 1, node)):
+            graph.add_edge(u, v, osmid=100, length=70.0, highway="residential")
+
+    tile_results = []
+    for tile_nodes, core in (([0, 1, 2, 3], [0, 1, 2]), ([2, 3, 4, 5], [3, 4, 5])):
+        tile_graph = graph.subgraph(tile_nodes).copy()
+        targets = street_nodes(tile_graph)
+        sources = [node for node in core if node in targets]
+        tile_results.append(tile_centrality(tile_graph, sources, "length", targets))
+    result = merge_tile_results(tile_results, num_nodes=2)
+
+    simplified = ox.simplify_graph(graph)
+    expected = nx.edge_betweenness_centrality(simplified, weight="length")
+    assert len(result) == len(expected) == 2
+    for edge, value in expected.items():
+        assert result.loc[edge, "centrality"] == pytest.approx(value)
+        assert result.loc[edge, "geometry"].length == pytest.approx(0.005)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,82 @@
+import networkx as nx
+import osmnx as ox
+import pandas as pd
+import pytest
+
+from network_analysis.travel_time import (
+    add_edge_travel_times,
+    clean_maxspeeds,
+    collapse_maxspeed_lists,
+)
+from network_analysis.utils import speed_limits
+
+
+def test_clean_maxspeeds():
+    # Test lanes, units, mph conversion and invalid tags
+    speeds = clean_maxspeeds(
+        pd.Series(["50", "30 mph", "50|30", "100 km/h", "1,5", "5", "abc", None])
+    )
+    assert speeds.tolist()[:5] == pytest.approx([50, 48.2802, 40, 100, 1.5])
+    assert speeds[5:].isna().all()
+
+
+def test_collapse_maxspeed_lists():
+    # Test if lists become the truncated mean of their valid speeds
+    collapsed = collapse_maxspeed_lists(
+        pd.Series([("50", "35"), ("30 mph", "x"), ("x",), "70"], dtype=object)
+    )
+    assert collapsed[[0, 1, 3]].tolist() == ["42", "48", "70"]
+    assert pd.isna(collapsed[2])
+
+
+def test_add_edge_travel_times_imputation():
+    # Test the imputation of missing speeds by highway type
+    graph = nx.MultiDiGraph()
+    graph.add_edge(0, 1, length=100.0, highway="residential")
+    graph.add_edge(1, 2, length=100.0, highway="primary", maxspeed="30 mph")
+    graph.add_edge(2, 3, length=100.0, highway="unknown", maxspeed=["70", "x"])
+    graph.add_edge(3, 4, length=100.0, highway=["other", "primary"])
+    graph = add_edge_travel_times(graph, speed_limits["drive"])
+    speeds = [data["speed_kph"] for _, _, data in graph.edges(data=True)]
+    # "other" has no known speed and gets the mean over all highway types
+    mean_speed = (sum(s for s in speed_limits["drive"].values() if s) + 70) / 18
+    assert speeds == pytest.approx([30, 48.3, 70, round(mean_speed, 1)])
+    travel_times = [data["travel_time"] for _, _, data in graph.edges(data=True)]
+    assert travel_times == [12.0, 7.5, 5.1, round(360 / round(mean_speed, 1), 1)]
+
+    graph.add_edge(4, 5, highway="residential")
+    graph.graph.pop("travel_time_profile")
+    with pytest.raises(ValueError):
+        add_edge_travel_times(graph, speed_limits["drive"])
+
+
+@pytest.mark.parametrize("network_type", ["drive", "bike"])
+def test_add_edge_travel_times_matches_osmnx(synthetic_graph, network_type):
+    # Test if the travel times equal those of OSMnx
+    tags = ["50", "30 mph", "50|30", "70", "100 km/h"]
+    for i, (_, _, data) in enumerate(synthetic_graph.edges(data=True)):
+        data["maxspeed"] = tags[i % len(tags)]
+    expected = ox.add_edge_travel_times(
+        ox.add_edge_speeds(synthetic_graph.copy(), speed_limits[network_type])
+    )
+    graph = add_edge_travel_times(synthetic_graph, speed_limits[network_type])
+    for (_, _, data), (_, _, expected_data) in zip(
+        graph.edges(data=True), expected.edges(data=True)
+    ):
+        assert data["speed_kph"] == pytest.approx(expected_data["speed_kph"])
+        assert data["travel_time"] == pytest.approx(expected_data["travel_time"])
+
+
+def test_add_edge_travel_times_cached(synthetic_graph):
+    # Test if the travel times are only calculated once per profile
+    graph = add_edge_travel_times(synthetic_graph, speed_limits["drive"])
+    for _, _, data in graph.edges(data=True):
+        data["travel_time"] = -1.0
+    add_edge_travel_times(graph, speed_limits["drive"])
+    assert all(t == -1.0 for _, _, t in graph.edges(data="travel_time"))
+    add_edge_travel_times(graph, speed_limits["bike"])
+    assert all(t > 0 for _, _, t in graph.edges(data="travel_time"))
+
+
+if __name__ == "__main__":
+    pytest.main()
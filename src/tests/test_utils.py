@@ -1,7 +1,9 @@
 import os
+import sys
 
 import pytest
 import networkx as nx
+import numpy as np
 import geopandas as gpd
 import pandas as pd
 from network_analysis.utils import (
@@ -11,15 +13,23 @@ from network_analysis.utils import (
     add_travel_time,
     speed_limits,
     plot_road_network,
+    start_plot_road_network,
+    _line_segments,
+    _arrow_engine,
+    save_centrality_results,
+    load_centrality_results,
+    output_folder_path,
+    replace_output_folder,
 )
 import osmnx as ox
+from shapely.geometry import box
 
 
 def test_get_osm_graph():
-    # Test if the function returns a networkx graph
+    # Test if the function downloads a networkx graph, bypassing the graph cache
     location = "Dossenheim, Germany"
     network_type = "drive"
-    graph = get_osm_graph(location, network_type)
+    graph = get_osm_graph(location, network_type, use_cache=False)
     assert isinstance(graph, nx.Graph)
     assert len(graph.nodes) > 0
     assert len(graph.edges) > 0
@@ -67,5 +77,99 @@ def test_plot_road_network(get_test_gdf, tmp_output_folder):
     assert os.path.exists(output_file)
 
 
+def test_plot_road_network_modes(get_test_gdf, tmp_path):
+    # Test the fast plot with downsampling in a worker and the mode "none"
+    output_file = os.path.join(str(tmp_path), "road_network_centrality_plot.png")
+    assert start_plot_road_network(get_test_gdf, str(tmp_path), mode="none") is None
+    assert not os.path.exists(output_file)
+
+    plot_road_network(get_test_gdf, str(tmp_path), mode="fast", max_edges=100)
+    assert os.path.exists(output_file)
+    os.remove(output_file)
+
+    future = start_plot_road_network(get_test_gdf, str(tmp_path), mode="fast")
+    future.result()
+    assert os.path.exists(output_file)
+
+
+def test_line_segments():
+    # Test if lines are split into the segments between their points
+    geometries = gpd.GeoSeries.from_wkt(
+        ["LINESTRING (0 0, 1 0, 1 1)", "LINESTRING (5 5, 6 6)"]
+    ).to_numpy()
+    segments, values = _line_segments(geometries, np.array([1.0, 2.0]))
+    assert segments.tolist() == [
+        [[0, 0], [1, 0]],
+        [[1, 0], [1, 1]],
+        [[5, 5], [6, 6]],
+    ]
+    assert values.tolist() == [1.0, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("output_format", ["gpkg", "parquet", "fgb"])
+def test_save_centrality_results(get_test_gdf, tmp_path, output_format):
+    # Test if every format is read back completely, by column and by area
+    path = save_centrality_results(
+        get_test_gdf,
+        str(tmp_path),
+        output_format=output_format,
+        spatial_sort=True,
+        row_group_size=100,
+    )
+    assert path == os.path.join(str(tmp_path), f"centrality_results.{output_format}")
+    gdf = load_centrality_results(path)
+    assert len(gdf) == len(get_test_gdf)
+    assert sorted(gdf["centrality"]) == sorted(get_test_gdf["centrality"])
+
+    gdf = load_centrality_results(path, columns=["centrality"])
+    assert list(gdf.columns) == ["centrality", "geometry"]
+
+    bbox = (8.66, 49.39, 8.68, 49.41)
+    gdf = load_centrality_results(path, bbox=bbox)
+    expected = get_test_gdf[get_test_gdf.intersects(box(*bbox))]
+    assert 0 < len(gdf) < len(get_test_gdf)
+    assert len(gdf) >= len(expected)
+
+    with pytest.raises(ValueError):
+        save_centrality_results(get_test_gdf, str(tmp_path), output_format="csv")
+
+
+def test_arrow_engine(monkeypatch):
+    # Test if Arrow writes are only used with pyogrio 0.8 and GDAL 3.8
+    pyogrio = pytest.importorskip("pyogrio")
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(pyogrio, "__version__", "0.8.0")
+    monkeypatch.setattr(pyogrio, "__gdal_version__", (3, 8, 4))
+    assert _arrow_engine() == {"engine": "pyogrio", "use_arrow": True}
+    monkeypatch.setattr(pyogrio, "__gdal_version__", (3, 7, 3))
+    assert _arrow_engine() == {}
+    monkeypatch.setattr(pyogrio, "__version__", "0.7.2")
+    monkeypatch.setattr(pyogrio, "__gdal_version__", (3, 8, 4))
+    assert _arrow_engine() == {}
+
+
+def test_save_centrality_results_missing_pyarrow(get_test_gdf, tmp_path, monkeypatch):
+    # Test if GeoParquet fails explicitly without pyarrow instead of returning None
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError):
+        save_centrality_results(get_test_gdf, str(tmp_path), output_format="parquet")
+    assert not os.listdir(tmp_path)
+
+
+def test_replace_output_folder(tmp_path):
+    # Test if older results are only replaced by the results of a finished run
+    folder_path = output_folder_path(str(tmp_path), "Heidelberg, Germany", "a", "b")
+    assert folder_path == os.path.join(str(tmp_path), "Heidelberg_Germany_a_b")
+    os.makedirs(folder_path)
+    (tmp_path / "Heidelberg_Germany_a_b" / "old.txt").write_text("old")
+    run_path = tmp_path / "run"
+    (run_path / "snapshots").mkdir(parents=True)
+    (run_path / "new.txt").write_text("new")
+
+    assert replace_output_folder(str(run_path), folder_path) == folder_path
+    assert sorted(os.listdir(folder_path)) == ["new.txt", "snapshots"]
+    assert not run_path.exists()
+
+
 if __name__ == "__main__":
     pytest.main()